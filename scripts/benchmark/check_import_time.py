@@ -0,0 +1,125 @@
+import os
+import re
+import subprocess
+import sys
+from dataclasses import dataclass
+from typing import List, Optional, Dict, Tuple
+
+import tyro
+
+
+@dataclass
+class ImportBudget:
+    module: str
+    max_seconds: float
+    forbidden_modules: Tuple[str, ...] = ()  # Heavy dependencies that must only be imported at first use
+
+
+# The forbidden modules are the actual regression check (see test/test_import_time.py). Wall-clock times vary too much between
+# machines to fail on them, so exceeding a budget only prints a warning unless `--strict_budgets` is given. Budgets are
+# roughly twice the import times on a typical laptop. A plain import of elias (pulled in by the Config classes) alone takes ~0.7s
+HEAVY_MODULES = ('torch', 'trimesh', 'mediapy', 'open3d', 'lpips', 'flame_model')
+IMPORT_BUDGETS = [
+    ImportBudget('nersemble_benchmark.data.submission_data', 3, HEAVY_MODULES + ('dreifus',)),
+    ImportBudget('nersemble_benchmark.util.download', 3, HEAVY_MODULES + ('dreifus',)),
+    ImportBudget('nersemble_benchmark.scripts.download_data', 3, HEAVY_MODULES + ('dreifus',)),
+    ImportBudget('nersemble_benchmark.scripts.check_data', 3, HEAVY_MODULES + ('dreifus',)),
+    ImportBudget('nersemble_benchmark.scripts.merge_submission', 3, HEAVY_MODULES + ('dreifus',)),
+    ImportBudget('nersemble_benchmark.evaluation.svfr_evaluation', 4, HEAVY_MODULES + ('dreifus',)),
+    # dreifus (and therefore torch) is needed for the Pose/Intrinsics fields of CameraParams
+    ImportBudget('nersemble_benchmark.data.benchmark_data', 10, ('trimesh', 'mediapy', 'open3d', 'lpips', 'flame_model')),
+    ImportBudget('nersemble_benchmark.models.flame', 10, ('trimesh', 'mediapy', 'open3d', 'lpips', 'flame_model')),
+]
+
+IMPORT_TIME_PATTERN = re.compile(r"import time:\s*(\d+)\s*\|\s*(\d+)\s*\|(\s*)(\S+)")
+
+
+def measure_import(module: str) -> Tuple[float, Dict[str, float]]:
+    """
+    Imports the module in a fresh interpreter with `python -X importtime`.
+
+    Returns
+    -------
+        Total import time of the module in seconds and the cumulative import time of every (transitively) imported module
+    """
+
+    # The fresh interpreter resolves imports like the current one, e.g., when the package is only on the PYTHONPATH
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(path for path in sys.path if path))
+    process = subprocess.run([sys.executable, '-X', 'importtime', '-c', f"import {module}"], capture_output=True, text=True, env=env)
+    if process.returncode != 0:
+        error_lines = [line for line in process.stderr.splitlines() if not IMPORT_TIME_PATTERN.match(line)]
+        raise RuntimeError(f"Could not import {module}:\n" + "\n".join(error_lines))
+
+    cumulative_seconds = dict()
+    for line in process.stderr.splitlines():
+        matches = IMPORT_TIME_PATTERN.match(line)
+        if matches:
+            cumulative_seconds[matches[4]] = max(cumulative_seconds.get(matches[4], 0), int(matches[2]) / 1e6)
+
+    return cumulative_seconds[module], cumulative_seconds
+
+
+def find_eager_imports(import_budget: ImportBudget, cumulative_seconds: Dict[str, float]) -> List[str]:
+    """
+    The forbidden modules that were imported along with the module of `import_budget`.
+    """
+
+    return [module for module in import_budget.forbidden_modules if module in cumulative_seconds]
+
+
+def main(n_repeats: int = 3,
+         budget_scale: float = 1,
+         strict_budgets: bool = False,
+         only: Optional[List[str]] = None,
+         n_slowest: int = 5):
+    """
+    Checks that importing the toolkit's modules stays fast. Fails if a module eagerly imports a heavy dependency that should
+    only be imported at first use. Modules exceeding their import time budget are reported as well.
+
+    Parameters
+    ----------
+    n_repeats:
+        Every module is imported this many times in a fresh interpreter. The fastest import is compared against the budget
+    budget_scale:
+        Multiplies all budgets, e.g., for slow CI machines
+    strict_budgets:
+        Also fail if a module exceeds its import time budget
+    only:
+        Only check modules whose names start with any of the given prefixes
+    n_slowest:
+        Number of slowest transitively imported modules that are reported for modules exceeding their budget
+    """
+
+    n_failures = 0
+    for import_budget in IMPORT_BUDGETS:
+        if only is not None and not any(import_budget.module.startswith(prefix) for prefix in only):
+            continue
+
+        measurements = [measure_import(import_budget.module) for _ in range(n_repeats)]
+        seconds, cumulative_seconds = min(measurements, key=lambda measurement: measurement[0])
+        max_seconds = import_budget.max_seconds * budget_scale
+
+        issues = []
+        warnings = []
+        imported_heavy_modules = find_eager_imports(import_budget, cumulative_seconds)
+        if imported_heavy_modules:
+            issues.append(f"eagerly imports {', '.join(imported_heavy_modules)}")
+        if seconds > max_seconds:
+            package_name = import_budget.module.split('.')[0]
+            slowest = sorted(((s, m) for m, s in cumulative_seconds.items() if m.split('.')[0] != package_name), reverse=True)[:n_slowest]
+            budget_issue = f"exceeds budget of {max_seconds:.2f}s (slowest: {', '.join(f'{m} {s:.2f}s' for s, m in slowest)})"
+            (issues if strict_budgets else warnings).append(budget_issue)
+
+        status = 'FAILED' if issues else 'SLOW' if warnings else 'OK'
+        print(f"{import_budget.module:<50} {seconds:>6.2f}s / {max_seconds:>5.2f}s  {status}")
+        for issue in issues + warnings:
+            print(f"    - {issue}")
+        n_failures += len(issues) > 0
+
+    if n_failures > 0:
+        print(f"{n_failures} module(s) failed the import time check")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    tyro.cli(main)
@@ -0,0 +1,290 @@
+import json
+import os
+import re
+import threading
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+from pathlib import Path
+from typing import List, Dict, Tuple
+
+import imageio.v3 as iio
+import numpy as np
+import trimesh
+from elias.util import ensure_directory_exists_for_file
+
+from nersemble_benchmark.constants import BENCHMARK_NVS_IDS_AND_SEQUENCES, BENCHMARK_NVS_HOLD_OUT_SERIALS, BENCHMARK_NVS_TRAIN_SERIALS, \
+    BENCHMARK_MONO_FLAME_AVATAR_IDS, BENCHMARK_MONO_FLAME_AVATAR_SEQUENCES_TRAIN, BENCHMARK_MONO_FLAME_AVATAR_TRAIN_SERIAL, \
+    BENCHMARK_MONO_FLAME_AVATAR_SEQUENCES_TEST, BENCHMARK_MONO_FLAME_AVATAR_SERIALS
+from nersemble_benchmark.data.benchmark_data import NVSDataManager, MonoFlameAvatarDataManager
+from nersemble_benchmark.data.submission_data import NVSSubmissionDataReader, MonoFlameAvatarSubmissionDataReader
+
+# Synthetic stand-ins for the benchmark data. They follow the real folder structure, resolutions and file formats, such that
+# all data managers and submission helpers can be benchmarked offline
+
+NVS_PARTICIPANT_ID, NVS_SEQUENCE_NAME = BENCHMARK_NVS_IDS_AND_SEQUENCES[0]
+NVS_RESOLUTION = (1604, 1100)  # H, W
+MONO_FLAME_AVATAR_PARTICIPANT_ID = BENCHMARK_MONO_FLAME_AVATAR_IDS[0]
+MONO_FLAME_AVATAR_SEQUENCE_NAME = BENCHMARK_MONO_FLAME_AVATAR_SEQUENCES_TRAIN[0]
+MONO_FLAME_AVATAR_RESOLUTION = (512, 512)
+
+
+# ==========================================================
+# Synthetic assets
+# ==========================================================
+
+def create_frames(n_frames: int, height: int, width: int, seed: int = 0) -> np.ndarray:
+    """
+    Smooth moving gradients with some noise. Compresses similar to real footage, unlike pure noise.
+    """
+
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+    frames = np.empty((n_frames, height, width, 3), dtype=np.uint8)
+    for t in range(n_frames):
+        for c in range(3):
+            channel = 127 + 100 * np.sin(x / (37 + 11 * c) + t / 5) * np.cos(y / (53 + 7 * c) - t / 7)
+            frames[t, ..., c] = np.clip(channel + rng.normal(0, 4, (height, width)), 0, 255)
+    return frames
+
+
+def create_alpha_maps(n_frames: int, height: int, width: int) -> np.ndarray:
+    y, x = np.mgrid[0:height, 0:width]
+    alpha_maps = np.empty((n_frames, height, width, 3), dtype=np.uint8)
+    for t in range(n_frames):
+        is_foreground = ((x - width / 2) / (0.3 * width)) ** 2 + ((y - height / 2 - t) / (0.4 * height)) ** 2 < 1
+        alpha_maps[t] = (is_foreground * 255).astype(np.uint8)[..., None]
+    return alpha_maps
+
+
+def write_video(path: str, frames: np.ndarray, fps: float = 24):
+    ensure_directory_exists_for_file(path)
+    iio.imwrite(path, frames, plugin='pyav', codec='libx264', fps=fps)
+
+
+def write_camera_calibration(path: str, serials: List[str]):
+    rng = np.random.default_rng(0)
+    world_2_cam = dict()
+    intrinsics = dict()
+    for serial in serials:
+        rotation, _ = np.linalg.qr(rng.normal(size=(3, 3)))
+        pose = np.eye(4)
+        pose[:3, :3] = rotation * np.sign(np.linalg.det(rotation))
+        pose[:3, 3] = rng.normal(size=3)
+        world_2_cam[serial] = pose.tolist()
+        intrinsics[serial] = [[8000, 0, 550], [0, 8000, 802], [0, 0, 1]]
+
+    ensure_directory_exists_for_file(path)
+    with open(path, 'w') as f:
+        json.dump(dict(world_2_cam=world_2_cam, intrinsics=intrinsics), f)
+
+
+def write_pointcloud(path: str, n_points: int, seed: int = 0):
+    """
+    Binary little-endian PCD with x y z rgb normal_x normal_y normal_z, as written by open3d.
+    """
+
+    rng = np.random.default_rng(seed)
+    dtype = np.dtype([('x', '<f4'), ('y', '<f4'), ('z', '<f4'), ('rgb', '<f4'), ('normal_x', '<f4'), ('normal_y', '<f4'), ('normal_z', '<f4')])
+    data = np.empty(n_points, dtype=dtype)
+    points = rng.normal(size=(n_points, 3)).astype(np.float32)
+    normals = points / np.linalg.norm(points, axis=1, keepdims=True)
+    colors = rng.integers(0, 256, (n_points, 3), dtype=np.uint32)
+    data['x'], data['y'], data['z'] = points.T
+    data['normal_x'], data['normal_y'], data['normal_z'] = normals.T
+    data['rgb'] = ((colors[:, 0] << 16) | (colors[:, 1] << 8) | colors[:, 2]).view(np.float32)
+
+    header = ("# .PCD v0.7 - Point Cloud Data file format\n"
+              "VERSION 0.7\n"
+              "FIELDS x y z rgb normal_x normal_y normal_z\n"
+              "SIZE 4 4 4 4 4 4 4\n"
+              "TYPE F F F F F F F\n"
+              "COUNT 1 1 1 1 1 1 1\n"
+              f"WIDTH {n_points}\n"
+              "HEIGHT 1\n"
+              "VIEWPOINT 0 0 0 1 0 0 0\n"
+              f"POINTS {n_points}\n"
+              "DATA binary\n")
+    ensure_directory_exists_for_file(path)
+    with open(path, 'wb') as f:
+        f.write(header.encode('ascii'))
+        f.write(data.tobytes())
+
+
+def write_flame_tracking(path: str, n_frames: int):
+    rng = np.random.default_rng(0)
+    rotation = rng.normal(0, 0.1, (n_frames, 3)).astype(np.float32)
+    flame_tracking = dict(
+        shape=rng.normal(0, 1, (1, 300)).astype(np.float32),
+        expression=rng.normal(0, 1, (n_frames, 100)).astype(np.float32),
+        rotation=rotation,
+        rotation_matrices=np.tile(np.eye(3, dtype=np.float32), (n_frames, 1, 1)),
+        translation=rng.normal(0, 0.01, (n_frames, 3)).astype(np.float32),
+        jaw=rng.normal(0, 0.05, (n_frames, 3)).astype(np.float32),
+        frames=np.arange(n_frames),
+        scale=np.ones((1, 1), dtype=np.float32),
+        neck=rng.normal(0, 0.05, (n_frames, 3)).astype(np.float32),
+        eyes=rng.normal(0, 0.05, (n_frames, 6)).astype(np.float32),
+    )
+    ensure_directory_exists_for_file(path)
+    np.savez(path, **flame_tracking)
+
+
+def create_mesh(subdivisions: int = 4) -> Tuple[trimesh.Trimesh, np.ndarray]:
+    """
+    Head-sized ellipsoid (mesh in m) together with 7 landmark positions, as needed for meshes not in FLAME topology.
+    """
+
+    mesh = trimesh.creation.icosphere(subdivisions=subdivisions)
+    mesh.vertices *= np.array([0.08, 0.1, 0.09])
+    landmarks = mesh.vertices[np.linspace(0, len(mesh.vertices) - 1, 7).astype(int)]
+    return mesh, landmarks
+
+
+def write_random_file(path: str, n_bytes: int):
+    ensure_directory_exists_for_file(path)
+    with open(path, 'wb') as f:
+        f.write(np.random.default_rng(0).bytes(n_bytes))
+
+
+# ==========================================================
+# Benchmark folder
+# ==========================================================
+
+def create_benchmark_folder(benchmark_folder: str, n_frames: int, n_serials: int = 2, n_pointcloud_points: int = 100000):
+    """
+    Synthetic NVS and mono FLAME avatar data for one participant each, in the same layout as the downloaded benchmark.
+    """
+
+    nvs_data_manager = NVSDataManager(benchmark_folder, NVS_PARTICIPANT_ID)
+    height, width = NVS_RESOLUTION
+    frames = create_frames(n_frames, height, width)
+    alpha_maps = create_alpha_maps(n_frames, height, width)
+    for serial in BENCHMARK_NVS_TRAIN_SERIALS[:n_serials]:
+        write_video(nvs_data_manager.get_images_path(NVS_SEQUENCE_NAME, serial), frames, fps=73)
+        write_video(nvs_data_manager.get_alpha_maps_path(NVS_SEQUENCE_NAME, serial), alpha_maps, fps=73)
+    write_camera_calibration(nvs_data_manager.get_camera_calibration_path(), BENCHMARK_NVS_TRAIN_SERIALS + BENCHMARK_NVS_HOLD_OUT_SERIALS)
+    write_pointcloud(nvs_data_manager.get_pointcloud_path(NVS_SEQUENCE_NAME, 0), n_pointcloud_points)
+
+    mono_data_manager = MonoFlameAvatarDataManager(benchmark_folder, MONO_FLAME_AVATAR_PARTICIPANT_ID)
+    height, width = MONO_FLAME_AVATAR_RESOLUTION
+    write_video(mono_data_manager.get_images_path(MONO_FLAME_AVATAR_SEQUENCE_NAME, BENCHMARK_MONO_FLAME_AVATAR_TRAIN_SERIAL),
+                create_frames(n_frames, height, width), fps=24.3)
+    write_camera_calibration(mono_data_manager.get_camera_calibration_path(), BENCHMARK_MONO_FLAME_AVATAR_SERIALS)
+    write_flame_tracking(mono_data_manager.get_flame_tracking_path(MONO_FLAME_AVATAR_SEQUENCE_NAME), n_frames)
+
+
+# ==========================================================
+# Offline submission readers
+# ==========================================================
+
+class OfflineNVSSubmissionDataReader(NVSSubmissionDataReader):
+    """
+    Expects the synthetic NVS submission instead of fetching the benchmark metadata from the server.
+    """
+
+    def __init__(self, zip_path: str, n_frames: int):
+        super().__init__(zip_path)
+        self._n_frames = n_frames
+
+    def list_expected_files(self) -> List[str]:
+        return [self.get_video_path(NVS_PARTICIPANT_ID, NVS_SEQUENCE_NAME, serial) for serial in BENCHMARK_NVS_HOLD_OUT_SERIALS]
+
+    def list_expected_video_lengths(self) -> Dict[str, int]:
+        return {expected_file: self._n_frames for expected_file in self.list_expected_files()}
+
+
+class OfflineMonoFlameAvatarSubmissionDataReader(MonoFlameAvatarSubmissionDataReader):
+
+    def __init__(self, zip_path: str, n_frames: int):
+        super().__init__(zip_path)
+        self._n_frames = n_frames
+
+    def list_expected_files(self) -> List[str]:
+        return [self.get_video_path(MONO_FLAME_AVATAR_PARTICIPANT_ID, BENCHMARK_MONO_FLAME_AVATAR_SEQUENCES_TEST[0], serial)
+                for serial in BENCHMARK_MONO_FLAME_AVATAR_SERIALS]
+
+    def list_expected_video_lengths(self) -> Dict[str, int]:
+        return {expected_file: self._n_frames for expected_file in self.list_expected_files()}
+
+
+# ==========================================================
+# Local HTTP server
+# ==========================================================
+
+class RangeRequestHandler(SimpleHTTPRequestHandler):
+    """
+    Static file server with support for single byte ranges and keep-alive, as needed by the downloader.
+    """
+
+    protocol_version = 'HTTP/1.1'
+    supports_ranges = True  # Otherwise, Range headers are ignored like by servers without range support
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_head(self):
+        path = self.translate_path(self.path)
+        if not os.path.isfile(path):
+            self.send_error(404)
+            return None
+
+        size = os.path.getsize(path)
+        start, end = 0, size - 1
+        range_header = self.headers.get('Range') if self.supports_ranges else None
+        if range_header is not None:
+            matches = re.match(r'bytes=(\d+)-(\d*)', range_header)
+            start = int(matches.group(1))
+            end = int(matches.group(2)) if matches.group(2) else size - 1
+            if start >= size:
+                self.send_response(416)
+                self.send_header('Content-Range', f"bytes */{size}")
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return None
+            self.send_response(206)
+            self.send_header('Content-Range', f"bytes {start}-{end}/{size}")
+        else:
+            self.send_response(200)
+
+        self.send_header('Content-Length', str(end - start + 1))
+        if self.supports_ranges:
+            self.send_header('Accept-Ranges', 'bytes')
+        self.end_headers()
+
+        f = open(path, 'rb')
+        f.seek(start)
+        self._n_remaining_bytes = end - start + 1
+        return f
+
+    def copyfile(self, source, outputfile):
+        while self._n_remaining_bytes > 0:
+            chunk = source.read(min(self._n_remaining_bytes, 1024 * 1024))
+            if not chunk:
+                break
+            outputfile.write(chunk)
+            self._n_remaining_bytes -= len(chunk)
+
+
+class LocalFileServer:
+    """
+    Serves a local folder via HTTP in a background thread. Use as context manager, `url` is the base URL of the folder.
+    A subclass of `RangeRequestHandler` can be passed to simulate misbehaving servers.
+    """
+
+    def __init__(self, folder: str, handler_class: type = RangeRequestHandler):
+        self._folder = str(Path(folder).resolve())
+
+        def handler(*args, **kwargs):
+            return handler_class(*args, directory=self._folder, **kwargs)
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+        self._server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self._server.server_address[1]}"
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._server.shutdown()
+        self._server.server_close()
@@ -0,0 +1,362 @@
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import time
+import traceback
+from dataclasses import dataclass, asdict
+from datetime import datetime, timezone
+from importlib.metadata import version, PackageNotFoundError
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from typing import Callable, List, Optional, Dict
+
+import numpy as np
+import tyro
+from elias.util import ensure_directory_exists_for_file
+
+from fixtures import create_benchmark_folder, create_frames, create_mesh, write_random_file, LocalFileServer, OfflineNVSSubmissionDataReader, \
+    OfflineMonoFlameAvatarSubmissionDataReader, NVS_PARTICIPANT_ID, NVS_SEQUENCE_NAME, NVS_RESOLUTION, MONO_FLAME_AVATAR_PARTICIPANT_ID, \
+    MONO_FLAME_AVATAR_SEQUENCE_NAME, MONO_FLAME_AVATAR_RESOLUTION
+from nersemble_benchmark.constants import BENCHMARK_NVS_TRAIN_SERIALS, BENCHMARK_NVS_HOLD_OUT_SERIALS, BENCHMARK_MONO_FLAME_AVATAR_SEQUENCES_TEST, \
+    BENCHMARK_MONO_FLAME_AVATAR_SERIALS, BENCHMARK_SVFR_IMAGE_KEYS
+from nersemble_benchmark.data.benchmark_data import NVSDataManager, MonoFlameAvatarDataManager
+from nersemble_benchmark.data.preprocessing import PREPROCESS_STEPS
+from nersemble_benchmark.data.ray_sampling import RaySampler
+from nersemble_benchmark.data.submission_data import NVSSubmissionDataWriter, MonoFlameAvatarSubmissionDataWriter, SVFRSubmissionDataWriter, \
+    SVFRSubmissionDataReader, get_shard_items, get_shard_path, merge_submission_shards
+
+
+@dataclass
+class BenchmarkResult:
+    name: str
+    n_items: float
+    unit: str
+    seconds: List[float]  # One entry per repetition
+    items_per_second: float  # Based on the fastest repetition
+    error: Optional[str] = None
+
+
+class BenchmarkSuite:
+    def __init__(self, n_repeats: int, only: Optional[List[str]] = None):
+        self._n_repeats = n_repeats
+        self._only = only
+        self.results: List[BenchmarkResult] = []
+
+    def run(self, name: str, fn: Callable[[], None], n_items: float, unit: str = 'frame', setup: Optional[Callable[[], None]] = None) -> bool:
+        """
+        Returns whether the benchmark ran successfully.
+        """
+
+        if self._only is not None and not any(name.startswith(prefix) for prefix in self._only):
+            return False
+
+        seconds = []
+        error = None
+        try:
+            for _ in range(self._n_repeats):
+                if setup is not None:
+                    setup()
+                start = time.perf_counter()
+                fn()
+                seconds.append(time.perf_counter() - start)
+        except Exception as e:
+            # Benchmarks with missing optional dependencies (e.g., FLAME model, ffmpeg) are recorded as failed instead of aborting the suite
+            error = f"{type(e).__name__}: {e}"
+            traceback.print_exc()
+
+        items_per_second = n_items / min(seconds) if seconds and error is None else float('nan')
+        result = BenchmarkResult(name, n_items, unit, seconds, items_per_second, error=error)
+        self.results.append(result)
+
+        if error is None:
+            print(f"{name:<45} {items_per_second:>12.2f} {unit}/s")
+        else:
+            print(f"{name:<45} {'FAILED':>12} ({error})")
+
+        return error is None
+
+
+def main(output_path: Path,
+         /,
+         n_frames: int = 20,
+         n_repeats: int = 3,
+         n_download_workers: int = 4,
+         only: Optional[List[str]] = None,
+         baseline: Optional[Path] = None,
+         work_folder: Optional[Path] = None):
+    """
+    Measures the throughput of the toolkit's data loading, submission and download paths on synthetic data.
+    No benchmark data or network access is required.
+
+    Parameters
+    ----------
+    output_path:
+        Where to store the results JSON
+    n_frames:
+        Number of frames of the synthetic videos
+    n_repeats:
+        Every benchmark is repeated this many times. Throughput is reported for the fastest repetition
+    n_download_workers:
+        Number of parallel downloads for the downloader benchmark
+    only:
+        Only run benchmarks whose names start with any of the given prefixes (e.g., 'nvs.' or 'submission.svfr')
+    baseline:
+        Results JSON of a previous run. If given, the relative change in throughput is printed for every benchmark
+    work_folder:
+        Where to create the synthetic data. Default: a temporary folder that is deleted afterward
+    """
+
+    if work_folder is None:
+        with TemporaryDirectory() as temp_dir:
+            return main(output_path, n_frames=n_frames, n_repeats=n_repeats, n_download_workers=n_download_workers, only=only, baseline=baseline,
+                        work_folder=Path(temp_dir))
+
+    benchmark_folder = f"{work_folder}/benchmark"
+    print(f"Creating synthetic benchmark data in {work_folder}...")
+    create_benchmark_folder(benchmark_folder, n_frames)
+
+    suite = BenchmarkSuite(n_repeats, only=only)
+    run_data_manager_benchmarks(suite, benchmark_folder, n_frames)
+    run_submission_benchmarks(suite, str(work_folder), n_frames)
+    run_download_benchmarks(suite, str(work_folder), benchmark_folder, n_download_workers)
+
+    results = dict(
+        created_at=datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        environment=get_environment_info(),
+        config=dict(n_frames=n_frames, n_repeats=n_repeats, n_download_workers=n_download_workers),
+        results=[asdict(result) for result in suite.results])
+
+    ensure_directory_exists_for_file(str(output_path))
+    with open(output_path, 'w') as f:
+        json.dump(results, f, indent=1)
+    print(f"Saved results to {output_path}")
+
+    if baseline is not None:
+        compare_to_baseline(suite.results, baseline)
+
+
+# ==========================================================
+# Benchmarks
+# ==========================================================
+
+def run_data_manager_benchmarks(suite: BenchmarkSuite, benchmark_folder: str, n_frames: int):
+    data_manager = NVSDataManager(benchmark_folder, NVS_PARTICIPANT_ID)
+    serial = BENCHMARK_NVS_TRAIN_SERIALS[0]
+    random_timesteps = np.random.default_rng(0).permutation(n_frames)
+    local_serials = [serial for serial in BENCHMARK_NVS_TRAIN_SERIALS if data_manager.has_video(NVS_SEQUENCE_NAME, serial)]
+
+    def load_images(timesteps):
+        for timestep in timesteps:
+            data_manager.load_image(NVS_SEQUENCE_NAME, serial, timestep, as_uint8=True)
+
+    suite.run("nvs.load_image.sequential", lambda: load_images(range(n_frames)), n_frames)
+    suite.run("nvs.load_image.random", lambda: load_images(random_timesteps), n_frames)
+    # Temporal windows of 9 frames, e.g., for temporal losses
+    window_starts = range(0, n_frames, 9)
+    suite.run("nvs.load_images.window",
+              lambda: [data_manager.load_images(NVS_SEQUENCE_NAME, serial, slice(t, min(t + 9, n_frames)), as_uint8=True) for t in window_starts],
+              n_frames)
+    suite.run("nvs.load_all_images", lambda: data_manager.load_all_images(NVS_SEQUENCE_NAME, serial, as_uint8=True), n_frames)
+    suite.run("nvs.load_all_images.crop_alpha_bbox",
+              lambda: data_manager.load_all_images(NVS_SEQUENCE_NAME, serial, as_uint8=True, crop='alpha_bbox'), n_frames,
+              setup=lambda: data_manager.load_alpha_bboxes(NVS_SEQUENCE_NAME, serial))
+    multi_view_frame_keys = [(serial, timestep) for serial in local_serials for timestep in range(n_frames)]
+    suite.run("nvs.iter_images_multiprocess",
+              lambda: sum(1 for _ in data_manager.iter_images_multiprocess(NVS_SEQUENCE_NAME, multi_view_frame_keys)),
+              len(multi_view_frame_keys))
+    suite.run("nvs.load_all_images.scale_0.25", lambda: data_manager.load_all_images(NVS_SEQUENCE_NAME, serial, as_uint8=True, scale=0.25), n_frames)
+    suite.run("nvs.build_pyramid", lambda: data_manager.build_pyramid(NVS_SEQUENCE_NAME, serial), n_frames)
+    suite.run("nvs.load_all_images.scale_0.25.pyramid",
+              lambda: data_manager.load_all_images(NVS_SEQUENCE_NAME, serial, as_uint8=True, scale=0.25), n_frames,
+              setup=lambda: data_manager.load_pyramid(NVS_SEQUENCE_NAME, serial) or data_manager.build_pyramid(NVS_SEQUENCE_NAME, serial))
+
+    ray_samplers = []
+    suite.run("nvs.ray_sampler.init",
+              lambda: ray_samplers.append(RaySampler(data_manager, NVS_SEQUENCE_NAME, local_serials, scale=0.25, foreground_only=True)),
+              n_frames * len(local_serials), setup=ray_samplers.clear)
+    if ray_samplers:
+        suite.run("nvs.ray_sampler.sample", lambda: [ray_samplers[0].sample(65536) for _ in range(10)], 10, unit='batch')
+    suite.run("nvs.load_alpha_map.sequential",
+              lambda: [data_manager.load_alpha_map(NVS_SEQUENCE_NAME, serial, timestep) for timestep in range(n_frames)], n_frames)
+    suite.run("nvs.load_all_alpha_maps", lambda: data_manager.load_all_alpha_maps(NVS_SEQUENCE_NAME, serial), n_frames)
+    suite.run("nvs.load_multi_view_alpha_maps",
+              lambda: [data_manager.load_multi_view_alpha_maps(NVS_SEQUENCE_NAME, local_serials, timestep) for timestep in range(n_frames)],
+              n_frames * len(local_serials))
+    suite.run("nvs.load_camera_calibration", lambda: [data_manager.load_camera_calibration() for _ in range(100)], 100, unit='call')
+    suite.run("nvs.load_pointcloud", lambda: data_manager.load_pointcloud(NVS_SEQUENCE_NAME, 0), 1, unit='pointcloud')
+
+    mono_data_manager = MonoFlameAvatarDataManager(benchmark_folder, MONO_FLAME_AVATAR_PARTICIPANT_ID)
+    suite.run("mono_flame_avatar.load_flame_tracking",
+              lambda: [mono_data_manager.load_flame_tracking(MONO_FLAME_AVATAR_SEQUENCE_NAME) for _ in range(100)], 100, unit='call')
+
+    def run_flame_provider():
+        from nersemble_benchmark.models.flame import FlameProvider
+
+        flame_provider = FlameProvider(mono_data_manager.load_flame_tracking(MONO_FLAME_AVATAR_SEQUENCE_NAME))
+        for timestep in range(n_frames):
+            flame_provider.get_vertices(timestep)
+
+    suite.run("mono_flame_avatar.flame_provider.get_vertices", run_flame_provider, n_frames)
+
+
+def run_submission_benchmarks(suite: BenchmarkSuite, work_folder: str, n_frames: int):
+    # NVS
+    nvs_zip_path = f"{work_folder}/submissions/nvs_submission.zip"
+    nvs_frames = list(create_frames(n_frames, *NVS_RESOLUTION, seed=1))
+    hold_out_serial = BENCHMARK_NVS_HOLD_OUT_SERIALS[0]
+
+    def write_nvs_submission():
+        with NVSSubmissionDataWriter(nvs_zip_path) as submission_writer:
+            for serial in BENCHMARK_NVS_HOLD_OUT_SERIALS:
+                submission_writer.add_video(NVS_PARTICIPANT_ID, NVS_SEQUENCE_NAME, serial, nvs_frames)
+
+    n_nvs_frames = n_frames * len(BENCHMARK_NVS_HOLD_OUT_SERIALS)
+    # Reading benchmarks need the submission that is written by the writing benchmark
+    if suite.run("submission.nvs.add_video", write_nvs_submission, n_nvs_frames):
+        suite.run("submission.nvs.load_video",
+                  lambda: OfflineNVSSubmissionDataReader(nvs_zip_path, n_frames).load_video(NVS_PARTICIPANT_ID, NVS_SEQUENCE_NAME, hold_out_serial),
+                  n_frames)
+        suite.run("submission.nvs.load_images.window",
+                  lambda: OfflineNVSSubmissionDataReader(nvs_zip_path, n_frames).load_images(NVS_PARTICIPANT_ID, NVS_SEQUENCE_NAME, hold_out_serial,
+                                                                                             slice(0, min(9, n_frames))),
+                  min(9, n_frames))
+        suite.run("submission.nvs.validate_submission",
+                  lambda: OfflineNVSSubmissionDataReader(nvs_zip_path, n_frames).validate_submission(), n_nvs_frames)
+
+    # Partial submissions of 2 shards, merged without re-encoding
+    n_shards = 2
+    nvs_shard_paths = [get_shard_path(nvs_zip_path, shard_id, n_shards) for shard_id in range(n_shards)]
+
+    def write_nvs_shards():
+        nvs_items = [(NVS_PARTICIPANT_ID, NVS_SEQUENCE_NAME, serial) for serial in BENCHMARK_NVS_HOLD_OUT_SERIALS]
+        for shard_id, shard_path in enumerate(nvs_shard_paths):
+            with NVSSubmissionDataWriter(shard_path) as submission_writer:
+                for participant_id, sequence_name, serial in get_shard_items(nvs_items, shard_id, n_shards):
+                    submission_writer.add_video(participant_id, sequence_name, serial, nvs_frames)
+
+    if suite.run("submission.nvs.add_video.sharded", write_nvs_shards, n_nvs_frames):
+        suite.run("submission.nvs.merge_shards",
+                  lambda: merge_submission_shards(nvs_shard_paths, f"{work_folder}/submissions/nvs_submission_merged.zip"), n_nvs_frames)
+
+    # Mono FLAME avatar
+    mono_zip_path = f"{work_folder}/submissions/mono_flame_avatar_submission.zip"
+    mono_frames = list(create_frames(n_frames, *MONO_FLAME_AVATAR_RESOLUTION, seed=2))
+    mono_sequence_name = BENCHMARK_MONO_FLAME_AVATAR_SEQUENCES_TEST[0]
+
+    def write_mono_submission():
+        with MonoFlameAvatarSubmissionDataWriter(mono_zip_path) as submission_writer:
+            for serial in BENCHMARK_MONO_FLAME_AVATAR_SERIALS:
+                submission_writer.add_video(MONO_FLAME_AVATAR_PARTICIPANT_ID, mono_sequence_name, serial, mono_frames)
+
+    n_mono_frames = n_frames * len(BENCHMARK_MONO_FLAME_AVATAR_SERIALS)
+    if suite.run("submission.mono_flame_avatar.add_video", write_mono_submission, n_mono_frames):
+        suite.run("submission.mono_flame_avatar.load_video",
+                  lambda: OfflineMonoFlameAvatarSubmissionDataReader(mono_zip_path, n_frames).load_video(
+                      MONO_FLAME_AVATAR_PARTICIPANT_ID, mono_sequence_name, BENCHMARK_MONO_FLAME_AVATAR_SERIALS[0]),
+                  n_frames)
+        suite.run("submission.mono_flame_avatar.validate_submission",
+                  lambda: OfflineMonoFlameAvatarSubmissionDataReader(mono_zip_path, n_frames).validate_submission(), n_mono_frames)
+
+    # SVFR
+    svfr_zip_path = f"{work_folder}/submissions/svfr_submission.zip"
+    mesh, landmarks = create_mesh()
+    svfr_keys = [(participant_id, sequence_name, timestep, serial)
+                 for participant_id, image_keys in BENCHMARK_SVFR_IMAGE_KEYS.items()
+                 for sequence_name, timestep, serial in image_keys]
+
+    def write_svfr_submission():
+        with SVFRSubmissionDataWriter(svfr_zip_path) as submission_writer:
+            for participant_id, sequence_name, timestep, serial in svfr_keys:
+                submission_writer.add_posed_mesh(participant_id, sequence_name, timestep, serial, mesh, landmarks)
+
+    def load_svfr_submission():
+        submission_reader = SVFRSubmissionDataReader(svfr_zip_path)
+        for svfr_key in svfr_keys:
+            submission_reader.load_posed_mesh(*svfr_key)
+            submission_reader.load_posed_landmarks(*svfr_key)
+
+    if suite.run("submission.svfr.add_posed_mesh", write_svfr_submission, len(svfr_keys), unit='mesh'):
+        suite.run("submission.svfr.load_posed_mesh", load_svfr_submission, len(svfr_keys), unit='mesh')
+        suite.run("submission.svfr.validate_submission", lambda: SVFRSubmissionDataReader(svfr_zip_path).validate_submission(),
+                  len(svfr_keys), unit='mesh')
+
+
+def run_download_benchmarks(suite: BenchmarkSuite,
+                            work_folder: str,
+                            benchmark_folder: str,
+                            n_download_workers: int,
+                            n_files: int = 8,
+                            file_size_mb: int = 32):
+    from nersemble_benchmark.scripts.download_data import download_urls, collect_relative_urls
+
+    # Incompressible payload, served from a local HTTP server
+    server_folder = f"{work_folder}/server"
+    relative_urls = [f"download_benchmark/file_{i_file:02d}.bin" for i_file in range(n_files)]
+    for relative_url in relative_urls:
+        write_random_file(f"{server_folder}/nvs/{relative_url}", file_size_mb * 1024 ** 2)
+
+    download_folder = Path(f"{work_folder}/download")
+
+    def clear_download_folder():
+        shutil.rmtree(download_folder, ignore_errors=True)
+
+    with LocalFileServer(server_folder) as file_server:
+        suite.run("download.download_urls",
+                  lambda: download_urls(download_folder, 'nvs', relative_urls, n_workers=n_download_workers, base_url=file_server.url),
+                  n_files * file_size_mb, unit='MB', setup=clear_download_folder)
+
+    # Download the synthetic NVS data and preprocess it while downloading
+    serials = [serial for serial in BENCHMARK_NVS_TRAIN_SERIALS if NVSDataManager(benchmark_folder, NVS_PARTICIPANT_ID).has_video(NVS_SEQUENCE_NAME, serial)]
+    nvs_relative_urls = collect_relative_urls('nvs', [(NVS_PARTICIPANT_ID, NVS_SEQUENCE_NAME, serials, None)],
+                                              ['calibration', 'images', 'alpha_maps', 'pointclouds'])
+    nvs_size_mb = sum(os.path.getsize(f"{benchmark_folder}/nvs/{relative_url}") for relative_url in nvs_relative_urls) / 1024 ** 2
+    with LocalFileServer(benchmark_folder) as file_server:
+        suite.run("download.download_urls.preprocess",
+                  lambda: download_urls(download_folder, 'nvs', nvs_relative_urls, n_workers=n_download_workers, base_url=file_server.url,
+                                        preprocess_steps=PREPROCESS_STEPS),
+                  nvs_size_mb, unit='MB', setup=clear_download_folder)
+
+
+# ==========================================================
+# Reporting
+# ==========================================================
+
+def get_environment_info() -> Dict:
+    try:
+        package_version = version('nersemble_benchmark')
+    except PackageNotFoundError:
+        package_version = None
+
+    try:
+        git_commit = subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=Path(__file__).parent, stderr=subprocess.DEVNULL).decode().strip()
+    except (subprocess.CalledProcessError, FileNotFoundError):
+        git_commit = None
+
+    return dict(package_version=package_version,
+                git_commit=git_commit,
+                python_version=sys.version.split()[0],
+                numpy_version=np.__version__,
+                platform=platform.platform(),
+                processor=platform.processor(),
+                n_cpus=os.cpu_count())
+
+
+def compare_to_baseline(results: List[BenchmarkResult], baseline_path: Path):
+    with open(baseline_path, 'r') as f:
+        baseline_results = {result['name']: result for result in json.load(f)['results']}
+
+    print(f"\nComparison to {baseline_path}:")
+    print(f"{'benchmark':<45} {'baseline':>12} {'current':>12} {'change':>8}")
+    for result in results:
+        baseline_result = baseline_results.get(result.name)
+        if baseline_result is None or baseline_result['error'] is not None or result.error is not None:
+            continue
+        change = result.items_per_second / baseline_result['items_per_second'] - 1
+        print(f"{result.name:<45} {baseline_result['items_per_second']:>12.2f} {result.items_per_second:>12.2f} {change:>+8.1%}")
+
+
+if __name__ == '__main__':
+    tyro.cli(main)
@@ -0,0 +1,4 @@
+from nersemble_benchmark.scripts.check_data import main_cli
+
+if __name__ == '__main__':
+    main_cli()
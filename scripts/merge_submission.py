@@ -0,0 +1,4 @@
+from nersemble_benchmark.scripts.merge_submission import main_cli
+
+if __name__ == '__main__':
+    main_cli()
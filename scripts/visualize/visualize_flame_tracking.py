@@ -1,7 +1,7 @@
 import numpy as np
 import tyro
 from dreifus.pyvista import add_camera_frustum, add_coordinate_axes
-from dreifus.render import project, draw_onto_image
+from dreifus.render import draw_onto_image
 import pyvista as pv
 
 from nersemble_benchmark.constants import BENCHMARK_MONO_FLAME_AVATAR_TRAIN_SERIAL, BENCHMARK_MONO_FLAME_AVATAR_HOLD_OUT_SERIALS
@@ -29,6 +29,11 @@ def main(benchmark_folder: str,
     p.add_mesh(mesh)
 
     serials = [BENCHMARK_MONO_FLAME_AVATAR_TRAIN_SERIAL] + BENCHMARK_MONO_FLAME_AVATAR_HOLD_OUT_SERIALS
+
+    # Project the FLAME vertices onto all cameras at once to ensure that the positioning of the FLAME mesh is correct
+    stacked_camera_calibration = camera_calibration.stack(serials)
+    all_projected_vertices = stacked_camera_calibration.project(mesh.vertices)
+
     for serial in serials:
         pose = camera_calibration.world_2_cam[serial]
         intrinsics = camera_calibration.intrinsics[serial]
@@ -39,8 +44,7 @@ def main(benchmark_folder: str,
             # Otherwise, just show a black image (unknown)
             image = np.zeros((512, 512, 3))
 
-        # Project the FLAME vertices onto the camera to ensure that the positioning of the FLAME mesh is correct
-        projected_vertices = project(mesh.vertices, pose, intrinsics)
+        projected_vertices = all_projected_vertices[stacked_camera_calibration.index(serial)]
         draw_onto_image(image, projected_vertices, (0, 255, 0))
 
         # Visualize camera with projected FLAME vertices + potential GT image
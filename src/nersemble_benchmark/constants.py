@@ -48,6 +48,16 @@ OPTIONAL_ASSETS = ["flame2023_tracking"]
 FLAME_TRACKING_CURRENT_VERSION = 2
 FLAME_TRACKING_VERSION_MAPPING = {1: "flame2023_tracking", 2: "flame2023_tracking_v2"}
 
+# Small assets that are needed to start working with a sequence are downloaded before the large ones
+ASSET_DOWNLOAD_PRIORITIES = {
+    "calibration": 0,
+    "flame2023_tracking_v2": 1,
+    "flame2023_tracking": 1,
+    "images": 2,
+    "alpha_maps": 3,
+    "pointclouds": 4,
+}
+
 SERIALS = ["222200042", "222200044", "222200046", "222200040", "222200036", "222200048", "220700191", "222200041",
            "222200037", "222200038", "222200047", "222200043", "222200049", "222200039", "222200045", "221501007"]
 
@@ -1,19 +1,29 @@
 import re
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from itertools import islice
 from pathlib import Path
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple, Union, Sequence
 
 import numpy as np
-import open3d as o3d
 from dreifus.camera import CameraCoordinateConvention, PoseType
 from dreifus.matrix import Pose, Intrinsics
 from elias.config import Config
-from elias.util import load_json
+from elias.util import load_json, save_json
 from elias.util.io import resize_img, load_img
 
 from nersemble_benchmark.constants import ASSETS, FLAME_TRACKING_CURRENT_VERSION, FLAME_TRACKING_VERSION_MAPPING
-from nersemble_benchmark.util.video import VideoFrameLoader
+from nersemble_benchmark.data.frame_ring_buffer import MultiProcessFrameLoader
+from nersemble_benchmark.util.alpha_bbox import BBox, CropMode, compute_alpha_bboxes, save_alpha_bboxes, load_alpha_bboxes, \
+    load_alpha_bboxes_source, get_union_bbox, pad_bbox, crop_to_bbox
+from nersemble_benchmark.util.benchmark_index import get_benchmark_index, SVFRImageKey
+from nersemble_benchmark.util.cache import load_cached, get_file_version
+from nersemble_benchmark.util.camera import StackedCameraParams, stack_camera_params
+from nersemble_benchmark.util.packed_images import PackedImages
+from nersemble_benchmark.util.pointcloud import read_pointcloud, PackedPointClouds
+from nersemble_benchmark.util.profiling import profiled, timed
+from nersemble_benchmark.util.pyramid import FramePyramid, DEFAULT_PYRAMID_SCALES
+from nersemble_benchmark.util.video import VideoFrameLoader, FrameDecoder, probe_resolution, probe_keyframes, resolve_frame_ids
 
 
 @dataclass
@@ -21,6 +31,28 @@ class CameraParams(Config):
     world_2_cam: Dict[str, Pose]
     intrinsics: Dict[str, Intrinsics]
 
+    def stack(self, serials: Optional[List[str]] = None) -> StackedCameraParams:
+        """
+        Stacks the calibration of the given serials (default: all) into (C, 4, 4) world_2_cam and (C, 3, 3) intrinsics arrays
+        for projecting points into all cameras at once.
+        """
+
+        return stack_camera_params(self.world_2_cam, self.intrinsics, serials=serials)
+
+
+def _parse_camera_calibration(path: str) -> StackedCameraParams:
+    camera_params = load_json(path)
+    return stack_camera_params(camera_params['world_2_cam'], camera_params['intrinsics'])
+
+
+def _to_alpha_map(alpha_map: np.ndarray, as_uint8: bool) -> np.ndarray:
+    alpha_map = alpha_map[..., None]  # (H, W) -> (H, W, 1) view, stays contiguous
+    if not as_uint8:
+        with timed("data_manager.dtype_conversion"):
+            alpha_map = alpha_map.astype(np.float32) / 255
+    return alpha_map
+
+
 # ==========================================================
 # BaseDataManager for accessing (multi-view) video data
 # ==========================================================
@@ -30,20 +62,33 @@ class BaseDataManager:
         self._location = f"{benchmark_folder}/{benchmark_type}"
         self._benchmark_type = benchmark_type
         self._participant_id = participant_id
+        self._cropped_images: Dict[Tuple[str, str], Tuple[PackedImages, BBox, Optional[str]]] = dict()  # store, its crop box and source
+        self._pyramids: Dict[Tuple[str, str], FramePyramid] = dict()
 
     # ----------------------------------------------------------
     # Assets
     # ----------------------------------------------------------
 
+    @profiled("data_manager.load_camera_calibration")
     def load_camera_calibration(self) -> CameraParams:
-        camera_params = load_json(self.get_camera_calibration_path())
-        world_2_cam = camera_params['world_2_cam']
+        stacked_camera_params = self.load_stacked_camera_calibration()
         world_2_cam = {serial: Pose(pose, camera_coordinate_convention=CameraCoordinateConvention.OPEN_CV, pose_type=PoseType.WORLD_2_CAM)
-                       for serial, pose in world_2_cam.items()}
-        intrinsics = {serial: Intrinsics(intr) for serial, intr in camera_params['intrinsics'].items()}
+                       for serial, pose in zip(stacked_camera_params.serials, stacked_camera_params.world_2_cam)}
+        intrinsics = {serial: Intrinsics(intr) for serial, intr in zip(stacked_camera_params.serials, stacked_camera_params.intrinsics)}
         camera_params = CameraParams(world_2_cam, intrinsics)
         return camera_params
 
+    def load_stacked_camera_calibration(self, serials: Optional[List[str]] = None) -> StackedCameraParams:
+        """
+        The parsed calibration is cached per process (see `nersemble_benchmark.util.cache`), repeated calls do not touch the JSON file.
+        The returned arrays are read-only.
+        """
+
+        stacked_camera_params = load_cached(self.get_camera_calibration_path(), _parse_camera_calibration)
+        if serials is not None:
+            stacked_camera_params = stacked_camera_params.select(serials)
+        return stacked_camera_params
+
     def list_timesteps(self, sequence_name: str) -> List[int]:
         return list(range(self.get_n_timesteps(sequence_name)))
 
@@ -54,37 +99,177 @@ class BaseDataManager:
 
     def list_serials(self, sequence_name: str) -> List[str]:
         images_folder = Path(self.get_images_path(sequence_name, "serial")).parent
-        serials = [file.stem.split('_')[1] for file in images_folder.iterdir()]
+        serials = [file.stem.split('_')[1] for file in images_folder.iterdir() if file.suffix == '.mp4']
         return serials
 
+    def get_keyframes(self, sequence_name: str, serial: str) -> np.ndarray:
+        """
+        Sorted timesteps of the keyframes of the video, i.e., where decoding can start after a seek.
+        """
+
+        return load_cached(self.get_images_path(sequence_name, serial), probe_keyframes)
+
     def get_n_timesteps(self, sequence_name: str) -> int:
         serial = self.list_serials(sequence_name)[0]
         video_capture = VideoFrameLoader(self.get_images_path(sequence_name, serial))
         n_frames = video_capture.get_n_frames()
         return n_frames
 
-    def load_alpha_map(self, sequence_name: str, serial: str, timestep: int) -> np.ndarray:
+    @profiled("data_manager.load_alpha_map")
+    def load_alpha_map(self,
+                       sequence_name: str,
+                       serial: str,
+                       timestep: int,
+                       as_uint8: bool = True,
+                       crop: Optional[CropMode] = None,
+                       crop_padding: int = 32) -> np.ndarray:
+        """
+        Alpha maps are decoded straight to a single channel and returned as contiguous (H, W, 1) uint8 array (or float32 in [0, 1]).
+        See `load_image()` for `crop`.
+        """
+
+        video_capture = VideoFrameLoader(self.get_alpha_maps_path(sequence_name, serial))
+        alpha_map = video_capture.load_gray_frame(timestep)
+        video_capture.close()
+        if crop is not None:
+            alpha_map = np.ascontiguousarray(self._crop(alpha_map, sequence_name, serial, timestep, crop, crop_padding))
+        return _to_alpha_map(alpha_map, as_uint8)
+
+    @profiled("data_manager.load_all_alpha_maps")
+    def load_all_alpha_maps(self,
+                            sequence_name: str,
+                            serial: str,
+                            as_uint8: bool = True,
+                            every_nth_frame: Optional[int] = None,
+                            scale: Optional[float] = None,
+                            crop: Optional[CropMode] = None,
+                            crop_padding: int = 32) -> List[np.ndarray]:
         video_capture = VideoFrameLoader(self.get_alpha_maps_path(sequence_name, serial))
-        image = video_capture.load_frame(timestep)[..., [0]]
+        alpha_maps = video_capture.load_all_gray_frames()
+        if every_nth_frame is not None:
+            alpha_maps = islice(alpha_maps, 0, None, every_nth_frame)
+
+        if crop is not None:
+            step = 1 if every_nth_frame is None else every_nth_frame
+            alpha_maps = [np.ascontiguousarray(self._crop(alpha_map, sequence_name, serial, i * step, crop, crop_padding))
+                          for i, alpha_map in enumerate(alpha_maps)]
+
+        if scale is not None:
+            with timed("data_manager.resize"):
+                alpha_maps = [resize_img(alpha_map, scale) for alpha_map in alpha_maps]
+
+        return [_to_alpha_map(alpha_map, as_uint8) for alpha_map in alpha_maps]
+
+    @profiled("data_manager.load_multi_view_alpha_maps")
+    def load_multi_view_alpha_maps(self,
+                                   sequence_name: str,
+                                   serials: List[str],
+                                   timestep: int,
+                                   as_uint8: bool = True,
+                                   n_workers: int = 4) -> np.ndarray:
+        """
+        Alpha maps of the same timestep from multiple cameras as a single (C, H, W, 1) array. The videos are decoded in parallel
+        threads.
+        """
+
+        with ThreadPoolExecutor(max_workers=n_workers) as executor:
+            alpha_maps = list(executor.map(lambda serial: self.load_alpha_map(sequence_name, serial, timestep, as_uint8=as_uint8), serials))
+
+        return np.stack(alpha_maps)
+
+    @profiled("data_manager.load_image")
+    def load_image(self,
+                   sequence_name: str,
+                   serial: str,
+                   timestep: int,
+                   as_uint8: bool = False,
+                   crop: Optional[CropMode] = None,
+                   crop_padding: int = 32) -> np.ndarray:
+        """
+        Parameters
+        ----------
+        crop:
+            Crops the frame to the foreground before any conversion (see `get_crop_bbox()`):
+             - 'alpha_bbox': bounding box of the alpha map of this timestep. Image sizes differ between timesteps
+             - 'alpha_bbox_video': bounding box over all timesteps of the video. All images of the video have the same size
+            Frames are read from the cropped frame store (see `pack_cropped_images()`) if it covers the crop.
+        crop_padding:
+            The bounding box is grown by this many pixels on every side
+        """
+
+        video_path = self.get_images_path(sequence_name, serial)
+        if crop is not None:
+            bbox = self.get_crop_bbox(sequence_name, serial, timestep, crop=crop, padding=crop_padding)
+            image = self._load_from_cropped_images(sequence_name, serial, timestep, bbox)
+            if image is None:
+                assert Path(video_path).exists(), f"Could not find video {video_path}"
+                image = np.ascontiguousarray(crop_to_bbox(VideoFrameLoader(video_path).load_frame(timestep), bbox))
+        else:
+            assert Path(video_path).exists(), f"Could not find video {video_path}"
+            video_capture = VideoFrameLoader(video_path)
+            image = video_capture.load_frame(timestep)
+
+        if not as_uint8:
+            with timed("data_manager.dtype_conversion"):
+                image = image / 255.
+
         return image
 
-    def load_image(self, sequence_name: str, serial: str, timestep: int, as_uint8: bool = False) -> np.ndarray:
+    @profiled("data_manager.load_images")
+    def load_images(self,
+                    sequence_name: str,
+                    serial: str,
+                    timesteps: Union[Sequence[int], slice],
+                    as_uint8: bool = False) -> List[np.ndarray]:
+        """
+        Loads several frames of a video, e.g., a temporal window `slice(t - 4, t + 5)`, in the given order.
+        The decoder seeks once to the keyframe before the first requested frame and decodes forward, it only seeks again to
+        skip whole GOPs (groups of pictures) between requested frames. See `FrameDecoder.load_frames()`.
+
+        Parameters
+        ----------
+        timesteps:
+            List of timesteps or a slice of all timesteps of the video
+        """
+
         video_path = self.get_images_path(sequence_name, serial)
         assert Path(video_path).exists(), f"Could not find video {video_path}"
         video_capture = VideoFrameLoader(video_path)
-        image = video_capture.load_frame(timestep)
+        timesteps = resolve_frame_ids(timesteps, video_capture.get_n_frames())
+        images = video_capture.load_frames(timesteps)
+        video_capture.close()
 
         if not as_uint8:
-            image = image / 255.
+            with timed("data_manager.dtype_conversion"):
+                images = [image / 255. for image in images]
 
-        return image
+        return images
 
+    @profiled("data_manager.load_all_images")
     def load_all_images(self,
                         sequence_name: str,
                         serial: str,
                         as_uint8: bool = False,
                         every_nth_frame: Optional[int] = None,
-                        scale: Optional[float] = None) -> List[np.ndarray]:
+                        scale: Optional[float] = None,
+                        crop: Optional[CropMode] = None,
+                        crop_padding: int = 32) -> List[np.ndarray]:
+        """
+        See `load_image()` for `crop`. Cropping happens before resizing and dtype conversion.
+        If a frame pyramid was built for the video (see `build_pyramid()`), scaled frames are served from it without decoding
+        the full-resolution video.
+        """
+
+        pyramid = self.load_pyramid(sequence_name, serial) if scale is not None and crop is None else None
+        if pyramid is not None and pyramid.covers(scale):
+            timesteps = None if every_nth_frame is None else range(0, pyramid.n_frames, every_nth_frame)
+            with timed("data_manager.load_pyramid"):
+                images = pyramid.load(scale, timesteps=timesteps)
+            if not as_uint8:
+                with timed("data_manager.dtype_conversion"):
+                    images = [image / 255. for image in images]
+            return images
+
         video_path = self.get_images_path(sequence_name, serial)
         assert Path(video_path).exists(), f"Could not find video {video_path}"
         video_capture = VideoFrameLoader(video_path)
@@ -97,14 +282,53 @@ class BaseDataManager:
         else:
             images = list(video_capture.load_all_frames())
 
+        if crop is not None:
+            step = 1 if every_nth_frame is None else every_nth_frame
+            images = [np.ascontiguousarray(self._crop(image, sequence_name, serial, i * step, crop, crop_padding))
+                      for i, image in enumerate(images)]
+
         if scale is not None:
-            images = [resize_img(image, scale) for image in images]
+            with timed("data_manager.resize"):
+                images = [resize_img(image, scale) for image in images]
 
         if not as_uint8:
-            images = [image / 255. for image in images]
+            with timed("data_manager.dtype_conversion"):
+                images = [image / 255. for image in images]
 
         return images
 
+    def iter_images_multiprocess(self,
+                                 sequence_name: str,
+                                 frame_keys: List[Tuple[str, int]],
+                                 n_workers: int = 4,
+                                 n_slots: Optional[int] = None) -> MultiProcessFrameLoader:
+        """
+        Decodes the given (serial, timestep) frames as uint8 in worker processes, which hand them over through shared memory
+        instead of pickling (see `MultiProcessFrameLoader`). Iterating yields ((serial, timestep), image) in the order in which
+        images become ready, and every image is only valid until the next iteration step.
+        Workers get contiguous runs of timesteps per camera and keep the video decoder open between frames, i.e., they decode
+        forward instead of seeking for every frame. If all cameras have the same resolution, frames are decoded directly into
+        the shared memory slots.
+        """
+
+        assert len(frame_keys) > 0, "No frames to load"
+        frame_keys = sorted(frame_keys)
+        resolutions = {load_cached(self.get_images_path(sequence_name, serial), probe_resolution) for serial in {serial for serial, _ in frame_keys}}
+        height, width = max(resolutions, key=lambda resolution: resolution[0] * resolution[1])
+        if len(resolutions) == 1:
+            return MultiProcessFrameLoader(_UInt8FrameLoader(self, sequence_name),
+                                           frame_keys,
+                                           max_frame_nbytes=height * width * 3,
+                                           n_workers=n_workers,
+                                           n_slots=n_slots,
+                                           frame_shape=(height, width, 3))
+
+        return MultiProcessFrameLoader(_UInt8FrameLoader(self, sequence_name),
+                                       frame_keys,
+                                       max_frame_nbytes=height * width * 3,
+                                       n_workers=n_workers,
+                                       n_slots=n_slots)
+
     def has_sequence(self, sequence_name: str) -> bool:
         serial = self.list_serials(sequence_name)[0]
         video_path = self.get_images_path(sequence_name, serial)
@@ -114,6 +338,173 @@ class BaseDataManager:
         video_path = self.get_images_path(sequence_name, serial)
         return Path(video_path).exists()
 
+    # ----------------------------------------------------------
+    # Frame pyramids
+    # ----------------------------------------------------------
+
+    def load_pyramid(self, sequence_name: str, serial: str) -> Optional[FramePyramid]:
+        """
+        The frame pyramid of the video, or None if none was built from the current version of the video file.
+        """
+
+        key = (sequence_name, serial)
+        video_path = self.get_images_path(sequence_name, serial)
+        source = get_file_version(video_path) if Path(video_path).exists() else None
+        if key not in self._pyramids or (source is not None and self._pyramids[key].source != source):
+            self._pyramids.pop(key, None)
+            pyramid_folder = self.get_pyramid_folder(sequence_name, serial)
+            if not FramePyramid.exists(pyramid_folder):
+                return None
+            pyramid = FramePyramid(pyramid_folder)
+            if source is not None and pyramid.source != source:
+                # Built from an older download of the video
+                return None
+            self._pyramids[key] = pyramid
+
+        return self._pyramids[key]
+
+    @profiled("data_manager.build_pyramid")
+    def build_pyramid(self, sequence_name: str, serial: str, scales: Tuple[float, ...] = DEFAULT_PYRAMID_SCALES) -> FramePyramid:
+        """
+        Decodes the video once and stores anti-aliased downscaled copies of all frames at the given scales in a memory-mappable
+        pyramid. Afterward, `load_all_images(scale=...)` serves any scale up to the finest level from the nearest level.
+        """
+
+        video_path = self.get_images_path(sequence_name, serial)
+        assert Path(video_path).exists(), f"Could not find video {video_path}"
+        source = get_file_version(video_path)
+        video_capture = VideoFrameLoader(video_path)
+
+        self._pyramids.pop((sequence_name, serial), None)
+        pyramid = FramePyramid.build(self.get_pyramid_folder(sequence_name, serial),
+                                     video_capture.load_all_frames(),
+                                     n_frames=video_capture.get_n_frames(),
+                                     resolution=load_cached(video_path, probe_resolution),
+                                     scales=scales,
+                                     source=source)
+        self._pyramids[(sequence_name, serial)] = pyramid
+        return pyramid
+
+    # ----------------------------------------------------------
+    # Foreground crops
+    # ----------------------------------------------------------
+
+    def load_alpha_bboxes(self, sequence_name: str, serial: str) -> np.ndarray:
+        """
+        Foreground bounding boxes of all timesteps of the video as (T, 4) int16 [x_min, y_min, x_max, y_max] (exclusive).
+        Timesteps without foreground have the empty box [0, 0, 0, 0].
+        The index is built from the alpha maps on first use (see `build_alpha_bboxes()`) and stored next to them.
+        """
+
+        alpha_bboxes_path = self.get_alpha_bboxes_path(sequence_name, serial)
+        if not self.has_up_to_date_alpha_bboxes(sequence_name, serial):
+            self.build_alpha_bboxes(sequence_name, serial)
+        return load_cached(alpha_bboxes_path, load_alpha_bboxes)
+
+    def has_up_to_date_alpha_bboxes(self, sequence_name: str, serial: str) -> bool:
+        """
+        Whether the stored bounding box index was built from the current alpha map video. An index whose alpha maps are
+        not available locally is used as is.
+        """
+
+        alpha_bboxes_path = self.get_alpha_bboxes_path(sequence_name, serial)
+        if not Path(alpha_bboxes_path).exists():
+            return False
+        alpha_maps_path = self.get_alpha_maps_path(sequence_name, serial)
+        if not Path(alpha_maps_path).exists():
+            return True
+        return load_cached(alpha_bboxes_path, load_alpha_bboxes_source) == get_file_version(alpha_maps_path)
+
+    @profiled("data_manager.build_alpha_bboxes")
+    def build_alpha_bboxes(self, sequence_name: str, serial: str) -> np.ndarray:
+        alpha_maps_path = self.get_alpha_maps_path(sequence_name, serial)
+        assert Path(alpha_maps_path).exists(), f"Could not find alpha maps {alpha_maps_path}"
+        source = get_file_version(alpha_maps_path)
+        alpha_bboxes = compute_alpha_bboxes(VideoFrameLoader(alpha_maps_path).load_all_gray_frames())
+        save_alpha_bboxes(self.get_alpha_bboxes_path(sequence_name, serial), alpha_bboxes, source=source)
+        return alpha_bboxes
+
+    def get_crop_bbox(self, sequence_name: str, serial: str, timestep: int, crop: CropMode = 'alpha_bbox', padding: int = 32) -> BBox:
+        """
+        The padded (x_min, y_min, x_max, y_max) box that loaders crop to with `crop`. Cropped images correspond to camera
+        intrinsics whose principal point is shifted by (-x_min, -y_min).
+        """
+
+        height, width = load_cached(self.get_images_path(sequence_name, serial), probe_resolution)
+        return self._get_crop_bbox(sequence_name, serial, timestep, crop, padding, height, width)
+
+    def pack_cropped_images(self, sequence_name: str, serial: str, crop_padding: int = 32) -> PackedImages:
+        """
+        Decodes the video once and stores all frames cropped to the video-wide foreground box ('alpha_bbox_video') in a
+        memory-mappable store. Afterward, `load_image()` with `crop` transparently reads from the store as long as the
+        requested crop lies within the stored one and the video is unchanged.
+        """
+
+        video_path = self.get_images_path(sequence_name, serial)
+        assert Path(video_path).exists(), f"Could not find video {video_path}"
+        source = get_file_version(video_path)
+        height, width = load_cached(video_path, probe_resolution)
+        bbox = self._get_crop_bbox(sequence_name, serial, 0, 'alpha_bbox_video', crop_padding, height, width)
+        timesteps = list(range(len(self.load_alpha_bboxes(sequence_name, serial))))
+
+        cropped_images_folder = self.get_cropped_images_folder(sequence_name, serial)
+        self._cropped_images.pop((sequence_name, serial), None)
+        # The crop box of a previous store must not be paired with the new images
+        Path(f"{cropped_images_folder}/bbox.json").unlink(missing_ok=True)
+
+        # One worker keeps the calls in timestep order, such that frames can be taken from a single sequential decode
+        frames = enumerate(VideoFrameLoader(video_path).load_all_frames())
+
+        def load_cropped_frame(timestep: int) -> np.ndarray:
+            frame_id, frame = next(frames)
+            assert frame_id == timestep
+            return crop_to_bbox(frame, bbox)
+
+        cropped_images = PackedImages.pack(cropped_images_folder, timesteps, load_cropped_frame, n_workers=1)
+        save_json(dict(bbox=list(bbox), source=source), f"{cropped_images_folder}/bbox.json")
+        self._cropped_images[(sequence_name, serial)] = (cropped_images, bbox, source)
+        return cropped_images
+
+    def _get_crop_bbox(self, sequence_name: str, serial: str, timestep: int, crop: CropMode, padding: int, height: int, width: int) -> BBox:
+        alpha_bboxes = self.load_alpha_bboxes(sequence_name, serial)
+        if crop == 'alpha_bbox':
+            bbox = alpha_bboxes[timestep]
+        elif crop == 'alpha_bbox_video':
+            bbox = load_cached(self.get_alpha_bboxes_path(sequence_name, serial), _load_union_alpha_bbox)
+        else:
+            raise ValueError(f"Unknown crop: {crop}")
+
+        return pad_bbox(bbox, padding, height, width)
+
+    def _crop(self, image: np.ndarray, sequence_name: str, serial: str, timestep: int, crop: CropMode, padding: int) -> np.ndarray:
+        with timed("data_manager.crop"):
+            height, width = image.shape[:2]
+            return crop_to_bbox(image, self._get_crop_bbox(sequence_name, serial, timestep, crop, padding, height, width))
+
+    def _load_from_cropped_images(self, sequence_name: str, serial: str, timestep: int, bbox: BBox) -> Optional[np.ndarray]:
+        key = (sequence_name, serial)
+        video_path = self.get_images_path(sequence_name, serial)
+        source = get_file_version(video_path) if Path(video_path).exists() else None
+        if key not in self._cropped_images or (source is not None and self._cropped_images[key][2] != source):
+            self._cropped_images.pop(key, None)
+            cropped_images_folder = self.get_cropped_images_folder(sequence_name, serial)
+            if not PackedImages.exists(cropped_images_folder) or not Path(f"{cropped_images_folder}/bbox.json").exists():
+                return None
+            crop_metadata = load_json(f"{cropped_images_folder}/bbox.json")
+            if source is not None and crop_metadata['source'] != source:
+                # Packed from an older download of the video
+                return None
+            self._cropped_images[key] = (PackedImages(cropped_images_folder), tuple(crop_metadata['bbox']), crop_metadata['source'])
+
+        cropped_images, (stored_x_min, stored_y_min, stored_x_max, stored_y_max), _ = self._cropped_images[key]
+        x_min, y_min, x_max, y_max = bbox
+        if timestep not in cropped_images \
+                or not (stored_x_min <= x_min and stored_y_min <= y_min and x_max <= stored_x_max and y_max <= stored_y_max):
+            return None
+
+        image = cropped_images.images[timestep]
+        return np.array(image[y_min - stored_y_min:y_max - stored_y_min, x_min - stored_x_min:x_max - stored_x_min])
+
     # ----------------------------------------------------------
     # Paths
     # ----------------------------------------------------------
@@ -130,6 +521,63 @@ class BaseDataManager:
         relative_path = ASSETS[self._benchmark_type]['per_cam']['alpha_maps'].format(p_id=self._participant_id, seq_name=sequence_name, serial=serial)
         return f"{self._location}/{relative_path}"
 
+    def get_alpha_bboxes_path(self, sequence_name: str, serial: str) -> str:
+        sequence_folder = Path(self.get_alpha_maps_path(sequence_name, serial)).parent.parent
+        return f"{sequence_folder}/alpha_bboxes/cam_{serial}.npy"
+
+    def get_cropped_images_folder(self, sequence_name: str, serial: str) -> str:
+        sequence_folder = Path(self.get_images_path(sequence_name, serial)).parent.parent
+        return f"{sequence_folder}/images_cropped/cam_{serial}"
+
+    def get_pyramid_folder(self, sequence_name: str, serial: str) -> str:
+        sequence_folder = Path(self.get_images_path(sequence_name, serial)).parent.parent
+        return f"{sequence_folder}/images_pyramid/cam_{serial}"
+
+
+class _UInt8FrameLoader:
+    """
+    `load_frame` of `iter_images_multiprocess()` workers. Keeps the decoder of the current camera open, such that the
+    contiguous runs of timesteps that a worker gets are decoded forward with `FrameDecoder.load_frames()`.
+    """
+
+    def __init__(self, data_manager: BaseDataManager, sequence_name: str):
+        self._data_manager = data_manager
+        self._sequence_name = sequence_name
+        self._serial: Optional[str] = None
+        self._decoder: Optional[FrameDecoder] = None
+
+    def __getstate__(self):
+        # Every worker opens its own decoders
+        return dict(data_manager=self._data_manager, sequence_name=self._sequence_name)
+
+    def __setstate__(self, state):
+        self.__init__(state['data_manager'], state['sequence_name'])
+
+    def __call__(self, frame_key: Tuple[str, int], out: Optional[np.ndarray] = None) -> np.ndarray:
+        serial, timestep = frame_key
+        if serial != self._serial:
+            self.close()
+            video_path = self._data_manager.get_images_path(self._sequence_name, serial)
+            assert Path(video_path).exists(), f"Could not find video {video_path}"
+            self._decoder = FrameDecoder(video_path, keyframes=load_cached(video_path, probe_keyframes))
+            self._serial = serial
+
+        image = self._decoder.load_frames([timestep])[0]
+        if out is not None:
+            out[...] = image
+            image = out
+        return image
+
+    def close(self):
+        if self._decoder is not None:
+            self._decoder.close()
+        self._serial = None
+        self._decoder = None
+
+
+def _load_union_alpha_bbox(alpha_bboxes_path: str) -> np.ndarray:
+    return get_union_bbox(load_alpha_bboxes(alpha_bboxes_path))
+
 # ==========================================================
 # Novel View Synthesis Task
 # ==========================================================
@@ -137,18 +585,86 @@ class BaseDataManager:
 class NVSDataManager(BaseDataManager):
     def __init__(self, benchmark_folder: str, participant_id: int):
         super().__init__(benchmark_folder, "nvs", participant_id)
+        self._packed_pointclouds: Dict[str, PackedPointClouds] = dict()
 
     # ----------------------------------------------------------
     # Assets
     # ----------------------------------------------------------
 
+    @profiled("data_manager.load_pointcloud")
     def load_pointcloud(self, sequence_name: str, timestep: int):
-        pcd = o3d.io.read_point_cloud(self.get_pointcloud_path(sequence_name, timestep))
-        points = np.asarray(pcd.points, dtype=np.float32)
-        colors = np.asarray(pcd.colors, dtype=np.float32)
-        normals = np.asarray(pcd.normals, dtype=np.float32)
+        """
+        Reads from the packed store (see `pack_pointclouds()`) if it contains the current version of the pointcloud file.
+        """
+
+        packed_pointclouds = self.load_packed_pointclouds(sequence_name)
+        if packed_pointclouds is not None and not self._is_packed_pointcloud_up_to_date(packed_pointclouds, sequence_name, timestep):
+            # The store may have been packed again since it was opened, e.g., by preprocessing in another process
+            self._packed_pointclouds.pop(sequence_name, None)
+            packed_pointclouds = self.load_packed_pointclouds(sequence_name)
+        if packed_pointclouds is not None and self._is_packed_pointcloud_up_to_date(packed_pointclouds, sequence_name, timestep):
+            return packed_pointclouds.load(timestep)
+
+        points, colors, normals = read_pointcloud(self.get_pointcloud_path(sequence_name, timestep))
         return points, colors, normals
 
+    def load_packed_pointclouds(self, sequence_name: str) -> Optional[PackedPointClouds]:
+        packed_pointclouds_folder = self.get_packed_pointclouds_folder(sequence_name)
+        if not PackedPointClouds.exists(packed_pointclouds_folder):
+            return None
+
+        if sequence_name not in self._packed_pointclouds:
+            self._packed_pointclouds[sequence_name] = PackedPointClouds(packed_pointclouds_folder)
+        return self._packed_pointclouds[sequence_name]
+
+    def has_up_to_date_packed_pointclouds(self, sequence_name: str) -> bool:
+        """
+        Whether the packed store contains the current version of every locally available pointcloud of the sequence.
+        """
+
+        self._packed_pointclouds.pop(sequence_name, None)
+        packed_pointclouds = self.load_packed_pointclouds(sequence_name)
+        return packed_pointclouds is not None \
+            and all(self._is_packed_pointcloud_up_to_date(packed_pointclouds, sequence_name, timestep)
+                    for timestep in self.list_pointcloud_timesteps(sequence_name))
+
+    def pack_pointclouds(self, sequence_name: str) -> PackedPointClouds:
+        """
+        Packs all locally available pointclouds of the sequence into a single memory-mappable store.
+        Afterward, `load_pointcloud()` will transparently read from the packed store.
+        """
+
+        pointclouds_folder = Path(self.get_pointcloud_path(sequence_name, 0)).parent
+        pointcloud_paths = dict()
+        for timestep in self.list_pointcloud_timesteps(sequence_name):
+            pointcloud_paths[timestep] = self.get_pointcloud_path(sequence_name, timestep)
+        assert len(pointcloud_paths) > 0, f"Could not find any pointclouds in {pointclouds_folder}"
+
+        self._packed_pointclouds.pop(sequence_name, None)
+        packed_pointclouds = PackedPointClouds.pack(self.get_packed_pointclouds_folder(sequence_name), pointcloud_paths)
+        self._packed_pointclouds[sequence_name] = packed_pointclouds
+        return packed_pointclouds
+
+    def _is_packed_pointcloud_up_to_date(self, packed_pointclouds: PackedPointClouds, sequence_name: str, timestep: int) -> bool:
+        if timestep not in packed_pointclouds:
+            return False
+        pointcloud_path = self.get_pointcloud_path(sequence_name, timestep)
+        # Packed pointclouds whose file is not available locally are used as is
+        return not Path(pointcloud_path).exists() or packed_pointclouds.get_source(timestep) == get_file_version(pointcloud_path)
+
+    def list_pointcloud_timesteps(self, sequence_name: str) -> List[int]:
+        pointclouds_folder = Path(self.get_pointcloud_path(sequence_name, 0)).parent
+        if not pointclouds_folder.exists():
+            return []
+
+        file_name_pattern = re.compile(r"^frame_(\d+)\.pcd$")
+        timesteps = []
+        for file in pointclouds_folder.iterdir():
+            matches = file_name_pattern.match(file.name)
+            if matches:
+                timesteps.append(int(matches.group(1)))
+        return sorted(timesteps)
+
     # ----------------------------------------------------------
     # Paths
     # ----------------------------------------------------------
@@ -157,6 +673,10 @@ class NVSDataManager(BaseDataManager):
         relative_path = ASSETS[self._benchmark_type]['per_timestep']['pointclouds'].format(p_id=self._participant_id, seq_name=sequence_name, timestep=timestep)
         return f"{self._location}/{relative_path}"
 
+    def get_packed_pointclouds_folder(self, sequence_name: str) -> str:
+        pointclouds_folder = Path(self.get_pointcloud_path(sequence_name, 0)).parent
+        return f"{pointclouds_folder.parent}/pointclouds_packed"
+
 # ==========================================================
 # Monocular 3D Head Avatar Reconstruction Task
 # ==========================================================
@@ -180,6 +700,7 @@ class MonoFlameAvatarDataManager(BaseDataManager):
     def __init__(self, benchmark_folder: str, participant_id: int):
         super().__init__(benchmark_folder, "mono_flame_avatar", participant_id)
 
+    @profiled("data_manager.load_flame_tracking")
     def load_flame_tracking(self, sequence_name: str, version: int = FLAME_TRACKING_CURRENT_VERSION) -> FlameTracking:
         flame_tracking = np.load(self.get_flame_tracking_path(sequence_name, version=version))
         flame_tracking = FlameTracking(**flame_tracking)
@@ -209,27 +730,124 @@ class ImageKey:
 
 class SVFRDataManager:
     def __init__(self, benchmark_folder: str, participant_id: int):
+        self._benchmark_folder = benchmark_folder
         self._location = f"{benchmark_folder}/svfr/{participant_id:03d}"
         self._participant_id = participant_id
 
     def list_image_keys(self) -> List[ImageKey]:
-        folder_name_pattern = re.compile(r"^([a-zA-Z0-9-_+]+)_(\d+)_(\d+)$")
-        image_keys = []
-        for folder in sorted(Path(self._location).iterdir()):
-            matches = folder_name_pattern.match(folder.name)
-            if matches:
-                seq_name = matches.group(1)
-                timestep = int(matches.group(2))
-                serial = matches.group(3)
-                image_key = ImageKey(sequence_name=seq_name, timestep=timestep, serial=serial)
-                image_keys.append(image_key)
+        """
+        The scanned keys are cached per process and only re-scanned when the content of the participant folder changes.
+        """
 
-        return image_keys
+        image_keys = load_cached(self._location, _scan_svfr_image_keys)
+        return [ImageKey(sequence_name, timestep, serial) for sequence_name, timestep, serial in image_keys]
 
     def get_asset_folder(self, image_key: ImageKey) -> str:
         return f"{self._location}/{image_key.sequence_name}_{image_key.timestep}_{image_key.serial}"
 
+    @profiled("data_manager.load_svfr_image")
     def load_image(self, image_key: ImageKey) -> np.ndarray:
+        packed_images = load_packed_svfr_images(self._benchmark_folder)
+        packed_key = self._get_packed_key(image_key)
+        if packed_images is not None and packed_key in packed_images:
+            return packed_images.load(packed_key)
+
         image_path = f"{self.get_asset_folder(image_key)}/rgb.png"
         image = load_img(image_path)
         return image
+
+    @profiled("data_manager.load_svfr_images")
+    def load_images(self, image_keys: Optional[List[ImageKey]] = None, scale: Optional[float] = None, n_workers: int = 8) -> np.ndarray:
+        """
+        Loads the given images (default: all images of the participant) as a single stacked (N, H, W, 3) uint8 array.
+        Images are read from the packed store (see `pack_svfr_images()`) if available, and decoded in parallel threads otherwise.
+        """
+
+        if image_keys is None:
+            image_keys = self.list_image_keys()
+
+        packed_images = load_packed_svfr_images(self._benchmark_folder)
+        packed_keys = [self._get_packed_key(image_key) for image_key in image_keys]
+        if packed_images is not None and all(packed_key in packed_images for packed_key in packed_keys):
+            images = packed_images.load_many(packed_keys)
+            if scale is not None:
+                with timed("data_manager.resize"):
+                    images = np.stack([resize_img(image, scale) for image in images])
+            return images
+
+        def load_image(image_key: ImageKey) -> np.ndarray:
+            image = load_img(f"{self.get_asset_folder(image_key)}/rgb.png")
+            if scale is not None:
+                image = resize_img(image, scale)
+            return image
+
+        with ThreadPoolExecutor(max_workers=n_workers) as executor:
+            images = list(executor.map(load_image, image_keys))
+
+        return np.stack(images)
+
+    def _get_packed_key(self, image_key: ImageKey) -> SVFRImageKey:
+        return self._participant_id, image_key.sequence_name, image_key.timestep, image_key.serial
+
+
+def _scan_svfr_image_keys(participant_folder: str) -> List[Tuple[str, int, str]]:
+    folder_name_pattern = re.compile(r"^([a-zA-Z0-9-_+]+)_(\d+)_(\d+)$")
+    image_keys = []
+    for folder in sorted(Path(participant_folder).iterdir()):
+        matches = folder_name_pattern.match(folder.name)
+        if matches:
+            seq_name = matches.group(1)
+            timestep = int(matches.group(2))
+            serial = matches.group(3)
+            image_keys.append((seq_name, timestep, serial))
+
+    return image_keys
+
+
+# ----------------------------------------------------------
+# Packed SVFR images
+# ----------------------------------------------------------
+
+_PACKED_SVFR_IMAGES: Dict[str, PackedImages] = dict()
+
+
+def get_packed_svfr_images_folder(benchmark_folder: str) -> str:
+    return f"{benchmark_folder}/svfr/images_packed"
+
+
+def load_packed_svfr_images(benchmark_folder: str) -> Optional[PackedImages]:
+    packed_images_folder = get_packed_svfr_images_folder(benchmark_folder)
+    if packed_images_folder not in _PACKED_SVFR_IMAGES:
+        if not PackedImages.exists(packed_images_folder):
+            return None
+        _PACKED_SVFR_IMAGES[packed_images_folder] = PackedImages(packed_images_folder)
+
+    return _PACKED_SVFR_IMAGES[packed_images_folder]
+
+
+def pack_svfr_images(benchmark_folder: str, participant_ids: Optional[List[int]] = None, n_workers: int = 8) -> PackedImages:
+    """
+    Packs the locally available SVFR input images of all (or the given) participants into a single memory-mappable
+    (N, 512, 512, 3) array in `svfr/images_packed`. Afterward, `SVFRDataManager.load_image()` and `load_images()`
+    transparently read from the packed store.
+    """
+
+    if participant_ids is None:
+        participant_ids = [participant_id for participant_id in get_benchmark_index().svfr_ids
+                           if Path(f"{benchmark_folder}/svfr/{participant_id:03d}").exists()]
+
+    packed_keys = []
+    for participant_id in sorted(participant_ids):
+        data_manager = SVFRDataManager(benchmark_folder, participant_id)
+        packed_keys.extend(data_manager._get_packed_key(image_key) for image_key in data_manager.list_image_keys())
+
+    def load_image(packed_key: SVFRImageKey) -> np.ndarray:
+        participant_id, sequence_name, timestep, serial = packed_key
+        return load_img(f"{benchmark_folder}/svfr/{participant_id:03d}/{sequence_name}_{timestep}_{serial}/rgb.png")
+
+    packed_images_folder = get_packed_svfr_images_folder(benchmark_folder)
+    _PACKED_SVFR_IMAGES.pop(packed_images_folder, None)
+    packed_images = PackedImages.pack(packed_images_folder, packed_keys, load_image, n_workers=n_workers)
+    _PACKED_SVFR_IMAGES[packed_images_folder] = packed_images
+
+    return packed_images
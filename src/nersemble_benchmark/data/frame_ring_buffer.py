@@ -0,0 +1,275 @@
+import multiprocessing
+import os
+import queue
+import traceback
+import weakref
+from multiprocessing import shared_memory
+from typing import Optional, Tuple, Any, Callable, Sequence, Iterator, TypeVar, Union, List
+
+import numpy as np
+
+from nersemble_benchmark.util.profiling import timed, increment
+
+T = TypeVar('T')
+
+
+# ==========================================================
+# Ring buffer
+# ==========================================================
+
+class FrameRingBuffer:
+    """
+    Fixed number of frame slots in a single shared memory block, for moving decoded frames between processes without
+    pickling them. Only slot indices and small metadata travel through queues.
+    Producers block in `acquire()` while all slots are in use (backpressure) and consumers hand slots back with `release()`.
+
+    Producer:
+        ring.put(frame, metadata)
+        # or decode directly into a slot:
+        slot = ring.acquire()
+        ring.get_slot(slot, shape)[:] = ...
+        ring.commit(slot, shape, metadata=metadata)
+        ...
+        ring.put_end()
+
+    Consumer:
+        while (entry := ring.get()) is not None:
+            slot, frame, metadata = entry  # frame is a read-only view into the slot
+            ...
+            ring.release(slot)  # frame must not be used afterward
+
+    The ring buffer can be passed to worker processes (e.g., as `Process` argument), which attach to the same memory.
+    """
+
+    def __init__(self, n_slots: int, slot_nbytes: int, context: Optional[multiprocessing.context.BaseContext] = None):
+        assert n_slots > 0 and slot_nbytes > 0, "Ring buffer needs at least one non-empty slot"
+        if context is None:
+            context = multiprocessing.get_context()
+
+        self.n_slots = n_slots
+        self.slot_nbytes = slot_nbytes
+        self._shm = shared_memory.SharedMemory(create=True, size=n_slots * slot_nbytes)
+        self._free_slots = context.Queue()
+        self._ready_slots = context.Queue()
+        for slot in range(n_slots):
+            self._free_slots.put(slot)
+
+        # Only the creating process unlinks the shared memory block
+        self._finalizer = weakref.finalize(self, _release_shared_memory, self._shm, os.getpid())
+
+    @staticmethod
+    def for_frames(n_slots: int,
+                   frame_shape: Tuple[int, ...],
+                   dtype: np.dtype = np.uint8,
+                   context: Optional[multiprocessing.context.BaseContext] = None) -> 'FrameRingBuffer':
+        return FrameRingBuffer(n_slots, int(np.prod(frame_shape)) * np.dtype(dtype).itemsize, context=context)
+
+    def __getstate__(self):
+        return dict(name=self._shm.name, n_slots=self.n_slots, slot_nbytes=self.slot_nbytes,
+                    free_slots=self._free_slots, ready_slots=self._ready_slots)
+
+    def __setstate__(self, state):
+        self.n_slots = state['n_slots']
+        self.slot_nbytes = state['slot_nbytes']
+        self._free_slots = state['free_slots']
+        self._ready_slots = state['ready_slots']
+        try:
+            self._shm = shared_memory.SharedMemory(name=state['name'], track=False)
+        except TypeError:
+            # Python < 3.13 always registers attached blocks (see `nersemble_benchmark.util.cache`)
+            self._shm = shared_memory.SharedMemory(name=state['name'])
+        self._finalizer = weakref.finalize(self, _release_shared_memory, self._shm, None)
+
+    # ----------------------------------------------------------
+    # Producer
+    # ----------------------------------------------------------
+
+    def acquire(self, timeout: Optional[float] = None) -> int:
+        """
+        Waits for a free slot. Raises `queue.Empty` if no slot becomes free within `timeout` seconds.
+        """
+
+        with timed("ring_buffer.acquire"):
+            return self._free_slots.get(timeout=timeout)
+
+    def get_slot(self, slot: int, shape: Tuple[int, ...], dtype: np.dtype = np.uint8) -> np.ndarray:
+        """
+        Writable view of a slot as array of the given shape. The frame may be smaller than the slot.
+        """
+
+        dtype = np.dtype(dtype)
+        nbytes = int(np.prod(shape)) * dtype.itemsize
+        assert nbytes <= self.slot_nbytes, f"Frame of shape {shape} ({nbytes} bytes) does not fit into slots of {self.slot_nbytes} bytes"
+        return np.ndarray(shape, dtype=dtype, buffer=self._shm.buf, offset=slot * self.slot_nbytes)
+
+    def commit(self, slot: int, shape: Tuple[int, ...], dtype: np.dtype = np.uint8, metadata: Any = None):
+        self._ready_slots.put(('frame', slot, tuple(shape), np.dtype(dtype).str, metadata))
+
+    def put(self, frame: np.ndarray, metadata: Any = None, timeout: Optional[float] = None):
+        slot = self.acquire(timeout=timeout)
+        self.get_slot(slot, frame.shape, frame.dtype)[...] = frame
+        self.commit(slot, frame.shape, frame.dtype, metadata=metadata)
+        increment("ring_buffer.frames")
+        increment("ring_buffer.bytes", frame.nbytes)
+
+    def put_end(self):
+        """
+        Signals the consumer that this producer will not put any more frames.
+        """
+
+        self._ready_slots.put(('end',))
+
+    def put_error(self, message: str):
+        self._ready_slots.put(('error', message))
+
+    # ----------------------------------------------------------
+    # Consumer
+    # ----------------------------------------------------------
+
+    def get(self, timeout: Optional[float] = None) -> Optional[Tuple[int, np.ndarray, Any]]:
+        """
+        Waits for the next frame and returns (slot, read-only frame view, metadata), or None if a producer ended.
+        Errors reported by a producer via `put_error()` are raised as RuntimeError.
+        """
+
+        with timed("ring_buffer.get"):
+            entry = self._ready_slots.get(timeout=timeout)
+
+        if entry[0] == 'end':
+            return None
+        elif entry[0] == 'error':
+            raise RuntimeError(f"Frame producer failed:\n{entry[1]}")
+
+        _, slot, shape, dtype, metadata = entry
+        frame = self.get_slot(slot, shape, dtype)
+        frame.flags.writeable = False
+        return slot, frame, metadata
+
+    def release(self, slot: int):
+        self._free_slots.put(slot)
+
+    def close(self):
+        self._finalizer()
+
+
+# Blocks that could not be closed because frame views were still alive. Keeping them referenced prevents errors when they would
+# otherwise be garbage collected before the views
+_UNCLOSED_SHARED_MEMORY = []
+
+
+def _release_shared_memory(shm: shared_memory.SharedMemory, owner_pid: Optional[int]):
+    try:
+        shm.close()
+    except BufferError:
+        _UNCLOSED_SHARED_MEMORY.append(shm)
+
+    if owner_pid == os.getpid():
+        try:
+            shm.unlink()
+        except FileNotFoundError:
+            pass
+
+
+# ==========================================================
+# Multi-process frame loading
+# ==========================================================
+
+class MultiProcessFrameLoader:
+    """
+    Loads frames in worker processes straight into a shared-memory `FrameRingBuffer`.
+    Iterating yields (item, frame) in the order in which the frames become ready. `frame` is a read-only zero-copy view that
+    is only valid until the next iteration step, copy it to keep it.
+
+    `load_frame` is called with each item in a worker process and has to be picklable for non-fork start methods
+    (e.g., a module-level function or a `functools.partial` of one).
+    Every worker gets a contiguous run of `items` and calls `load_frame` in item order, such that loaders that keep state
+    between calls (e.g., an open video decoder) can decode consecutive frames without seeking.
+    If all frames have the same `frame_shape`, workers decode straight into free ring buffer slots: `load_frame` is then
+    called as `load_frame(item, out)` and has to fill the writable slot view `out` instead of returning a new array.
+    """
+
+    def __init__(self,
+                 load_frame: Union[Callable[[T], np.ndarray], Callable[[T, np.ndarray], Any]],
+                 items: Sequence[T],
+                 max_frame_nbytes: int,
+                 n_workers: int = 4,
+                 n_slots: Optional[int] = None,
+                 context: Optional[multiprocessing.context.BaseContext] = None,
+                 frame_shape: Optional[Tuple[int, ...]] = None,
+                 frame_dtype: np.dtype = np.uint8):
+        self._load_frame = load_frame
+        self._items = list(items)
+        self._max_frame_nbytes = max_frame_nbytes
+        self._frame_shape = None if frame_shape is None else tuple(frame_shape)
+        self._frame_dtype = np.dtype(frame_dtype)
+        self._n_workers = max(min(n_workers, len(self._items)), 1)
+        self._n_slots = 2 * self._n_workers if n_slots is None else n_slots
+        self._context = multiprocessing.get_context() if context is None else context
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __iter__(self) -> Iterator[Tuple[T, np.ndarray]]:
+        ring_buffer = FrameRingBuffer(self._n_slots, self._max_frame_nbytes, context=self._context)
+        processes = [self._context.Process(target=_produce_frames,
+                                           args=(ring_buffer, self._load_frame, self._get_worker_items(i_worker),
+                                                 self._frame_shape, self._frame_dtype),
+                                           daemon=True)
+                     for i_worker in range(self._n_workers)]
+        for process in processes:
+            process.start()
+
+        try:
+            n_finished_workers = 0
+            while n_finished_workers < len(processes):
+                try:
+                    entry = ring_buffer.get(timeout=1)
+                except queue.Empty:
+                    assert any(process.is_alive() for process in processes), "All frame producers died unexpectedly"
+                    continue
+
+                if entry is None:
+                    n_finished_workers += 1
+                    continue
+
+                slot, frame, item = entry
+                yield item, frame
+                del frame, entry
+                ring_buffer.release(slot)
+        finally:
+            for process in processes:
+                if process.is_alive():
+                    process.terminate()
+                process.join()
+            ring_buffer.close()
+
+    def _get_worker_items(self, i_worker: int) -> List[T]:
+        # Contiguous runs of almost equal size
+        n_items = len(self._items)
+        return self._items[i_worker * n_items // self._n_workers:(i_worker + 1) * n_items // self._n_workers]
+
+
+def _produce_frames(ring_buffer: FrameRingBuffer,
+                    load_frame: Callable,
+                    items: Sequence[T],
+                    frame_shape: Optional[Tuple[int, ...]] = None,
+                    frame_dtype: np.dtype = np.uint8):
+    try:
+        for item in items:
+            if frame_shape is None:
+                ring_buffer.put(load_frame(item), metadata=item)
+                continue
+
+            slot = ring_buffer.acquire()
+            try:
+                load_frame(item, ring_buffer.get_slot(slot, frame_shape, frame_dtype))
+            except BaseException:
+                ring_buffer.release(slot)
+                raise
+            ring_buffer.commit(slot, frame_shape, frame_dtype, metadata=item)
+            increment("ring_buffer.frames")
+            increment("ring_buffer.bytes", int(np.prod(frame_shape)) * np.dtype(frame_dtype).itemsize)
+    except Exception:
+        ring_buffer.put_error(traceback.format_exc())
+    finally:
+        ring_buffer.put_end()
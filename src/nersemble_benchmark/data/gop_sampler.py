@@ -0,0 +1,181 @@
+from collections import defaultdict
+from typing import List, Optional, Sequence, Tuple, Iterator, Dict
+
+import numpy as np
+
+from nersemble_benchmark.data.benchmark_data import BaseDataManager
+from nersemble_benchmark.util.profiling import profiled, increment
+
+FrameKey = Tuple[str, str, int]  # sequence_name, serial, timestep
+
+
+def count_decoded_frames(frame_ids: Sequence[int], keyframes: np.ndarray) -> int:
+    """
+    Number of frames that `FrameDecoder.load_frames()` decodes to serve the given frames of a single video: it decodes
+    forward within a GOP and only seeks to the keyframe before the next requested frame when that skips frames.
+    """
+
+    n_decoded_frames = 0
+    next_frame_id = None
+    for frame_id in sorted(set(frame_ids)):
+        keyframe = keyframes[max(np.searchsorted(keyframes, frame_id, side='right') - 1, 0)]
+        if next_frame_id is None or keyframe > next_frame_id:
+            n_decoded_frames += frame_id - keyframe + 1
+        else:
+            n_decoded_frames += frame_id - next_frame_id + 1
+        next_frame_id = frame_id + 1
+
+    return n_decoded_frames
+
+
+def count_decoded_frames_independent(frame_ids: Sequence[int], keyframes: np.ndarray) -> int:
+    """
+    Number of frames decoded when every frame is loaded on its own, i.e., every frame is decoded starting from its keyframe.
+    """
+
+    frame_ids = np.asarray(frame_ids)
+    keyframe_ids = keyframes[np.maximum(np.searchsorted(keyframes, frame_ids, side='right') - 1, 0)]
+    return int((frame_ids - keyframe_ids + 1).sum())
+
+
+class GOPBatchSampler:
+    """
+    Random batches of (sequence_name, serial, timestep) frames whose decoding shares work.
+
+    Every epoch, the requested samples are drawn from the given distribution over frames (without replacement for uniform
+    sampling, with replacement if `weights` are given). Samples of `group_window` consecutive batches are then sorted by
+    video, GOP (group of pictures between two keyframes) and timestep, cut into batches, and the batches are shuffled again.
+    Frames of the same GOP thus end up in the same batch where a single decoder pass serves all of them (see `load_batch()`).
+    Which frames are sampled per epoch is unaffected, only the composition of batches becomes more local.
+    `group_window=1` keeps the batch composition and only reorders frames within each batch.
+
+    `decode_ratio` tracks the achieved number of decoded frames per served frame, `independent_decode_ratio` the same for
+    loading every frame on its own.
+    """
+
+    def __init__(self,
+                 data_manager: BaseDataManager,
+                 frame_keys: Sequence[FrameKey],
+                 batch_size: int,
+                 weights: Optional[Sequence[float]] = None,
+                 n_samples_per_epoch: Optional[int] = None,
+                 group_window: int = 4,
+                 drop_last: bool = False,
+                 seed: Optional[int] = None):
+        """
+        Parameters
+        ----------
+        data_manager:
+            Data manager of the participant
+        frame_keys:
+            All frames that can be sampled
+        batch_size:
+            Number of frames per batch
+        weights:
+            Sampling probability of every frame (normalized internally). Default: uniform
+        n_samples_per_epoch:
+            Default: the number of frames
+        group_window:
+            Number of consecutive batches whose samples are grouped by video and GOP
+        drop_last:
+            Whether the last incomplete batch of an epoch is dropped
+        seed:
+            Seed for the random number generator
+        """
+
+        assert len(frame_keys) > 0, "No frames to sample from"
+        assert batch_size > 0 and group_window > 0
+        self._data_manager = data_manager
+        self._frame_keys = list(frame_keys)
+        self._batch_size = batch_size
+        self._n_samples_per_epoch = len(self._frame_keys) if n_samples_per_epoch is None else n_samples_per_epoch
+        self._group_window = group_window
+        self._drop_last = drop_last
+        self._rng = np.random.default_rng(seed)
+
+        self._probabilities = None
+        if weights is not None:
+            weights = np.asarray(weights, dtype=np.float64)
+            assert weights.shape == (len(self._frame_keys),), f"Expected one weight per frame, got {weights.shape}"
+            self._probabilities = weights / weights.sum()
+
+        # Sort key (video, GOP, timestep) of every frame
+        videos = sorted({(sequence_name, serial) for sequence_name, serial, _ in self._frame_keys})
+        video_ids = {video: i for i, video in enumerate(videos)}
+        self._keyframes = {(sequence_name, serial): data_manager.get_keyframes(sequence_name, serial) for sequence_name, serial in videos}
+        self._video_ids = np.array([video_ids[(sequence_name, serial)] for sequence_name, serial, _ in self._frame_keys])
+        self._gop_ids = np.array([np.searchsorted(self._keyframes[(sequence_name, serial)], timestep, side='right')
+                                  for sequence_name, serial, timestep in self._frame_keys])
+        self._timesteps = np.array([timestep for _, _, timestep in self._frame_keys])
+
+        self.n_served_frames = 0
+        self.n_decoded_frames = 0
+        self.n_decoded_frames_independent = 0
+
+    def __len__(self) -> int:
+        if self._drop_last:
+            return self._n_samples_per_epoch // self._batch_size
+        return (self._n_samples_per_epoch + self._batch_size - 1) // self._batch_size
+
+    def __iter__(self) -> Iterator[List[FrameKey]]:
+        if self._probabilities is None and self._n_samples_per_epoch <= len(self._frame_keys):
+            sample_ids = self._rng.permutation(len(self._frame_keys))[:self._n_samples_per_epoch]
+        else:
+            sample_ids = self._rng.choice(len(self._frame_keys), size=self._n_samples_per_epoch, p=self._probabilities)
+
+        window_size = self._group_window * self._batch_size
+        for window_start in range(0, len(sample_ids), window_size):
+            window = sample_ids[window_start:window_start + window_size]
+            window = window[np.lexsort((self._timesteps[window], self._gop_ids[window], self._video_ids[window]))]
+            batches = [window[batch_start:batch_start + self._batch_size] for batch_start in range(0, len(window), self._batch_size)]
+            for i_batch in self._rng.permutation(len(batches)):
+                batch = batches[i_batch]
+                if self._drop_last and len(batch) < self._batch_size:
+                    continue
+                # Batches are cut from the sorted window, i.e., frames within a batch are sorted by video and timestep
+                self._update_stats(batch)
+                yield [self._frame_keys[sample_id] for sample_id in batch]
+
+    @property
+    def decode_ratio(self) -> float:
+        return self.n_decoded_frames / self.n_served_frames if self.n_served_frames > 0 else float('nan')
+
+    @property
+    def independent_decode_ratio(self) -> float:
+        return self.n_decoded_frames_independent / self.n_served_frames if self.n_served_frames > 0 else float('nan')
+
+    def reset_stats(self):
+        self.n_served_frames = 0
+        self.n_decoded_frames = 0
+        self.n_decoded_frames_independent = 0
+
+    @profiled("gop_sampler.load_batch")
+    def load_batch(self, batch: List[FrameKey]) -> List[np.ndarray]:
+        """
+        Loads the uint8 frames of a batch with one decoder pass per video.
+        """
+
+        timesteps_per_video: Dict[Tuple[str, str], List[int]] = defaultdict(list)
+        for sequence_name, serial, timestep in batch:
+            timesteps_per_video[(sequence_name, serial)].append(timestep)
+
+        images = dict()
+        for (sequence_name, serial), timesteps in timesteps_per_video.items():
+            for timestep, image in zip(timesteps, self._data_manager.load_images(sequence_name, serial, timesteps, as_uint8=True)):
+                images[(sequence_name, serial, timestep)] = image
+
+        return [images[frame_key] for frame_key in batch]
+
+    def _update_stats(self, batch: np.ndarray):
+        timesteps_per_video = defaultdict(list)
+        for sample_id in batch:
+            sequence_name, serial, timestep = self._frame_keys[sample_id]
+            timesteps_per_video[(sequence_name, serial)].append(timestep)
+
+        n_decoded_frames = sum(count_decoded_frames(timesteps, self._keyframes[video]) for video, timesteps in timesteps_per_video.items())
+        self.n_served_frames += len(batch)
+        self.n_decoded_frames += n_decoded_frames
+        self.n_decoded_frames_independent += sum(count_decoded_frames_independent(timesteps, self._keyframes[video])
+                                                 for video, timesteps in timesteps_per_video.items())
+        increment("gop_sampler.frames_served", len(batch))
+        increment("gop_sampler.frames_decoded", n_decoded_frames)
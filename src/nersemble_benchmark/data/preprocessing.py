@@ -0,0 +1,232 @@
+import multiprocessing
+import re
+import threading
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, Future
+from dataclasses import dataclass, field
+from typing import Literal, List, Optional, Sequence, Dict, Tuple, TYPE_CHECKING
+
+from nersemble_benchmark.constants import ASSETS
+from nersemble_benchmark.util.download import compute_file_hash
+from nersemble_benchmark.util.profiling import timed, increment
+
+if TYPE_CHECKING:
+    from nersemble_benchmark.data.benchmark_data import BaseDataManager
+
+PreprocessStep = Literal[
+    "checksums",  # sha256 of every file, recorded in the download manifest
+    "alpha_bboxes",  # foreground bounding box index of alpha map videos
+    "pyramids",  # downscaled frame stores of image videos
+    "packed_pointclouds",  # memory-mappable store of all pointclouds of a sequence
+]
+PREPROCESS_STEPS: Tuple[PreprocessStep, ...] = ("checksums", "alpha_bboxes", "pyramids", "packed_pointclouds")
+
+
+@dataclass
+class PreprocessResult:
+    relative_url: str
+    hash: Optional[str] = None
+    outputs: List[str] = field(default_factory=list)  # which preprocessed assets were built
+
+
+def parse_relative_url(benchmark_type: str, relative_url: str) -> Optional[Tuple[str, Dict[str, str]]]:
+    """
+    Inverts the `ASSETS` path templates: Returns the asset type and the template fields (p_id, seq_name, serial, timestep)
+    of a relative URL, or None if it does not belong to any asset.
+    """
+
+    for asset_group, asset_templates in ASSETS[benchmark_type].items():
+        if asset_group == 'test_assets':
+            continue
+        for asset, template in asset_templates.items():
+            pattern = re.sub(r"\{(\w+)(:[^}]*)?}", r"(?P<\1>[^/]+)", re.escape(template).replace(r"\{", "{").replace(r"\}", "}"))
+            matches = re.fullmatch(pattern, relative_url)
+            if matches:
+                return asset, matches.groupdict()
+
+    return None
+
+
+def create_data_manager(benchmark_folder: str, benchmark_type: str, participant_id: int) -> Optional['BaseDataManager']:
+    # The data managers import dreifus and torch. Importing them at first use keeps the download script fast to start
+    from nersemble_benchmark.data.benchmark_data import NVSDataManager, MonoFlameAvatarDataManager
+
+    if benchmark_type == 'nvs':
+        return NVSDataManager(benchmark_folder, participant_id)
+    elif benchmark_type == 'mono_flame_avatar':
+        return MonoFlameAvatarDataManager(benchmark_folder, participant_id)
+    return None
+
+
+# ==========================================================
+# Preprocessing tasks
+# ==========================================================
+
+def preprocess_file(benchmark_folder: str,
+                    benchmark_type: str,
+                    relative_url: str,
+                    steps: Sequence[PreprocessStep],
+                    known_hash: Optional[str] = None,
+                    rebuild: bool = True) -> PreprocessResult:
+    """
+    Runs the selected preprocessing steps that apply to a single downloaded file.
+
+    Parameters
+    ----------
+    known_hash:
+        Hash that the file was already verified against, e.g., from a checksum manifest. It is not computed again
+    rebuild:
+        Whether existing preprocessed assets are rebuilt. Otherwise, only missing ones are built
+    """
+
+    result = PreprocessResult(relative_url)
+    if 'checksums' in steps:
+        if known_hash is None:
+            with timed("preprocess.checksum"):
+                known_hash = f"sha256:{compute_file_hash(f'{benchmark_folder}/{benchmark_type}/{relative_url}')}"
+        result.hash = known_hash
+
+    parsed_url = parse_relative_url(benchmark_type, relative_url)
+    data_manager = None if parsed_url is None else create_data_manager(benchmark_folder, benchmark_type, int(parsed_url[1]['p_id']))
+    if data_manager is None:
+        return result
+
+    asset, fields = parsed_url
+    if asset == 'images' and 'pyramids' in steps:
+        if rebuild or data_manager.load_pyramid(fields['seq_name'], fields['serial']) is None:
+            data_manager.build_pyramid(fields['seq_name'], fields['serial'])
+            result.outputs.append('pyramid')
+    elif asset == 'alpha_maps' and 'alpha_bboxes' in steps:
+        if rebuild or not data_manager.has_up_to_date_alpha_bboxes(fields['seq_name'], fields['serial']):
+            data_manager.build_alpha_bboxes(fields['seq_name'], fields['serial'])
+            result.outputs.append('alpha_bboxes')
+
+    increment("preprocess.files")
+    return result
+
+
+def preprocess_sequence_pointclouds(benchmark_folder: str, participant_id: int, sequence_name: str, rebuild: bool = True) -> PreprocessResult:
+    data_manager = create_data_manager(benchmark_folder, 'nvs', participant_id)
+    result = PreprocessResult(data_manager.get_packed_pointclouds_folder(sequence_name))
+    if rebuild or not data_manager.has_up_to_date_packed_pointclouds(sequence_name):
+        data_manager.pack_pointclouds(sequence_name)
+        result.outputs.append('packed_pointclouds')
+    return result
+
+
+# ==========================================================
+# Pipeline
+# ==========================================================
+
+class PreprocessingPipeline:
+    """
+    Preprocesses downloaded files in a pool of worker processes while other downloads continue.
+    Download threads hand over every completed file with `submit()`. At most `max_queue_size` files are queued or being
+    preprocessed at any time. Beyond that, `submit()` blocks the calling download thread, such that downloads cannot run
+    arbitrarily far ahead of preprocessing.
+
+    Per-file steps (checksums, alpha bounding boxes, frame pyramids) run as soon as a file is submitted. Pointclouds of a
+    sequence are packed once the last of its expected pointcloud files was submitted.
+    """
+
+    def __init__(self,
+                 benchmark_folder: str,
+                 benchmark_type: str,
+                 steps: Sequence[PreprocessStep],
+                 relative_urls: Sequence[str],
+                 n_workers: int = 2,
+                 max_queue_size: int = 8):
+        """
+        Parameters
+        ----------
+        steps:
+            Which preprocessing steps to run
+        relative_urls:
+            All files that will be submitted. Needed to know when all pointclouds of a sequence are available
+        n_workers:
+            Number of preprocessing processes
+        max_queue_size:
+            Maximum number of files that are queued or being preprocessed
+        """
+
+        assert max_queue_size > 0, "Preprocessing queue needs at least one slot"
+        self._benchmark_folder = str(benchmark_folder)
+        self._benchmark_type = benchmark_type
+        self._steps = tuple(steps)
+        # Workers are started lazily by the first submit() of a download thread. Forking then would copy locks (requests,
+        # urllib3, tqdm) that other download threads hold at that moment, so workers are spawned instead
+        self._executor = ProcessPoolExecutor(max_workers=n_workers, mp_context=multiprocessing.get_context('spawn'))
+        self._queue_slots = threading.BoundedSemaphore(max_queue_size)
+        self._lock = threading.Lock()
+        self._futures: List[Future] = []
+        self.n_submitted = 0
+        self.n_finished = 0
+
+        # Pointcloud files that still have to be submitted per (participant_id, sequence_name)
+        self._pending_pointclouds: Dict[Tuple[int, str], set] = defaultdict(set)
+        self._has_new_pointclouds: Dict[Tuple[int, str], bool] = defaultdict(bool)
+        if 'packed_pointclouds' in self._steps:
+            for relative_url in relative_urls:
+                parsed_url = parse_relative_url(benchmark_type, relative_url)
+                if parsed_url is not None and parsed_url[0] == 'pointclouds':
+                    self._pending_pointclouds[(int(parsed_url[1]['p_id']), parsed_url[1]['seq_name'])].add(relative_url)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._executor.shutdown(wait=exc_type is None, cancel_futures=exc_type is not None)
+
+    def submit(self, relative_url: str, known_hash: Optional[str] = None, is_new: bool = True):
+        """
+        Queues a completely downloaded file for preprocessing. Blocks while the queue is full.
+
+        Parameters
+        ----------
+        known_hash:
+            Hash that the file is already known to have (see `preprocess_file()`)
+        is_new:
+            Whether the file was just downloaded. Preprocessed assets of files that were already complete before are only
+            built if they are missing
+        """
+
+        self._submit(preprocess_file, self._benchmark_folder, self._benchmark_type, relative_url, self._steps, known_hash, is_new)
+
+        parsed_url = parse_relative_url(self._benchmark_type, relative_url)
+        if parsed_url is not None and parsed_url[0] == 'pointclouds' and 'packed_pointclouds' in self._steps:
+            sequence_key = (int(parsed_url[1]['p_id']), parsed_url[1]['seq_name'])
+            with self._lock:
+                pending_pointclouds = self._pending_pointclouds[sequence_key]
+                is_last_pointcloud = relative_url in pending_pointclouds and len(pending_pointclouds) == 1
+                pending_pointclouds.discard(relative_url)
+                self._has_new_pointclouds[sequence_key] |= is_new
+            if is_last_pointcloud:
+                self._submit(preprocess_sequence_pointclouds, self._benchmark_folder, *sequence_key, self._has_new_pointclouds[sequence_key])
+
+    def close(self) -> List[PreprocessResult]:
+        """
+        Waits for all submitted files. Raises the first error of any preprocessing task.
+        """
+
+        results = [future.result() for future in self._futures]
+        self._executor.shutdown()
+        return results
+
+    def _submit(self, fn, *args):
+        with timed("preprocess.queue_wait"):
+            self._queue_slots.acquire()
+        try:
+            future = self._executor.submit(fn, *args)
+        except BaseException:
+            self._queue_slots.release()
+            raise
+
+        with self._lock:
+            self._futures.append(future)
+            self.n_submitted += 1
+        future.add_done_callback(self._on_done)
+
+    def _on_done(self, future: Future):
+        with self._lock:
+            self.n_finished += 1
+        self._queue_slots.release()
@@ -0,0 +1,195 @@
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from nersemble_benchmark.data.benchmark_data import BaseDataManager
+from nersemble_benchmark.util.cache import load_cached
+from nersemble_benchmark.util.camera import StackedCameraParams
+from nersemble_benchmark.util.profiling import profiled, timed
+from nersemble_benchmark.util.video import probe_resolution
+
+
+@dataclass
+class RayBatch:
+    # @formatter:off
+    origins: np.ndarray             # (N, 3) float32, camera centers in world space
+    directions: np.ndarray          # (N, 3) float32, normalized, in world space
+    rgb: np.ndarray                 # (N, 3) float32 in [0, 1]
+    alpha: np.ndarray               # (N, 1) float32 in [0, 1]
+    camera_indices: np.ndarray      # (N,) index into RaySampler.serials
+    timestep_indices: np.ndarray    # (N,) index into RaySampler.timesteps
+    pixels: np.ndarray              # (N, 2) integer (x, y) pixel coordinates
+    # @formatter:on
+
+    def __len__(self) -> int:
+        return len(self.origins)
+
+
+def compute_ray_directions(camera_params: StackedCameraParams,
+                           pixels: np.ndarray,
+                           camera_indices: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Normalized world-space directions of the rays through the centers of the given (x, y) pixels.
+
+    Parameters
+    ----------
+    camera_params:
+        Calibration of C cameras (OpenCV convention)
+    pixels:
+        (N, 2) pixel coordinates. Without `camera_indices`, the same pixels are used for all cameras
+    camera_indices:
+        (N,) camera of every pixel
+
+    Returns
+    -------
+        (N, 3) directions, or (C, N, 3) if no `camera_indices` are given
+    """
+
+    pixel_centers = np.concatenate([pixels.astype(np.float32) + 0.5, np.ones((len(pixels), 1), dtype=np.float32)], axis=-1)
+    cam_2_world_rotations = camera_params.get_cam_2_world()[:, :3, :3]
+    # Rays in camera space are K^-1 @ (x, y, 1), rotated into world space by the cam_2_world rotation
+    ray_transforms = (cam_2_world_rotations @ np.linalg.inv(camera_params.intrinsics)).astype(np.float32)  # (C, 3, 3)
+
+    if camera_indices is None:
+        directions = np.einsum('cij,nj->cni', ray_transforms, pixel_centers)
+    else:
+        directions = np.einsum('nij,nj->ni', ray_transforms[camera_indices], pixel_centers)
+
+    directions /= np.linalg.norm(directions, axis=-1, keepdims=True)
+    return directions
+
+
+class RaySampler:
+    """
+    Samples random ray batches across cameras and timesteps of a sequence, e.g., for NeRF-style NVS training.
+    All frames (and alpha maps) are decoded once and cached as uint8 arrays, such that sampling a batch is a handful of
+    vectorized NumPy indexing operations. Per-pixel ray directions of every camera are precomputed as well.
+
+    Memory: the cached frames need C * T * H * W * 4 bytes (RGB + alpha) and the ray directions C * H * W * 12 bytes.
+    Use `scale` to cache downscaled frames (served from the frame pyramid if one was built, see `build_pyramid()`).
+    """
+
+    @profiled("ray_sampler.init")
+    def __init__(self,
+                 data_manager: BaseDataManager,
+                 sequence_name: str,
+                 serials: List[str],
+                 timesteps: Optional[List[int]] = None,
+                 scale: Optional[float] = None,
+                 foreground_only: bool = False,
+                 alpha_threshold: int = 0,
+                 precompute_directions: bool = True,
+                 n_workers: int = 4,
+                 seed: Optional[int] = None):
+        """
+        Parameters
+        ----------
+        data_manager:
+            Data manager of the participant
+        sequence_name:
+            Sequence to sample rays from
+        serials:
+            Cameras to sample rays from
+        timesteps:
+            Timesteps to sample rays from. Default: all timesteps
+        scale:
+            Cache frames at this scale. Camera intrinsics are adapted accordingly
+        foreground_only:
+            Only sample rays of pixels whose alpha value is above `alpha_threshold`
+        alpha_threshold:
+            Alpha values (0-255) above this threshold count as foreground
+        precompute_directions:
+            Whether ray directions of all pixels are computed once. Otherwise, they are computed for every batch
+        n_workers:
+            Videos of different cameras are decoded in parallel threads
+        seed:
+            Seed for the random number generator used for sampling
+        """
+
+        assert len(serials) > 0, "Need at least one camera to sample rays from"
+        self.serials = list(serials)
+        self._rng = np.random.default_rng(seed)
+
+        # Frames
+        def load_camera(serial: str) -> Tuple[np.ndarray, np.ndarray]:
+            images = data_manager.load_all_images(sequence_name, serial, as_uint8=True, scale=scale)
+            alpha_maps = data_manager.load_all_alpha_maps(sequence_name, serial, as_uint8=True, scale=scale)
+            camera_timesteps = range(len(images)) if timesteps is None else timesteps
+            return np.stack([images[t] for t in camera_timesteps]), np.stack([alpha_maps[t] for t in camera_timesteps])
+
+        with timed("ray_sampler.load_frames"):
+            with ThreadPoolExecutor(max_workers=n_workers) as executor:
+                frames_per_camera = list(executor.map(load_camera, self.serials))
+
+        self.images = np.stack([images for images, _ in frames_per_camera])  # (C, T, H, W, 3)
+        self.alpha_maps = np.stack([alpha_maps for _, alpha_maps in frames_per_camera])[..., 0]  # (C, T, H, W)
+        del frames_per_camera
+        n_cameras, n_timesteps, self.height, self.width = self.alpha_maps.shape
+        self.timesteps = list(range(n_timesteps)) if timesteps is None else list(timesteps)
+
+        # Cameras
+        camera_params = data_manager.load_stacked_camera_calibration(self.serials)
+        if scale is not None:
+            full_height, full_width = load_cached(data_manager.get_images_path(sequence_name, self.serials[0]), probe_resolution)
+            intrinsics = camera_params.intrinsics.copy()
+            intrinsics[:, 0] *= self.width / full_width
+            intrinsics[:, 1] *= self.height / full_height
+            camera_params = StackedCameraParams(camera_params.serials, camera_params.world_2_cam, intrinsics)
+        self.camera_params = camera_params
+        self._camera_centers = camera_params.get_camera_centers().astype(np.float32)
+
+        self._directions = None
+        if precompute_directions:
+            with timed("ray_sampler.precompute_directions"):
+                y, x = np.mgrid[0:self.height, 0:self.width]
+                pixels = np.stack([x.ravel(), y.ravel()], axis=-1)
+                self._directions = compute_ray_directions(camera_params, pixels)  # (C, H * W, 3)
+
+        self._foreground_indices = None
+        if foreground_only:
+            with timed("ray_sampler.foreground_indices"):
+                self._foreground_indices = np.flatnonzero(self.alpha_maps > alpha_threshold)
+            assert len(self._foreground_indices) > 0, "No foreground pixels to sample rays from"
+
+    @property
+    def n_rays(self) -> int:
+        """
+        Number of distinct rays that can be sampled.
+        """
+
+        return self.alpha_maps.size if self._foreground_indices is None else len(self._foreground_indices)
+
+    @profiled("ray_sampler.sample")
+    def sample(self, n_rays: int) -> RayBatch:
+        """
+        Samples `n_rays` rays uniformly (with replacement) across all cameras, timesteps and (foreground) pixels.
+        """
+
+        if self._foreground_indices is None:
+            flat_indices = self._rng.integers(0, self.alpha_maps.size, n_rays)
+        else:
+            flat_indices = self._foreground_indices[self._rng.integers(0, len(self._foreground_indices), n_rays)]
+
+        return self.get_rays(flat_indices)
+
+    def get_rays(self, flat_indices: np.ndarray) -> RayBatch:
+        """
+        Rays of the given indices into the flattened (C, T, H, W) pixel grid.
+        """
+
+        camera_indices, timestep_indices, y, x = np.unravel_index(flat_indices, self.alpha_maps.shape)
+
+        if self._directions is not None:
+            directions = self._directions[camera_indices, y * self.width + x]
+        else:
+            directions = compute_ray_directions(self.camera_params, np.stack([x, y], axis=-1), camera_indices=camera_indices)
+
+        return RayBatch(origins=self._camera_centers[camera_indices],
+                        directions=directions,
+                        rgb=self.images[camera_indices, timestep_indices, y, x].astype(np.float32) / 255,
+                        alpha=self.alpha_maps[camera_indices, timestep_indices, y, x, None].astype(np.float32) / 255,
+                        camera_indices=camera_indices,
+                        timestep_indices=timestep_indices,
+                        pixels=np.stack([x, y], axis=-1))
@@ -1,4 +1,6 @@
+import os
 import re
+import struct
 import zipfile
 from abc import abstractmethod
 from collections import defaultdict
@@ -6,23 +8,27 @@ from io import BytesIO
 from itertools import islice
 from pathlib import Path
 from tempfile import TemporaryDirectory
-from typing import List, Dict, Optional, Tuple
+from typing import List, Dict, Optional, Tuple, Iterator, TYPE_CHECKING, Union, Sequence, Literal, TypeVar
 
-import imageio
-import mediapy
 import numpy as np
-import trimesh
 from elias.util import ensure_directory_exists_for_file
 import imageio.v3 as iio
 from elias.util.io import resize_img
-from trimesh.exchange.ply import load_ply
 
 from nersemble_benchmark.constants import BENCHMARK_NVS_IDS_AND_SEQUENCES, BENCHMARK_NVS_HOLD_OUT_SERIALS, BENCHMARK_MONO_FLAME_AVATAR_IDS, \
     BENCHMARK_MONO_FLAME_AVATAR_HOLD_OUT_SERIALS, BENCHMARK_MONO_FLAME_AVATAR_SERIALS, BENCHMARK_MONO_FLAME_AVATAR_TRAIN_SERIAL, \
-    BENCHMARK_MONO_FLAME_AVATAR_SEQUENCES_TEST, BENCHMARK_SVFR_IMAGE_KEYS
-from nersemble_benchmark.data.benchmark_data import NVSDataManager
+    BENCHMARK_MONO_FLAME_AVATAR_SEQUENCES_TEST
+from nersemble_benchmark.util.benchmark_index import get_benchmark_index, get_video_submission_path, get_svfr_mesh_submission_path, \
+    get_svfr_landmarks_submission_path
 from nersemble_benchmark.util.metadata import NVSMetadata, MonoFLAMEAvatarMetadata
-from nersemble_benchmark.util.video import VideoFrameLoader
+from nersemble_benchmark.util.profiling import timed, timed_iterator, increment, profiled
+from nersemble_benchmark.util.pyramid import FramePyramid, DEFAULT_PYRAMID_SCALES
+from nersemble_benchmark.util.video import FrameDecoder, resolve_frame_ids
+
+if TYPE_CHECKING:
+    # mediapy (matplotlib, IPython) and trimesh are only imported when writing videos or reading/writing meshes to keep
+    # imports of submission readers fast, e.g., for validation or evaluation workers
+    import trimesh
 
 
 # ==========================================================
@@ -65,8 +71,13 @@ class VideoSubmissionDataWriter(SubmissionDataWriter):
 
         with TemporaryDirectory() as temp_dir:
             temp_video_path = f"{temp_dir}/video.mp4"
-            mediapy.write_video(temp_video_path, frames, crf=14, fps=self._fps)
-            self._zipf.write(temp_video_path, arcname)
+            import mediapy
+            with timed("submission.encode"):
+                mediapy.write_video(temp_video_path, frames, crf=14, fps=self._fps)
+            with timed("submission.zip_write"):
+                self._zipf.write(temp_video_path, arcname)
+            increment("submission.frames_encoded", len(frames))
+            increment("submission.bytes_written", Path(temp_video_path).stat().st_size)
 
     @abstractmethod
     def _validate_video(self, participant_id: int, sequence_name: str, serial: str, frames: List[np.ndarray]):
@@ -84,6 +95,21 @@ class SubmissionDataReader:
 
 
 class VideoSubmissionDataReader(SubmissionDataReader):
+    def __init__(self, zip_path: str, pyramid_folder: Optional[str] = None):
+        """
+        Parameters
+        ----------
+        zip_path:
+            Path to the submission .zip file
+        pyramid_folder:
+            Where frame pyramids of the submitted videos are stored (see `build_pyramid()`). Pyramids remember the checksum
+            of the video they were built from, such that pyramids of an outdated submission are ignored
+        """
+
+        super().__init__(zip_path)
+        self._pyramid_folder = pyramid_folder
+        self._pyramids: Dict[str, FramePyramid] = dict()
+
     def get_file_overview(self) -> Dict[int, Dict[str, List[str]]]:
         file_overview = defaultdict(lambda: defaultdict(list))  # participant_id => sequence_name => [serial]
         pattern = re.compile("(\d+)/([\w\d\-_+]+)/cam_(\w+)\.mp4")
@@ -104,26 +130,132 @@ class VideoSubmissionDataReader(SubmissionDataReader):
                    every_nth_frame: Optional[int] = None,
                    timestep: Optional[int] = None,
                    scale: Optional[float] = None) -> List[np.ndarray]:
+        """
+        Scaled frames are served from the video's frame pyramid instead of decoding the full-resolution video, if one was built
+        (see `build_pyramid()`).
+        """
+
         import imageio.v3 as iio
         video_path = self.get_video_path(participant_id, sequence_name, serial)
-        with self._zipf.open(video_path) as f:
-            data = BytesIO(f.read())
-            if every_nth_frame is not None:
-                image_props = iio.improps(f)
-                frames = iio.imiter(data.getvalue(), plugin='pyav')
-                frames = list(islice(frames, 0, image_props.n_images, every_nth_frame))
+        pyramid = self.load_pyramid(participant_id, sequence_name, serial) if scale is not None else None
+        if pyramid is not None and pyramid.covers(scale):
+            if timestep is not None:
+                timesteps = [timestep]
+            elif every_nth_frame is not None:
+                timesteps = range(0, pyramid.n_frames, every_nth_frame)
             else:
-                frames = iio.imread(data.getvalue(), plugin='pyav', index=timestep)
-                if timestep is not None:
-                    frames = [frames]
+                timesteps = None
+            with timed("submission.load_pyramid"):
+                return pyramid.load(scale, timesteps=timesteps)
+
+        with self._zipf.open(video_path) as f:
+            with timed("submission.zip_read"):
+                data = BytesIO(f.read())
+            increment("submission.bytes_read", len(data.getvalue()))
+            with timed("submission.decode"):
+                if every_nth_frame is not None:
+                    image_props = iio.improps(f)
+                    frames = iio.imiter(data.getvalue(), plugin='pyav')
+                    frames = list(islice(frames, 0, image_props.n_images, every_nth_frame))
+                else:
+                    frames = iio.imread(data.getvalue(), plugin='pyav', index=timestep)
+                    if timestep is not None:
+                        frames = [frames]
+            increment("submission.frames_decoded", len(frames))
 
         if scale is not None:
-            frames = [resize_img(frame, scale) for frame in frames]
+            with timed("submission.resize"):
+                frames = [resize_img(frame, scale) for frame in frames]
 
         return frames
 
+    @profiled("submission.load_images")
+    def load_images(self,
+                    participant_id: int,
+                    sequence_name: str,
+                    serial: str,
+                    timesteps: Union[Sequence[int], slice]) -> List[np.ndarray]:
+        """
+        Loads several frames of a submitted video, e.g., a temporal window `slice(t - 4, t + 5)`, in the given order.
+        The decoder seeks once to the keyframe before the first requested frame and decodes forward instead of decoding the
+        whole video. See `FrameDecoder.load_frames()`.
+        """
+
+        video_path = self.get_video_path(participant_id, sequence_name, serial)
+        with self._zipf.open(video_path) as f:
+            with timed("submission.zip_read"):
+                data = f.read()
+        increment("submission.bytes_read", len(data))
+
+        with FrameDecoder(BytesIO(data)) as decoder:
+            timesteps = resolve_frame_ids(timesteps, decoder.n_frames)
+            return decoder.load_frames(timesteps)
+
+    def iter_video_frames(self, participant_id: int, sequence_name: str, serial: str) -> Iterator[np.ndarray]:
+        """
+        Decodes the frames of a submitted video one at a time instead of loading the whole video into memory.
+        """
+
+        video_path = self.get_video_path(participant_id, sequence_name, serial)
+        with self._zipf.open(video_path) as f:
+            with timed("submission.zip_read"):
+                data = f.read()
+        increment("submission.bytes_read", len(data))
+        return timed_iterator("submission.decode_frame", iio.imiter(data, plugin='pyav'), counter="submission.frames_decoded")
+
+    def load_pyramid(self, participant_id: int, sequence_name: str, serial: str) -> Optional[FramePyramid]:
+        if self._pyramid_folder is None:
+            return None
+
+        video_path = self.get_video_path(participant_id, sequence_name, serial)
+        if video_path not in self._pyramids:
+            pyramid_folder = self.get_pyramid_folder(participant_id, sequence_name, serial)
+            if not FramePyramid.exists(pyramid_folder):
+                return None
+            pyramid = FramePyramid(pyramid_folder)
+            if pyramid.source != self._get_video_source(video_path):
+                return None
+            self._pyramids[video_path] = pyramid
+
+        return self._pyramids[video_path]
+
+    @profiled("submission.build_pyramid")
+    def build_pyramid(self,
+                      participant_id: int,
+                      sequence_name: str,
+                      serial: str,
+                      scales: Tuple[float, ...] = DEFAULT_PYRAMID_SCALES) -> FramePyramid:
+        """
+        Decodes the submitted video once and stores anti-aliased downscaled copies of all frames in `pyramid_folder`.
+        Afterward, `load_video(scale=...)` serves any scale up to the finest level from the nearest level.
+        """
+
+        assert self._pyramid_folder is not None, "Frame pyramids require a pyramid_folder"
+        video_path = self.get_video_path(participant_id, sequence_name, serial)
+        with self._zipf.open(video_path) as f:
+            data = f.read()
+        image_props = iio.improps(data, plugin='pyav')
+
+        self._pyramids.pop(video_path, None)
+        pyramid = FramePyramid.build(self.get_pyramid_folder(participant_id, sequence_name, serial),
+                                     iio.imiter(data, plugin='pyav'),
+                                     n_frames=image_props.n_images,
+                                     resolution=image_props.shape[1:3],
+                                     scales=scales,
+                                     source=self._get_video_source(video_path))
+        self._pyramids[video_path] = pyramid
+        return pyramid
+
     def get_video_path(self, participant_id: int, sequence_name: str, serial: str) -> str:
-        return f"{participant_id:03d}/{sequence_name}/cam_{serial}.mp4"
+        return get_video_submission_path(participant_id, sequence_name, serial)
+
+    def get_pyramid_folder(self, participant_id: int, sequence_name: str, serial: str) -> str:
+        video_path = Path(self.get_video_path(participant_id, sequence_name, serial))
+        return f"{self._pyramid_folder}/{video_path.parent}/{video_path.stem}"
+
+    def _get_video_source(self, video_path: str) -> str:
+        zip_info = self._zipf.getinfo(video_path)
+        return f"{zip_info.CRC:08x}-{zip_info.file_size}"
 
     @abstractmethod
     def list_expected_files(self) -> List[str]:
@@ -137,11 +269,12 @@ class VideoSubmissionDataReader(SubmissionDataReader):
     def get_expected_resolution(self) -> Tuple[int, int]:
         pass
 
+    @profiled("submission.validate")
     def validate_submission(self) -> Dict[str, List]:
         expected_files = self.list_expected_files()
         expected_lengths = self.list_expected_video_lengths()
         expected_width, expected_height = self.get_expected_resolution()
-        actual_files = [file.filename for file in self._zipf.filelist]
+        actual_files = set(self._zipf.namelist())
         missing_files = []
         wrong_frame_counts = []
         wrong_resolutions = []
@@ -185,10 +318,11 @@ class NVSSubmissionDataWriter(VideoSubmissionDataWriter):
         super().__init__(zip_path, 73, 1100, 1604)
 
     def _validate_video(self, participant_id: int, sequence_name: str, serial: str, frames: List[np.ndarray]):
-        nvs_ids_and_sequences = dict(BENCHMARK_NVS_IDS_AND_SEQUENCES)
-        assert participant_id in nvs_ids_and_sequences, f"Invalid participant_id {participant_id}, should be one of {list(nvs_ids_and_sequences.keys())}"
-        assert sequence_name == nvs_ids_and_sequences[participant_id], f"Invalid sequence name {sequence_name} expected {nvs_ids_and_sequences[participant_id]}"
-        assert serial in BENCHMARK_NVS_HOLD_OUT_SERIALS, f"Invalid serial. Only the hold-out serials {BENCHMARK_NVS_HOLD_OUT_SERIALS} should be submitted"
+        nvs_sequences = get_benchmark_index().nvs_sequences
+        assert participant_id in nvs_sequences, f"Invalid participant_id {participant_id}, should be one of {list(nvs_sequences.keys())}"
+        assert sequence_name == nvs_sequences[participant_id], f"Invalid sequence name {sequence_name} expected {nvs_sequences[participant_id]}"
+        assert serial in get_benchmark_index().nvs_hold_out_serials, \
+            f"Invalid serial. Only the hold-out serials {BENCHMARK_NVS_HOLD_OUT_SERIALS} should be submitted"
 
 
 class NVSSubmissionDataReader(VideoSubmissionDataReader):
@@ -199,16 +333,11 @@ class NVSSubmissionDataReader(VideoSubmissionDataReader):
             return False
         if sequence_name not in file_overview[participant_id]:
             return False
-        complete = all([serial in file_overview[participant_id][sequence_name] for serial in BENCHMARK_NVS_HOLD_OUT_SERIALS])
+        complete = get_benchmark_index().nvs_hold_out_serials.issubset(file_overview[participant_id][sequence_name])
         return complete
 
     def list_expected_files(self) -> List[str]:
-        expected_files = []
-        for participant_id, sequence_name in BENCHMARK_NVS_IDS_AND_SEQUENCES:
-            for serial in BENCHMARK_NVS_HOLD_OUT_SERIALS:
-                expected_files.append(self.get_video_path(participant_id, sequence_name, serial))
-
-        return expected_files
+        return list(get_benchmark_index().nvs_submission_files)
 
     def list_expected_video_lengths(self) -> Dict[str, int]:
         expected_video_lengths = dict()
@@ -236,12 +365,12 @@ class MonoFlameAvatarSubmissionDataWriter(VideoSubmissionDataWriter):
         super().__init__(zip_path, 24.3, 512, 512)
 
     def _validate_video(self, participant_id: int, sequence_name: str, serial: str, frames: List[np.ndarray]):
-        valid_participant_ids = BENCHMARK_MONO_FLAME_AVATAR_IDS
-        assert participant_id in valid_participant_ids, f"Invalid participant_id {participant_id}"
-        assert sequence_name in BENCHMARK_MONO_FLAME_AVATAR_SEQUENCES_TEST, \
+        benchmark_index = get_benchmark_index()
+        assert participant_id in benchmark_index.mono_flame_avatar_ids, f"Invalid participant_id {participant_id}"
+        assert sequence_name in benchmark_index.mono_flame_avatar_sequences_test, \
             f"Invalid sequence name {sequence_name}. Only the hold-out sequences {BENCHMARK_MONO_FLAME_AVATAR_SEQUENCES_TEST} should be submitted"
-        assert serial in BENCHMARK_MONO_FLAME_AVATAR_SERIALS, (f"Invalid serial {serial}. Only the train serial {BENCHMARK_MONO_FLAME_AVATAR_TRAIN_SERIAL} "
-                                                               f"and the hold-out serials {BENCHMARK_MONO_FLAME_AVATAR_HOLD_OUT_SERIALS} should be submitted")
+        assert serial in benchmark_index.mono_flame_avatar_serials, (f"Invalid serial {serial}. Only the train serial {BENCHMARK_MONO_FLAME_AVATAR_TRAIN_SERIAL} "
+                                                                     f"and the hold-out serials {BENCHMARK_MONO_FLAME_AVATAR_HOLD_OUT_SERIALS} should be submitted")
 
 
 class MonoFlameAvatarSubmissionDataReader(VideoSubmissionDataReader):
@@ -253,6 +382,7 @@ class MonoFlameAvatarSubmissionDataReader(VideoSubmissionDataReader):
             participant_ids = [participant_id]
 
         file_overview = self.get_file_overview()
+        serials = get_benchmark_index().mono_flame_avatar_serials
 
         for participant_id in participant_ids:
             if not participant_id in file_overview:
@@ -262,20 +392,13 @@ class MonoFlameAvatarSubmissionDataReader(VideoSubmissionDataReader):
                 if not sequence_name in file_overview[participant_id]:
                     return False
 
-                for serial in BENCHMARK_MONO_FLAME_AVATAR_SERIALS:
-                    if not serial in file_overview[participant_id][sequence_name]:
-                        return False
+                if not serials.issubset(file_overview[participant_id][sequence_name]):
+                    return False
 
         return True
 
     def list_expected_files(self) -> List[str]:
-        expected_files = []
-        for participant_id in BENCHMARK_MONO_FLAME_AVATAR_IDS:
-            for sequence_name in BENCHMARK_MONO_FLAME_AVATAR_SEQUENCES_TEST:
-                for serial in BENCHMARK_MONO_FLAME_AVATAR_SERIALS:
-                    expected_files.append(self.get_video_path(participant_id, sequence_name, serial))
-
-        return expected_files
+        return list(get_benchmark_index().mono_flame_avatar_submission_files)
 
     def list_expected_video_lengths(self) -> Dict[str, int]:
         expected_video_lengths = dict()
@@ -304,7 +427,7 @@ class SVFRSubmissionDataWriter(SubmissionDataWriter):
                   sequence_name: str,
                   timestep: int,
                   serial: str,
-                  mesh: trimesh.Trimesh,
+                  mesh: 'trimesh.Trimesh',
                   svfr_task: str,
                   now_landmarks: Optional[np.ndarray] = None):
         assert len(mesh.vertices) > 0, f"Mesh for person {participant_id}, {sequence_name}_{timestep}_{serial} has no vertices"
@@ -314,15 +437,18 @@ class SVFRSubmissionDataWriter(SubmissionDataWriter):
         assert len(
             mesh.vertices) == 5023 or now_landmarks is not None, "If mesh has a different topology than FLAME, 7 landmarks following the NoW convention have to be provided for alignment to GT mesh. See: https://github.com/soubhiksanyal/now_evaluation/blob/main/landmarks_7_annotated.png"
         assert now_landmarks is None or now_landmarks.shape == (7, 3), f"NoW landmarks expected shape: 7x3. Got: {now_landmarks.shape}"
+        assert (participant_id, sequence_name, timestep, serial) in get_benchmark_index().svfr_image_key_set, \
+            f"Invalid image key: person {participant_id}, {sequence_name}_{timestep}_{serial} is not part of the SVFR benchmark"
 
-        mesh_path = f"{participant_id:03d}/{sequence_name}_{timestep:03d}_{serial}/mesh_{svfr_task}.ply"
+        mesh_path = get_svfr_mesh_submission_path(participant_id, sequence_name, timestep, serial, svfr_task)
+        import trimesh
         mesh = trimesh.Trimesh(mesh.vertices, mesh.faces)
 
-        with self._zipf.open(mesh_path, 'w') as f:
+        with timed("submission.write_mesh"), self._zipf.open(mesh_path, 'w') as f:
             mesh.export(f, 'ply')
 
         if now_landmarks is not None:
-            landmarks_path = f"{participant_id:03d}/{sequence_name}_{timestep:03d}_{serial}/landmarks_{svfr_task}.npy"
+            landmarks_path = get_svfr_landmarks_submission_path(participant_id, sequence_name, timestep, serial, svfr_task)
             with self._zipf.open(landmarks_path, 'w') as f:
                 np.save(f, now_landmarks)
 
@@ -331,7 +457,7 @@ class SVFRSubmissionDataWriter(SubmissionDataWriter):
                        sequence_name: str,
                        timestep: int,
                        serial: str,
-                       mesh: trimesh.Trimesh,
+                       mesh: 'trimesh.Trimesh',
                        now_landmarks: Optional[np.ndarray] = None):
         self._add_mesh(participant_id, sequence_name, timestep, serial, mesh, 'posed', now_landmarks=now_landmarks)
 
@@ -340,16 +466,16 @@ class SVFRSubmissionDataWriter(SubmissionDataWriter):
                          sequence_name: str,
                          timestep: int,
                          serial: str,
-                         mesh: trimesh.Trimesh,
+                         mesh: 'trimesh.Trimesh',
                          now_landmarks: Optional[np.ndarray] = None):
         self._add_mesh(participant_id, sequence_name, timestep, serial, mesh, 'neutral', now_landmarks=now_landmarks)
 
 
 class SVFRSubmissionDataReader(SubmissionDataReader):
-    def load_posed_mesh(self, participant_id: int, sequence_name: str, timestep: int, serial: str) -> trimesh.Trimesh:
+    def load_posed_mesh(self, participant_id: int, sequence_name: str, timestep: int, serial: str) -> 'trimesh.Trimesh':
         return self._load_mesh(participant_id, sequence_name, timestep, serial, 'posed')
 
-    def load_neutral_mesh(self, participant_id: int, sequence_name: str, timestep: int, serial: str) -> trimesh.Trimesh:
+    def load_neutral_mesh(self, participant_id: int, sequence_name: str, timestep: int, serial: str) -> 'trimesh.Trimesh':
         return self._load_mesh(participant_id, sequence_name, timestep, serial, 'neutral')
 
     def load_posed_landmarks(self, participant_id: int, sequence_name: str, timestep: int, serial: str) -> np.ndarray:
@@ -364,8 +490,11 @@ class SVFRSubmissionDataReader(SubmissionDataReader):
     def has_neutral_reconstructions(self) -> bool:
         return self._has_reconstructions('neutral')
 
+    @profiled("submission.validate")
     def validate_submission(self) -> Dict[str, List]:
         actual_files = [file.filename for file in self._zipf.filelist if not file.is_dir()]
+        actual_file_set = set(actual_files)
+        benchmark_index = get_benchmark_index()
 
         has_posed = False
         has_neutral = False
@@ -378,53 +507,48 @@ class SVFRSubmissionDataReader(SubmissionDataReader):
         missing_neutral_landmarks = []
         wrong_posed_landmarks = []
         wrong_neutral_landmarks = []
-        all_expected_posed_files = []
-        all_expected_neutral_files = []
+        all_expected_posed_files = benchmark_index.svfr_submission_files['posed']
+        all_expected_neutral_files = benchmark_index.svfr_submission_files['neutral']
         unexpected_files = []
 
-        for participant_id, person_keys in BENCHMARK_SVFR_IMAGE_KEYS.items():
-            for sequence_name, timestep, serial in person_keys:
-                expected_posed_mesh_path = self._get_mesh_path(participant_id, sequence_name, timestep, serial, 'posed')
-                expected_posed_landmarks_path = self._get_landmarks_path(participant_id, sequence_name, timestep, serial, 'posed')
-                all_expected_posed_files.append(expected_posed_mesh_path)
-                all_expected_posed_files.append(expected_posed_landmarks_path)
-                if expected_posed_mesh_path in actual_files:
-                    has_posed = True
-
-                    mesh = self.load_posed_mesh(participant_id, sequence_name, timestep, serial)
-                    if len(mesh.vertices) == 0 or len(mesh.faces) == 0:
-                        empty_posed_meshes.append(expected_posed_mesh_path)
-
-                    if len(mesh.vertices) != 5023:
-                        if expected_posed_landmarks_path in actual_files:
-                            landmarks = self.load_posed_landmarks(participant_id, sequence_name, timestep, serial)
-                            if landmarks.shape != (7, 3):
-                                wrong_posed_landmarks.append((expected_posed_landmarks_path, landmarks.shape))
-                        else:
-                            missing_posed_landmarks.append(expected_posed_landmarks_path)
-                else:
-                    missing_posed_meshes.append(expected_posed_mesh_path)
-
-                expected_neutral_mesh_path = self._get_mesh_path(participant_id, sequence_name, timestep, serial, 'neutral')
-                expected_neutral_landmarks_path = self._get_landmarks_path(participant_id, sequence_name, timestep, serial, 'neutral')
-                all_expected_neutral_files.append(expected_neutral_mesh_path)
-                all_expected_neutral_files.append(expected_neutral_landmarks_path)
-                if expected_neutral_mesh_path in actual_files:
-                    has_neutral = True
-
-                    mesh = self.load_neutral_mesh(participant_id, sequence_name, timestep, serial)
-                    if len(mesh.vertices) == 0 or len(mesh.faces) == 0:
-                        empty_neutral_meshes.append(expected_neutral_mesh_path)
-
-                    if len(mesh.vertices) != 5023:
-                        if expected_neutral_landmarks_path in actual_files:
-                            landmarks = self.load_neutral_landmarks(participant_id, sequence_name, timestep, serial)
-                            if landmarks.shape != (7, 3):
-                                wrong_neutral_landmarks.append((expected_neutral_landmarks_path, landmarks.shape))
-                        else:
-                            missing_neutral_landmarks.append(expected_neutral_landmarks_path)
-                else:
-                    missing_neutral_meshes.append(expected_neutral_mesh_path)
+        for participant_id, sequence_name, timestep, serial in benchmark_index.svfr_image_keys:
+            expected_posed_mesh_path = self._get_mesh_path(participant_id, sequence_name, timestep, serial, 'posed')
+            expected_posed_landmarks_path = self._get_landmarks_path(participant_id, sequence_name, timestep, serial, 'posed')
+            if expected_posed_mesh_path in actual_file_set:
+                has_posed = True
+
+                mesh = self.load_posed_mesh(participant_id, sequence_name, timestep, serial)
+                if len(mesh.vertices) == 0 or len(mesh.faces) == 0:
+                    empty_posed_meshes.append(expected_posed_mesh_path)
+
+                if len(mesh.vertices) != 5023:
+                    if expected_posed_landmarks_path in actual_file_set:
+                        landmarks = self.load_posed_landmarks(participant_id, sequence_name, timestep, serial)
+                        if landmarks.shape != (7, 3):
+                            wrong_posed_landmarks.append((expected_posed_landmarks_path, landmarks.shape))
+                    else:
+                        missing_posed_landmarks.append(expected_posed_landmarks_path)
+            else:
+                missing_posed_meshes.append(expected_posed_mesh_path)
+
+            expected_neutral_mesh_path = self._get_mesh_path(participant_id, sequence_name, timestep, serial, 'neutral')
+            expected_neutral_landmarks_path = self._get_landmarks_path(participant_id, sequence_name, timestep, serial, 'neutral')
+            if expected_neutral_mesh_path in actual_file_set:
+                has_neutral = True
+
+                mesh = self.load_neutral_mesh(participant_id, sequence_name, timestep, serial)
+                if len(mesh.vertices) == 0 or len(mesh.faces) == 0:
+                    empty_neutral_meshes.append(expected_neutral_mesh_path)
+
+                if len(mesh.vertices) != 5023:
+                    if expected_neutral_landmarks_path in actual_file_set:
+                        landmarks = self.load_neutral_landmarks(participant_id, sequence_name, timestep, serial)
+                        if landmarks.shape != (7, 3):
+                            wrong_neutral_landmarks.append((expected_neutral_landmarks_path, landmarks.shape))
+                    else:
+                        missing_neutral_landmarks.append(expected_neutral_landmarks_path)
+            else:
+                missing_neutral_meshes.append(expected_neutral_mesh_path)
 
         for actual_file in actual_files:
             # Only posed
@@ -472,10 +596,13 @@ class SVFRSubmissionDataReader(SubmissionDataReader):
 
         return submission_issues
 
-    def _load_mesh(self, participant_id: int, sequence_name: str, timestep: int, serial: str, svfr_task: str) -> trimesh.Trimesh:
+    def _load_mesh(self, participant_id: int, sequence_name: str, timestep: int, serial: str, svfr_task: str) -> 'trimesh.Trimesh':
         mesh_path = self._get_mesh_path(participant_id, sequence_name, timestep, serial, svfr_task)
 
-        with self._zipf.open(mesh_path, 'r') as f:
+        import trimesh
+        from trimesh.exchange.ply import load_ply
+
+        with timed("submission.load_mesh"), self._zipf.open(mesh_path, 'r') as f:
             mesh = trimesh.Trimesh(**load_ply(f))
 
         return mesh
@@ -489,19 +616,126 @@ class SVFRSubmissionDataReader(SubmissionDataReader):
         return landmarks
 
     def _get_mesh_path(self, participant_id: int, sequence_name: str, timestep: int, serial: str, svfr_task: str) -> str:
-        return f"{participant_id:03d}/{sequence_name}_{timestep:03d}_{serial}/mesh_{svfr_task}.ply"
+        return get_svfr_mesh_submission_path(participant_id, sequence_name, timestep, serial, svfr_task)
 
     def _get_landmarks_path(self, participant_id: int, sequence_name: str, timestep: int, serial: str, svfr_task: str) -> str:
-        return f"{participant_id:03d}/{sequence_name}_{timestep:03d}_{serial}/landmarks_{svfr_task}.npy"
+        return get_svfr_landmarks_submission_path(participant_id, sequence_name, timestep, serial, svfr_task)
 
     def _has_reconstructions(self, svfr_task: str):
-        contained_files = [file.filename for file in self._zipf.filelist]
-        has_reconstructions = False
-        for participant_id, person_keys in BENCHMARK_SVFR_IMAGE_KEYS.items():
-            for sequence_name, timestep, serial in person_keys:
-                expected_posed_mesh_path = self._get_mesh_path(participant_id, sequence_name, timestep, serial, svfr_task)
-                if expected_posed_mesh_path in contained_files:
-                    has_reconstructions = True
-                    break
-
-        return has_reconstructions
+        return not get_benchmark_index().svfr_mesh_files[svfr_task].isdisjoint(self._zipf.namelist())
+
+
+# ==========================================================
+# Sharded submissions
+# ==========================================================
+
+SubmissionType = Literal['nvs', 'mono_flame_avatar', 'svfr']
+T = TypeVar('T')
+
+
+def list_submission_items(submission_type: SubmissionType) -> List[tuple]:
+    """
+    All units of work of a complete submission, in the order of the expected submission files of the readers:
+     - 'nvs' and 'mono_flame_avatar': (participant_id, sequence_name, serial) of every expected video
+     - 'svfr': (participant_id, sequence_name, timestep, serial) of every image to reconstruct
+    """
+
+    if submission_type == 'nvs':
+        return list(get_benchmark_index().nvs_video_keys)
+    elif submission_type == 'mono_flame_avatar':
+        return list(get_benchmark_index().mono_flame_avatar_video_keys)
+    elif submission_type == 'svfr':
+        return list(get_benchmark_index().svfr_image_keys)
+    else:
+        raise NotImplementedError(f"Submission type {submission_type} not implemented")
+
+
+def get_shard_items(items: Sequence[T], shard_id: int, n_shards: int) -> List[T]:
+    """
+    Deterministic partition of `items` into `n_shards` disjoint shards of almost equal size (round-robin). Every process or
+    node computes its own shard independently from the same item list.
+    """
+
+    assert n_shards > 0 and 0 <= shard_id < n_shards, f"Invalid shard {shard_id} of {n_shards}"
+    return list(items)[shard_id::n_shards]
+
+
+def get_shard_path(zip_path: str, shard_id: int, n_shards: int) -> str:
+    zip_path = Path(zip_path)
+    return str(zip_path.with_name(f"{zip_path.stem}.shard_{shard_id:03d}_of_{n_shards:03d}{zip_path.suffix}"))
+
+
+@profiled("submission.merge_shards")
+def merge_submission_shards(shard_paths: Sequence[str], zip_path: str) -> int:
+    """
+    Combines partial submission zips (e.g., written by several processes with `get_shard_items()`) into a single zip.
+    Entries are copied as they are stored, i.e., videos and meshes are neither decompressed nor re-encoded.
+    The merged zip is written to a temporary file first and only moved to `zip_path` once it is complete.
+
+    Returns
+    -------
+        The number of merged entries
+    """
+
+    assert len(shard_paths) > 0, "No shards to merge"
+    assert all(Path(shard_path).resolve() != Path(zip_path).resolve() for shard_path in shard_paths), \
+        "The merged zip must not overwrite one of its shards"
+
+    ensure_directory_exists_for_file(zip_path)
+    temp_zip_path = f"{zip_path}.tmp"
+    merged_files = dict()  # filename => shard
+    try:
+        with zipfile.ZipFile(temp_zip_path, 'w') as target_zipf:
+            for shard_path in shard_paths:
+                with zipfile.ZipFile(shard_path, 'r') as source_zipf:
+                    for zip_info in source_zipf.infolist():
+                        assert zip_info.filename not in merged_files, \
+                            f"{zip_info.filename} is contained in both {merged_files[zip_info.filename]} and {shard_path}"
+                        merged_files[zip_info.filename] = shard_path
+                        _copy_zip_entry_raw(source_zipf, zip_info, target_zipf)
+        os.replace(temp_zip_path, zip_path)
+    finally:
+        Path(temp_zip_path).unlink(missing_ok=True)
+
+    return len(merged_files)
+
+
+def _copy_zip_entry_raw(source_zipf: zipfile.ZipFile, zip_info: zipfile.ZipInfo, target_zipf: zipfile.ZipFile, chunk_size: int = 8 * 1024 * 1024):
+    # zipfile has no public API for copying compressed data. The local file header is written with zipfile's own
+    # ZipInfo.FileHeader() and the entry is registered with the target, such that ZipFile.close() writes the central
+    # directory (including ZIP64 records) as for any other entry
+    assert not zip_info.flag_bits & 0x1, f"Cannot merge encrypted entry {zip_info.filename}"
+
+    source_file = source_zipf.fp
+    source_file.seek(zip_info.header_offset)
+    local_header = source_file.read(zipfile.sizeFileHeader)
+    assert local_header[:4] == zipfile.stringFileHeader, f"Invalid local file header of {zip_info.filename}"
+    filename_length, extra_length = struct.unpack('<HH', local_header[26:30])
+    source_file.seek(zip_info.header_offset + zipfile.sizeFileHeader + filename_length + extra_length)
+
+    target_info = zipfile.ZipInfo(zip_info.filename, date_time=zip_info.date_time)
+    target_info.compress_type = zip_info.compress_type
+    target_info.CRC = zip_info.CRC
+    target_info.compress_size = zip_info.compress_size
+    target_info.file_size = zip_info.file_size
+    target_info.create_system = zip_info.create_system
+    target_info.external_attr = zip_info.external_attr
+    # CRC and sizes are known upfront and go into the local header. A trailing data descriptor is not needed
+    target_info.flag_bits = zip_info.flag_bits & ~0x08
+
+    target_file = target_zipf.fp
+    target_info.header_offset = target_file.tell()
+    with timed("submission.zip_copy"):
+        target_file.write(target_info.FileHeader())
+        n_remaining_bytes = zip_info.compress_size
+        while n_remaining_bytes > 0:
+            chunk = source_file.read(min(chunk_size, n_remaining_bytes))
+            assert len(chunk) > 0, f"Unexpected end of file while copying {zip_info.filename}"
+            target_file.write(chunk)
+            n_remaining_bytes -= len(chunk)
+    increment("submission.bytes_copied", zip_info.compress_size)
+
+    target_zipf.start_dir = target_file.tell()
+    target_zipf.filelist.append(target_info)
+    target_zipf.NameToInfo[target_info.filename] = target_info
+    target_zipf._didModify = True
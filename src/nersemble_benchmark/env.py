@@ -9,6 +9,7 @@ if env_file_path.exists():
 
 with env.prefixed("NERSEMBLE_BENCHMARK_"):
     NERSEMBLE_BENCHMARK_URL = env("URL", f"<<<Define NERSEMBLE_BENCHMARK_URL in {env_file_path}>>>")
+    NERSEMBLE_BENCHMARK_PROFILING = env.bool("PROFILING", False)  # Collect timings in nersemble_benchmark.util.profiling
 
 NERSEMBLE_BENCHMARK_URL_NVS = f"{NERSEMBLE_BENCHMARK_URL}/nvs"
 NERSEMBLE_BENCHMARK_URL_MONO_FLAME_AVATAR = f"{NERSEMBLE_BENCHMARK_URL}/mono_flame_avatar"
@@ -0,0 +1,191 @@
+from typing import Tuple
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+
+# ==========================================================
+# Rigid alignment
+# ==========================================================
+
+def estimate_similarity_transform(source: np.ndarray, target: np.ndarray, with_scale: bool = True) -> Tuple[float, np.ndarray, np.ndarray]:
+    """
+    Least-squares similarity transform (Umeyama, 1991) that maps source points [N, 3] onto target points [N, 3]:
+        target ~= scale * rotation @ source + translation
+
+    Returns
+    -------
+        scale, rotation [3, 3], translation [3]
+    """
+
+    assert source.shape == target.shape and source.ndim == 2 and source.shape[1] == 3
+
+    source_mean = source.mean(axis=0)
+    target_mean = target.mean(axis=0)
+    source_centered = source - source_mean
+    target_centered = target - target_mean
+
+    covariance = target_centered.T @ source_centered / len(source)
+    U, S, Vt = np.linalg.svd(covariance)
+    reflection = np.eye(3)
+    if np.linalg.det(U) * np.linalg.det(Vt) < 0:
+        reflection[2, 2] = -1
+
+    rotation = U @ reflection @ Vt
+    if with_scale:
+        source_variance = np.square(source_centered).sum() / len(source)
+        scale = float(np.trace(np.diag(S) @ reflection) / source_variance)
+    else:
+        scale = 1.
+    translation = target_mean - scale * rotation @ source_mean
+
+    return scale, rotation, translation
+
+
+def apply_similarity_transform(points: np.ndarray, scale: float, rotation: np.ndarray, translation: np.ndarray) -> np.ndarray:
+    return scale * points @ rotation.T + translation
+
+
+# ==========================================================
+# Point-to-surface distances
+# ==========================================================
+
+def closest_points_on_triangles(points: np.ndarray, a: np.ndarray, b: np.ndarray, c: np.ndarray) -> np.ndarray:
+    """
+    Closest points on triangles (a[i], b[i], c[i]) for query points[i]. All inputs are [N, 3].
+    Vectorized version of the region-based test from Ericson, "Real-Time Collision Detection" (2004), Section 5.1.5.
+    """
+
+    ab = b - a
+    ac = c - a
+    ap = points - a
+    bp = points - b
+    cp = points - c
+
+    def dot(x, y):
+        return np.einsum('ij,ij->i', x, y)
+
+    d1 = dot(ab, ap)
+    d2 = dot(ac, ap)
+    d3 = dot(ab, bp)
+    d4 = dot(ac, bp)
+    d5 = dot(ab, cp)
+    d6 = dot(ac, cp)
+
+    va = d3 * d6 - d5 * d4
+    vb = d5 * d2 - d1 * d6
+    vc = d1 * d4 - d3 * d2
+
+    # Default: Projection falls inside the face
+    with np.errstate(divide='ignore', invalid='ignore'):
+        denominator = va + vb + vc
+        v = vb / denominator
+        w = vc / denominator
+    closest = a + ab * v[:, None] + ac * w[:, None]
+
+    # Regions are checked from the least to the most specific, later assignments take precedence
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # Edge BC
+        in_bc = (va <= 0) & (d4 - d3 >= 0) & (d5 - d6 >= 0)
+        w_bc = (d4 - d3) / ((d4 - d3) + (d5 - d6))
+        closest[in_bc] = (b + (c - b) * w_bc[:, None])[in_bc]
+
+        # Edge AC
+        in_ac = (vb <= 0) & (d2 >= 0) & (d6 <= 0)
+        w_ac = d2 / (d2 - d6)
+        closest[in_ac] = (a + ac * w_ac[:, None])[in_ac]
+
+        # Edge AB
+        in_ab = (vc <= 0) & (d1 >= 0) & (d3 <= 0)
+        v_ab = d1 / (d1 - d3)
+        closest[in_ab] = (a + ab * v_ab[:, None])[in_ab]
+
+    # Vertex regions
+    in_c = (d6 >= 0) & (d5 <= d6)
+    closest[in_c] = c[in_c]
+    in_b = (d3 >= 0) & (d4 <= d3)
+    closest[in_b] = b[in_b]
+    in_a = (d1 <= 0) & (d2 <= 0)
+    closest[in_a] = a[in_a]
+
+    # Degenerate triangles: fall back to the closest vertex
+    degenerate = ~np.isfinite(closest).all(axis=1)
+    if degenerate.any():
+        vertices = np.stack([a[degenerate], b[degenerate], c[degenerate]], axis=1)
+        i_closest = np.square(vertices - points[degenerate, None]).sum(axis=-1).argmin(axis=1)
+        closest[degenerate] = vertices[np.arange(len(vertices)), i_closest]
+
+    return closest
+
+
+class MeshDistanceIndex:
+    """
+    Spatial index for exact point-to-surface queries against a triangle mesh.
+    A KD-tree over face centroids provides the k nearest candidate faces per query. The result is exact: Queries for which
+    a face outside the candidates could still be closer (as bounded by the largest centroid-to-vertex distance) are
+    resolved with a radius search.
+    """
+
+    RADIUS_SEARCH_BATCH_SIZE = 4096
+
+    def __init__(self, vertices: np.ndarray, faces: np.ndarray, n_candidates: int = 8):
+        self._triangles = np.asarray(vertices, dtype=np.float64)[np.asarray(faces)]  # [F, 3, 3]
+        centroids = self._triangles.mean(axis=1)
+        self._face_radius = float(np.linalg.norm(self._triangles - centroids[:, None], axis=-1).max())
+        self._kd_tree = cKDTree(centroids)
+        self._n_candidates = min(n_candidates, len(faces))
+
+    def query(self, points: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns
+        -------
+            distances [N] and closest points on the surface [N, 3] for query points [N, 3]
+        """
+
+        points = np.asarray(points, dtype=np.float64)
+        centroid_distances, candidate_faces = self._kd_tree.query(points, k=self._n_candidates)
+        if self._n_candidates == 1:
+            centroid_distances = centroid_distances[:, None]
+            candidate_faces = candidate_faces[:, None]
+
+        n_points = len(points)
+        closest_points = np.empty((n_points, 3))
+        distances = np.full(n_points, np.inf)
+        for k in range(self._n_candidates):
+            triangles = self._triangles[candidate_faces[:, k]]
+            candidate_points = closest_points_on_triangles(points, triangles[:, 0], triangles[:, 1], triangles[:, 2])
+            candidate_distances = np.linalg.norm(candidate_points - points, axis=-1)
+            is_closer = candidate_distances < distances
+            distances[is_closer] = candidate_distances[is_closer]
+            closest_points[is_closer] = candidate_points[is_closer]
+
+        # Any face whose centroid is further away than the k-th candidate is at least (centroid distance - face radius) away.
+        # Queries where such a face could still be closer are resolved with a radius search
+        if self._n_candidates < len(self._triangles):
+            uncertain = np.where(centroid_distances[:, -1] - self._face_radius < distances)[0]
+            for i_start in range(0, len(uncertain), self.RADIUS_SEARCH_BATCH_SIZE):
+                self._resolve_with_radius_search(points, uncertain[i_start: i_start + self.RADIUS_SEARCH_BATCH_SIZE], distances, closest_points)
+
+        return distances, closest_points
+
+    def _resolve_with_radius_search(self, points: np.ndarray, point_indices: np.ndarray, distances: np.ndarray, closest_points: np.ndarray):
+        candidate_faces = self._kd_tree.query_ball_point(points[point_indices], distances[point_indices] + self._face_radius)
+        n_candidates_per_point = np.array([len(faces) for faces in candidate_faces])
+        if n_candidates_per_point.sum() == 0:
+            return
+
+        query_indices = np.repeat(point_indices, n_candidates_per_point)
+        face_indices = np.concatenate([faces for faces in candidate_faces if faces]).astype(np.int64)
+        triangles = self._triangles[face_indices]
+        query_points = points[query_indices]
+        candidate_points = closest_points_on_triangles(query_points, triangles[:, 0], triangles[:, 1], triangles[:, 2])
+        candidate_distances = np.linalg.norm(candidate_points - query_points, axis=-1)
+
+        # Closest candidate per query point: sort by point, then by distance and take the first entry of each point
+        order = np.lexsort((candidate_distances, query_indices))
+        _, first = np.unique(query_indices[order], return_index=True)
+        best = order[first]
+        best_query_indices = query_indices[best]
+        is_closer = candidate_distances[best] < distances[best_query_indices]
+        distances[best_query_indices[is_closer]] = candidate_distances[best][is_closer]
+        closest_points[best_query_indices[is_closer]] = candidate_points[best][is_closer]
@@ -0,0 +1,188 @@
+from typing import Optional, Dict, Tuple
+
+import cv2
+import numpy as np
+
+SSIM_KERNEL_SIZE = 11
+SSIM_SIGMA = 1.5
+SSIM_K1 = 0.01
+SSIM_K2 = 0.03
+
+
+def to_float_image(image: np.ndarray) -> np.ndarray:
+    """
+    Converts uint8 images to float32 in [0, 1]. Float images are only cast to float32.
+    """
+
+    if image.dtype == np.uint8:
+        return image.astype(np.float32) / 255
+    return image.astype(np.float32, copy=False)
+
+
+def to_float_mask(alpha_map: np.ndarray) -> np.ndarray:
+    """
+    [H, W] float32 mask in [0, 1] from an alpha map given as [H, W] or [H, W, C] (only the first channel is used).
+    """
+
+    if alpha_map.ndim == 3:
+        alpha_map = alpha_map[..., 0]
+    return to_float_image(alpha_map)
+
+
+# ==========================================================
+# PSNR
+# ==========================================================
+
+def compute_psnr(prediction: np.ndarray, target: np.ndarray, mask: Optional[np.ndarray] = None) -> float:
+    """
+    PSNR between two images [H, W, 3] with values in [0, 1].
+    With a mask [H, W], the mean squared error is only taken over the (soft) foreground pixels.
+    """
+
+    squared_error = np.square(prediction - target).mean(axis=-1)
+    if mask is None:
+        mse = squared_error.mean()
+    else:
+        mse = (squared_error * mask).sum() / max(mask.sum(), 1e-8)
+
+    return float(-10 * np.log10(max(mse, 1e-10)))
+
+
+# ==========================================================
+# SSIM
+# ==========================================================
+
+def compute_ssim_map(prediction: np.ndarray, target: np.ndarray) -> np.ndarray:
+    """
+    Per-pixel SSIM [H, W] (averaged over channels) with an 11x11 Gaussian window (sigma 1.5) following Wang et al. (2004).
+    All local statistics are computed for all channels at once via separable Gaussian filtering.
+    """
+
+    # Images are in [0, 1], i.e., the dynamic range is 1
+    c1 = SSIM_K1 ** 2
+    c2 = SSIM_K2 ** 2
+
+    def blur(image: np.ndarray) -> np.ndarray:
+        return cv2.GaussianBlur(image, (SSIM_KERNEL_SIZE, SSIM_KERNEL_SIZE), SSIM_SIGMA, borderType=cv2.BORDER_REFLECT)
+
+    mu_prediction = blur(prediction)
+    mu_target = blur(target)
+    mu_prediction_sq = mu_prediction * mu_prediction
+    mu_target_sq = mu_target * mu_target
+    mu_prediction_target = mu_prediction * mu_target
+
+    sigma_prediction_sq = blur(prediction * prediction) - mu_prediction_sq
+    sigma_target_sq = blur(target * target) - mu_target_sq
+    sigma_prediction_target = blur(prediction * target) - mu_prediction_target
+
+    ssim_map = ((2 * mu_prediction_target + c1) * (2 * sigma_prediction_target + c2)) \
+               / ((mu_prediction_sq + mu_target_sq + c1) * (sigma_prediction_sq + sigma_target_sq + c2))
+
+    if ssim_map.ndim == 3:
+        ssim_map = ssim_map.mean(axis=-1)
+
+    return ssim_map
+
+
+def compute_ssim(prediction: np.ndarray, target: np.ndarray, mask: Optional[np.ndarray] = None) -> float:
+    """
+    Mean SSIM between two images [H, W, 3] with values in [0, 1].
+    Pixels closer than half a window to the image border are ignored. With a mask [H, W], the SSIM map is averaged
+    weighted by the mask.
+    """
+
+    ssim_map = compute_ssim_map(prediction, target)
+
+    border = SSIM_KERNEL_SIZE // 2
+    ssim_map = ssim_map[border:-border, border:-border]
+    if mask is None:
+        return float(ssim_map.mean())
+
+    mask = mask[border:-border, border:-border]
+    return float((ssim_map * mask).sum() / max(mask.sum(), 1e-8))
+
+
+# ==========================================================
+# LPIPS
+# ==========================================================
+
+_LPIPS_MODELS: Dict[Tuple[str, str], object] = dict()
+
+
+def compute_lpips(prediction: np.ndarray,
+                  target: np.ndarray,
+                  mask: Optional[np.ndarray] = None,
+                  net: str = 'alex',
+                  device: str = 'cpu') -> float:
+    """
+    LPIPS distance between two images [H, W, 3] with values in [0, 1]. Requires the optional `lpips` package.
+    Since LPIPS is not a per-pixel metric, a mask is applied by compositing both images onto a black background.
+    The LPIPS network is loaded once per process.
+    """
+
+    import torch
+
+    key = (net, device)
+    if key not in _LPIPS_MODELS:
+        try:
+            import lpips
+        except ImportError:
+            raise ImportError("Computing LPIPS requires the lpips package. Install it via pip install lpips")
+
+        _LPIPS_MODELS[key] = lpips.LPIPS(net=net, verbose=False).to(device).eval()
+    lpips_model = _LPIPS_MODELS[key]
+
+    if mask is not None:
+        prediction = prediction * mask[..., None]
+        target = target * mask[..., None]
+
+    def to_tensor(image: np.ndarray) -> 'torch.Tensor':
+        # LPIPS expects [B, 3, H, W] in [-1, 1]
+        return torch.from_numpy(np.ascontiguousarray(image)).permute(2, 0, 1)[None].to(device) * 2 - 1
+
+    with torch.no_grad():
+        distance = lpips_model(to_tensor(prediction), to_tensor(target))
+
+    return float(distance.item())
+
+
+# ==========================================================
+# All metrics
+# ==========================================================
+
+AVAILABLE_METRICS = ['psnr', 'ssim', 'lpips']
+
+
+def compute_metrics(prediction: np.ndarray,
+                    target: np.ndarray,
+                    alpha_map: Optional[np.ndarray] = None,
+                    metrics: Tuple[str, ...] = ('psnr', 'ssim'),
+                    lpips_net: str = 'alex',
+                    device: str = 'cpu') -> Dict[str, float]:
+    """
+    Computes the selected metrics between a predicted and a ground truth frame. Frames may be given as uint8 or float images.
+    If the resolutions differ, the ground truth (and alpha map) is resized to the resolution of the prediction.
+    """
+
+    unexpected_metrics = [metric for metric in metrics if metric not in AVAILABLE_METRICS]
+    assert len(unexpected_metrics) == 0, f"Unknown metrics {unexpected_metrics}. Available: {AVAILABLE_METRICS}"
+
+    height, width = prediction.shape[:2]
+    if target.shape[:2] != (height, width):
+        target = cv2.resize(target, (width, height), interpolation=cv2.INTER_AREA)
+    if alpha_map is not None and alpha_map.shape[:2] != (height, width):
+        alpha_map = cv2.resize(alpha_map, (width, height), interpolation=cv2.INTER_AREA)
+
+    prediction = to_float_image(prediction)
+    target = to_float_image(target)
+    mask = None if alpha_map is None else to_float_mask(alpha_map)
+
+    results = dict()
+    if 'psnr' in metrics:
+        results['psnr'] = compute_psnr(prediction, target, mask=mask)
+    if 'ssim' in metrics:
+        results['ssim'] = compute_ssim(prediction, target, mask=mask)
+    if 'lpips' in metrics:
+        results['lpips'] = compute_lpips(prediction, target, mask=mask, net=lpips_net, device=device)
+
+    return results
@@ -0,0 +1,200 @@
+import json
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, Tuple, Optional, Union, List, TYPE_CHECKING
+
+import numpy as np
+from elias.util import ensure_directory_exists_for_file
+from tqdm import tqdm
+
+from nersemble_benchmark.data.submission_data import SVFRSubmissionDataReader
+from nersemble_benchmark.evaluation.geometry import estimate_similarity_transform, apply_similarity_transform, MeshDistanceIndex
+from nersemble_benchmark.util.benchmark_index import SVFRTask
+
+if TYPE_CHECKING:
+    import trimesh
+
+SVFRKey = Tuple[int, str, int, str]  # participant_id, sequence_name, timestep, serial
+# Predicted mesh and its 7 NoW landmarks (may be None for meshes in FLAME topology)
+SVFRPredictions = Union[SVFRSubmissionDataReader, Dict[SVFRKey, Tuple['trimesh.Trimesh', Optional[np.ndarray]]]]
+
+
+@dataclass
+class SVFRGroundTruth:
+    points: np.ndarray  # (N, 3) ground truth scan
+    landmarks: np.ndarray  # (7, 3) NoW landmarks on the scan
+
+
+@dataclass
+class SVFREvaluationResult:
+    """
+    Scan-to-mesh distances (in units of the ground truth scans) after aligning each prediction to its ground truth scan.
+        - per_key: mean/median/std distance per image key
+        - aggregate: mean/median/std over the distances of all scan points of all image keys (NoW convention)
+    """
+
+    distances: Dict[SVFRKey, np.ndarray] = field(default_factory=dict)
+
+    @property
+    def per_key(self) -> List[Dict]:
+        per_key = []
+        for (participant_id, sequence_name, timestep, serial), distances in self.distances.items():
+            row = dict(participant_id=participant_id, sequence_name=sequence_name, timestep=timestep, serial=serial)
+            row.update(self._summarize(distances))
+            per_key.append(row)
+
+        return per_key
+
+    @property
+    def aggregate(self) -> Dict:
+        aggregate = dict(n_keys=len(self.distances))
+        all_distances = np.concatenate(list(self.distances.values())) if self.distances else np.zeros(0)
+        aggregate.update(self._summarize(all_distances))
+        return aggregate
+
+    def print_summary(self):
+        header = f"{'participant':>11} | {'image key':>40} | {'mean':>8} | {'median':>8} | {'std':>8}"
+        print(header)
+        print('-' * len(header))
+        for row in self.per_key:
+            image_key = f"{row['sequence_name']}_{row['timestep']:03d}_{row['serial']}"
+            print(f"{row['participant_id']:>11} | {image_key:>40} | {row['mean']:>8.4f} | {row['median']:>8.4f} | {row['std']:>8.4f}")
+        print('-' * len(header))
+        aggregate = self.aggregate
+        print(f"{'all':>11} | {aggregate['n_keys']:>40} | {aggregate['mean']:>8.4f} | {aggregate['median']:>8.4f} | {aggregate['std']:>8.4f}")
+
+    def save(self, path: str):
+        ensure_directory_exists_for_file(path)
+        with open(path, 'w') as f:
+            json.dump(dict(aggregate=self.aggregate, per_key=self.per_key), f, indent=1)
+
+    @staticmethod
+    def _summarize(distances: np.ndarray) -> Dict:
+        if len(distances) == 0:
+            return dict(n_points=0, mean=float('nan'), median=float('nan'), std=float('nan'))
+        return dict(n_points=len(distances), mean=float(distances.mean()), median=float(np.median(distances)), std=float(distances.std()))
+
+
+def evaluate_svfr(predictions: SVFRPredictions,
+                  ground_truths: Dict[SVFRKey, SVFRGroundTruth],
+                  svfr_task: SVFRTask = 'posed',
+                  flame_landmark_indices: Optional[np.ndarray] = None,
+                  n_refinement_iterations: int = 10,
+                  n_workers: int = 1) -> SVFREvaluationResult:
+    """
+    Scores predicted meshes against ground truth scans:
+        1. Similarity alignment of the scan to the mesh via the 7 NoW landmarks
+        2. Refinement of the alignment by iteratively minimizing the scan-to-mesh distance
+        3. Distance of every scan point to the closest point on the predicted surface
+
+    Parameters
+    ----------
+    predictions:
+        Either a SVFR submission reader or a dict (participant_id, sequence_name, timestep, serial) => (mesh, now_landmarks)
+    ground_truths:
+        Scans and their NoW landmarks for all image keys that should be evaluated
+    svfr_task:
+        Whether the posed or neutral meshes of a submission reader are evaluated
+    flame_landmark_indices:
+        Vertex indices of the 7 NoW landmarks on the FLAME mesh. Needed for predicted meshes in FLAME topology that do not
+        come with landmarks
+    n_refinement_iterations:
+        Number of closest-point iterations after the landmark alignment. 0 disables the refinement
+    n_workers:
+        Number of processes across which the image keys are distributed
+
+    Returns
+    -------
+        Per-key and aggregate scan-to-mesh distances
+    """
+
+    evaluation_result = SVFREvaluationResult()
+    if n_workers <= 1:
+        for key, ground_truth in tqdm(ground_truths.items(), desc="Evaluating meshes", unit='mesh'):
+            vertices, faces, landmarks = _load_prediction(predictions, key, svfr_task, flame_landmark_indices)
+            evaluation_result.distances[key] = compute_scan_to_mesh_distances(vertices, faces, landmarks,
+                                                                              ground_truth.points, ground_truth.landmarks, n_refinement_iterations)
+    else:
+        # Meshes are read from the submission in the main process, alignment and distance queries run in the workers.
+        # Bound the number of pending meshes such that reading cannot run arbitrarily far ahead of the workers
+        with ProcessPoolExecutor(max_workers=n_workers) as executor, \
+                tqdm(total=len(ground_truths), desc="Evaluating meshes", unit='mesh') as progress_bar:
+            pending_futures = deque()  # (key, future)
+            for key, ground_truth in ground_truths.items():
+                if len(pending_futures) >= 2 * n_workers:
+                    _collect_oldest(pending_futures, evaluation_result, progress_bar)
+                vertices, faces, landmarks = _load_prediction(predictions, key, svfr_task, flame_landmark_indices)
+                pending_futures.append((key, executor.submit(compute_scan_to_mesh_distances, vertices, faces, landmarks,
+                                                             ground_truth.points, ground_truth.landmarks, n_refinement_iterations)))
+
+            while pending_futures:
+                _collect_oldest(pending_futures, evaluation_result, progress_bar)
+
+    return evaluation_result
+
+
+def compute_scan_to_mesh_distances(vertices: np.ndarray,
+                                   faces: np.ndarray,
+                                   landmarks: np.ndarray,
+                                   scan_points: np.ndarray,
+                                   scan_landmarks: np.ndarray,
+                                   n_refinement_iterations: int = 10) -> np.ndarray:
+    """
+    Distances [N] of all scan points to the predicted surface, measured in the units of the scan.
+    The scan is transformed into the space of the predicted mesh, such that the spatial index over the mesh only has to be
+    built once.
+    """
+
+    mesh_index = MeshDistanceIndex(vertices, faces)
+
+    scale, rotation, translation = estimate_similarity_transform(scan_landmarks, landmarks)
+    for _ in range(n_refinement_iterations):
+        aligned_scan_points = apply_similarity_transform(scan_points, scale, rotation, translation)
+        _, closest_points = mesh_index.query(aligned_scan_points)
+        scale, rotation, translation = estimate_similarity_transform(scan_points, closest_points)
+
+    aligned_scan_points = apply_similarity_transform(scan_points, scale, rotation, translation)
+    distances, _ = mesh_index.query(aligned_scan_points)
+
+    return distances / scale
+
+
+# ----------------------------------------------------------
+# Helpers
+# ----------------------------------------------------------
+
+def _load_prediction(predictions: SVFRPredictions,
+                     key: SVFRKey,
+                     svfr_task: SVFRTask,
+                     flame_landmark_indices: Optional[np.ndarray]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    participant_id, sequence_name, timestep, serial = key
+    if isinstance(predictions, SVFRSubmissionDataReader):
+        if svfr_task == 'posed':
+            mesh = predictions.load_posed_mesh(participant_id, sequence_name, timestep, serial)
+        else:
+            mesh = predictions.load_neutral_mesh(participant_id, sequence_name, timestep, serial)
+
+        landmarks = None
+        if len(mesh.vertices) != 5023:
+            if svfr_task == 'posed':
+                landmarks = predictions.load_posed_landmarks(participant_id, sequence_name, timestep, serial)
+            else:
+                landmarks = predictions.load_neutral_landmarks(participant_id, sequence_name, timestep, serial)
+    else:
+        mesh, landmarks = predictions[key]
+
+    vertices = np.asarray(mesh.vertices, dtype=np.float64)
+    if landmarks is None:
+        assert len(vertices) == 5023 and flame_landmark_indices is not None, \
+            f"Prediction for {key} has no landmarks. For meshes in FLAME topology, flame_landmark_indices have to be provided"
+        landmarks = vertices[flame_landmark_indices]
+    assert landmarks.shape == (7, 3), f"NoW landmarks expected shape: 7x3. Got: {landmarks.shape}"
+
+    return vertices, np.asarray(mesh.faces), np.asarray(landmarks, dtype=np.float64)
+
+
+def _collect_oldest(pending_futures: deque, evaluation_result: SVFREvaluationResult, progress_bar: tqdm):
+    key, future = pending_futures.popleft()
+    evaluation_result.distances[key] = future.result()
+    progress_bar.update(1)
@@ -0,0 +1,240 @@
+import json
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from itertools import count
+from pathlib import Path
+from typing import List, Dict, Optional, Tuple, Union, Iterable, Iterator, Sequence
+
+import numpy as np
+from elias.util import ensure_directory_exists_for_file
+from tqdm import tqdm
+
+from nersemble_benchmark.data.benchmark_data import BaseDataManager
+from nersemble_benchmark.data.submission_data import VideoSubmissionDataReader
+from nersemble_benchmark.evaluation.metrics import compute_metrics, AVAILABLE_METRICS
+from nersemble_benchmark.util.video import VideoFrameLoader
+
+VideoKey = Tuple[int, str, str]  # participant_id, sequence_name, serial
+Predictions = Union[VideoSubmissionDataReader, Dict[VideoKey, Iterable[np.ndarray]]]
+
+
+@dataclass
+class VideoEvaluationResult:
+    """
+    Metrics of an evaluation run in three granularities:
+        - per_frame: One row per scored frame with participant_id, sequence_name, serial, timestep and all metrics
+        - per_camera: Metrics averaged over all frames of a video
+        - aggregate: Metrics averaged over all scored frames
+    """
+
+    metrics: List[str]
+    per_frame: List[Dict] = field(default_factory=list)
+
+    @property
+    def per_camera(self) -> List[Dict]:
+        frames_per_video = defaultdict(list)
+        for row in self.per_frame:
+            frames_per_video[(row['participant_id'], row['sequence_name'], row['serial'])].append(row)
+
+        per_camera = []
+        for (participant_id, sequence_name, serial), rows in frames_per_video.items():
+            per_camera_row = dict(participant_id=participant_id, sequence_name=sequence_name, serial=serial, n_frames=len(rows))
+            per_camera_row.update(self._average(rows))
+            per_camera.append(per_camera_row)
+
+        return per_camera
+
+    @property
+    def aggregate(self) -> Dict:
+        aggregate = dict(n_frames=len(self.per_frame))
+        aggregate.update(self._average(self.per_frame))
+        return aggregate
+
+    def print_summary(self):
+        header = f"{'participant':>11} | {'sequence':>20} | {'serial':>9} | {'#frames':>7} | " + " | ".join(f"{metric:>7}" for metric in self.metrics)
+        print(header)
+        print('-' * len(header))
+        for row in self.per_camera:
+            print(f"{row['participant_id']:>11} | {row['sequence_name']:>20} | {row['serial']:>9} | {row['n_frames']:>7} | "
+                  + " | ".join(f"{row[metric]:>7.4f}" for metric in self.metrics))
+        print('-' * len(header))
+        aggregate = self.aggregate
+        print(f"{'all':>11} | {'':>20} | {'':>9} | {aggregate['n_frames']:>7} | " + " | ".join(f"{aggregate[metric]:>7.4f}" for metric in self.metrics))
+
+    def save(self, path: str):
+        ensure_directory_exists_for_file(path)
+        with open(path, 'w') as f:
+            json.dump(dict(aggregate=self.aggregate, per_camera=self.per_camera, per_frame=self.per_frame), f, indent=1)
+
+    def _average(self, rows: List[Dict]) -> Dict[str, float]:
+        return {metric: float(np.mean([row[metric] for row in rows])) if rows else float('nan') for metric in self.metrics}
+
+
+def evaluate_videos(predictions: Predictions,
+                    data_managers: Union[BaseDataManager, Dict[int, BaseDataManager]],
+                    video_keys: Optional[List[VideoKey]] = None,
+                    metrics: Sequence[str] = ('psnr', 'ssim'),
+                    use_alpha_maps: bool = True,
+                    every_nth_frame: Optional[int] = None,
+                    n_workers: int = 1,
+                    batch_size: int = 8,
+                    lpips_net: str = 'alex',
+                    device: str = 'cpu') -> VideoEvaluationResult:
+    """
+    Scores predicted videos against the ground truth videos of the local benchmark data, e.g., for train cameras that
+    were held out during model fitting.
+
+    Parameters
+    ----------
+    predictions:
+        Either a submission reader (NVS or mono FLAME avatar) or a dict (participant_id, sequence_name, serial) => frames
+        where frames can be any iterable of [H, W, 3] images (e.g., a list or generator)
+    data_managers:
+        Data manager that provides the ground truth frames (and alpha maps). Pass a dict participant_id => data manager
+        to evaluate multiple participants at once
+    video_keys:
+        Which videos to evaluate. Default: all videos contained in `predictions`
+    metrics:
+        Any of 'psnr', 'ssim' and 'lpips'. LPIPS requires the optional `lpips` package
+    use_alpha_maps:
+        Whether metrics should only consider the foreground, as given by the ground truth alpha maps. Their frame count
+        has to match the ground truth videos
+    every_nth_frame:
+        Only score every n-th frame of each video
+    n_workers:
+        Number of processes that compute metrics. Frames are decoded in the main process and streamed to the workers in
+        batches of `batch_size` frames
+    lpips_net, device:
+        Backbone and torch device for LPIPS
+
+    Returns
+    -------
+        Per-frame, per-camera and aggregate metrics
+    """
+
+    metrics = list(metrics)
+    unexpected_metrics = [metric for metric in metrics if metric not in AVAILABLE_METRICS]
+    assert len(unexpected_metrics) == 0, f"Unknown metrics {unexpected_metrics}. Available: {AVAILABLE_METRICS}"
+
+    if isinstance(data_managers, BaseDataManager):
+        data_manager = data_managers
+        data_managers = defaultdict(lambda: data_manager)
+
+    if video_keys is None:
+        if isinstance(predictions, VideoSubmissionDataReader):
+            video_keys = [(participant_id, sequence_name, serial)
+                          for participant_id, sequences in sorted(predictions.get_file_overview().items())
+                          for sequence_name, serials in sorted(sequences.items())
+                          for serial in sorted(serials)]
+        else:
+            video_keys = list(predictions.keys())
+
+    evaluation_result = VideoEvaluationResult(metrics)
+    frame_batches = _iter_frame_batches(predictions, data_managers, video_keys, use_alpha_maps, every_nth_frame, batch_size)
+    progress_bar = tqdm(desc="Evaluating frames", unit='frame')
+
+    if n_workers <= 1:
+        for frame_batch in frame_batches:
+            evaluation_result.per_frame.extend(_score_frame_batch(frame_batch, metrics, lpips_net, device))
+            progress_bar.update(len(frame_batch))
+    else:
+        # Bound the number of pending batches such that decoding cannot run arbitrarily far ahead of scoring
+        with ProcessPoolExecutor(max_workers=n_workers) as executor:
+            pending_futures = deque()  # (future, n_frames)
+            for frame_batch in frame_batches:
+                if len(pending_futures) >= 2 * n_workers:
+                    _collect_oldest(pending_futures, evaluation_result, progress_bar)
+                pending_futures.append((executor.submit(_score_frame_batch, frame_batch, metrics, lpips_net, device), len(frame_batch)))
+
+            while pending_futures:
+                _collect_oldest(pending_futures, evaluation_result, progress_bar)
+
+    progress_bar.close()
+
+    return evaluation_result
+
+
+# ----------------------------------------------------------
+# Helpers
+# ----------------------------------------------------------
+
+# (participant_id, sequence_name, serial, timestep, predicted frame, ground truth frame, alpha map or None)
+FrameItem = Tuple[int, str, str, int, np.ndarray, np.ndarray, Optional[np.ndarray]]
+
+
+def _iter_frame_batches(predictions: Predictions,
+                        data_managers: Dict[int, BaseDataManager],
+                        video_keys: List[VideoKey],
+                        use_alpha_maps: bool,
+                        every_nth_frame: Optional[int],
+                        batch_size: int) -> Iterator[List[FrameItem]]:
+    step = 1 if every_nth_frame is None else every_nth_frame
+    batch = []
+    for participant_id, sequence_name, serial in video_keys:
+        data_manager = data_managers[participant_id]
+
+        if isinstance(predictions, VideoSubmissionDataReader):
+            predicted_frames = predictions.iter_video_frames(participant_id, sequence_name, serial)
+        else:
+            predicted_frames = iter(predictions[(participant_id, sequence_name, serial)])
+
+        images_path = data_manager.get_images_path(sequence_name, serial)
+        assert Path(images_path).exists(), f"Could not find ground truth video {images_path}"
+        target_frames = VideoFrameLoader(images_path).load_all_frames()
+
+        if use_alpha_maps:
+            alpha_maps_path = data_manager.get_alpha_maps_path(sequence_name, serial)
+            assert Path(alpha_maps_path).exists(), f"Could not find ground truth alpha maps {alpha_maps_path}"
+            alpha_maps = VideoFrameLoader(alpha_maps_path).load_all_gray_frames()
+        else:
+            alpha_maps = None
+
+        # Decode predictions, ground truth and alpha maps in lockstep. With every_nth_frame, skipped frames still have
+        # to be decoded since the videos are streamed
+        predicted_frame = target_frame = None
+        for timestep in count():
+            predicted_frame = next(predicted_frames, None)
+            target_frame = next(target_frames, None)
+            alpha_map = None if alpha_maps is None else next(alpha_maps, None)
+            if predicted_frame is None or target_frame is None:
+                break
+            if alpha_maps is not None and alpha_map is None:
+                # Frames without alpha map would silently be scored on the full image
+                raise ValueError(f"Frame count mismatch for participant {participant_id}, {sequence_name}, cam {serial}: "
+                                 f"Alpha maps only have {timestep} frames but the ground truth has more")
+
+            if timestep % step == 0:
+                batch.append((participant_id, sequence_name, serial, timestep, predicted_frame, target_frame, alpha_map))
+                if len(batch) >= batch_size:
+                    yield batch
+                    batch = []
+
+        if predicted_frame is not None or target_frame is not None:
+            n_predicted_frames = timestep + (predicted_frame is not None) + sum(1 for _ in predicted_frames)
+            n_target_frames = timestep + (target_frame is not None) + sum(1 for _ in target_frames)
+            raise ValueError(f"Frame count mismatch for participant {participant_id}, {sequence_name}, cam {serial}: "
+                             f"Prediction has {n_predicted_frames} frames, ground truth has {n_target_frames}")
+        if alpha_maps is not None and alpha_map is not None:
+            n_alpha_maps = timestep + 1 + sum(1 for _ in alpha_maps)
+            raise ValueError(f"Frame count mismatch for participant {participant_id}, {sequence_name}, cam {serial}: "
+                             f"Alpha maps have {n_alpha_maps} frames, ground truth has {timestep}")
+
+    if batch:
+        yield batch
+
+
+def _score_frame_batch(frame_batch: List[FrameItem], metrics: List[str], lpips_net: str, device: str) -> List[Dict]:
+    rows = []
+    for participant_id, sequence_name, serial, timestep, predicted_frame, target_frame, alpha_map in frame_batch:
+        row = dict(participant_id=participant_id, sequence_name=sequence_name, serial=serial, timestep=timestep)
+        row.update(compute_metrics(predicted_frame, target_frame, alpha_map=alpha_map, metrics=metrics, lpips_net=lpips_net, device=device))
+        rows.append(row)
+
+    return rows
+
+
+def _collect_oldest(pending_futures: deque, evaluation_result: VideoEvaluationResult, progress_bar: tqdm):
+    future, n_frames = pending_futures.popleft()
+    evaluation_result.per_frame.extend(future.result())
+    progress_bar.update(n_frames)
@@ -1,15 +1,22 @@
+from typing import TYPE_CHECKING
+
 import numpy as np
-import torch
-import trimesh
 from dreifus.matrix import Pose
-from flame_model import FlameConfig, FLAME
 
 from nersemble_benchmark.data.benchmark_data import FlameTracking
 
+if TYPE_CHECKING:
+    # torch, flame_model and trimesh are only imported once a FlameProvider is created
+    import torch
+    import trimesh
+
 
 class FlameProvider:
 
     def __init__(self, flame_tracking: FlameTracking):
+        import torch
+        from flame_model import FlameConfig, FLAME
+
         flame_config = FlameConfig(
             shape_params=300,
             expression_params=100,
@@ -70,7 +77,7 @@ class FlameProvider:
 
         return flame_lms
 
-    def get_mesh(self, timestep: int) -> trimesh.Trimesh:
+    def get_mesh(self, timestep: int) -> 'trimesh.Trimesh':
         vertices = self.get_vertices(timestep)
         mesh = self.create_mesh(vertices)
         return mesh
@@ -81,7 +88,9 @@ class FlameProvider:
         model_to_world[:3, :3] *= self.scale[0].item()
         return model_to_world
 
-    def apply_model_to_world_transformation(self, points: torch.Tensor, timestep: int) -> torch.Tensor:
+    def apply_model_to_world_transformation(self, points: 'torch.Tensor', timestep: int) -> 'torch.Tensor':
+        import torch
+
         i = timestep
         points_world = points
         if self._separate_transformation:
@@ -99,7 +108,9 @@ class FlameProvider:
     def has_mesh(self, timestep: int) -> bool:
         return 0 <= timestep < self._T
 
-    def create_mesh(self, vertices: np.ndarray) -> trimesh.Trimesh:
+    def create_mesh(self, vertices: np.ndarray) -> 'trimesh.Trimesh':
+        import trimesh
+
         flame_mesh = trimesh.Trimesh(vertices, self.flame_model.faces, process=False)
 
         return flame_mesh
@@ -0,0 +1,150 @@
+import sys
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Literal, Union, List, Optional, Dict
+
+import tyro
+from elias.util import save_json
+from tqdm import tqdm
+
+from nersemble_benchmark.data.preprocessing import parse_relative_url
+from nersemble_benchmark.scripts.download_data import BenchmarkType, AssetsType, validate_assets, collect_benchmark_download_entries
+from nersemble_benchmark.util.data_check import FileCheck, check_file, FileCheckResult
+from nersemble_benchmark.util.download_manifest import DownloadManifest
+from nersemble_benchmark.util.metadata import NVSMetadata, MonoFLAMEAvatarMetadata
+
+
+def main(
+        benchmark_folder: Path,
+        benchmark_type: BenchmarkType,
+        /,
+        assets: AssetsType = 'all',
+        participant: Union[Literal['all'], List[int]] = 'all',
+        pointcloud_frames: Union[Literal['all'], List[int]] = [0],
+        full_decode: bool = False,
+        check_frame_counts: bool = True,
+        n_workers: int = 4,
+        report_path: Optional[Path] = None) -> Dict:
+    """
+    Checks that the downloaded benchmark data in `benchmark_folder` is complete and readable and writes a JSON report.
+    The same options as for `nersemble-benchmark-download` select which files are expected.
+
+    Every file is checked for existence and its size is compared with the local download manifest. Videos must contain as many
+    frames as the benchmark metadata lists for their sequence, and tracking files, pointclouds and images must be parsable.
+
+    Parameters
+    ----------
+    benchmark_folder:
+        Where the benchmark data was downloaded to
+    benchmark_type:
+        For which benchmark to check the data
+    assets:
+        Which assets to check
+    participant:
+        For which participants to check the data ('all' or space-separated list of participant IDs)
+    pointcloud_frames:
+        Only for NVS benchmark: For which timesteps pointclouds are expected ('all' or space-separated list of timesteps)
+    full_decode:
+        Decode every frame of every video and read tracking files and pointclouds completely instead of only their headers.
+        Finds corrupted data in the middle of files but is much slower
+    check_frame_counts:
+        Compare the number of frames of videos with the benchmark metadata. Requires access to the benchmark server
+    n_workers:
+        Number of processes that check files in parallel
+    report_path:
+        Where to write the JSON report. Default: `check_report.json` in the benchmark type folder
+    """
+
+    assets = validate_assets(benchmark_type, assets)
+    folder = f"{benchmark_folder}/{benchmark_type}"
+    download_entries = collect_benchmark_download_entries(benchmark_type, assets, participant, pointcloud_frames=pointcloud_frames)
+
+    manifest = DownloadManifest(folder)
+    n_frames_per_sequence = load_n_frames_per_sequence(benchmark_type) if check_frame_counts else dict()
+    file_checks = []
+    for download_entry in download_entries:
+        manifest_entry = manifest.get(download_entry.relative_url)
+        expected_n_frames = None
+        parsed_url = parse_relative_url(benchmark_type, download_entry.relative_url)
+        if parsed_url is not None and download_entry.relative_url.endswith('.mp4'):
+            expected_n_frames = n_frames_per_sequence.get((int(parsed_url[1]['p_id']), parsed_url[1]['seq_name']))
+        file_checks.append(FileCheck(download_entry.relative_url,
+                                     download_entry.asset,
+                                     expected_size=None if manifest_entry is None else manifest_entry.size,
+                                     expected_n_frames=expected_n_frames))
+
+    # Large files first, such that no single large file is left running at the end
+    file_checks = sorted(file_checks, key=lambda file_check: -(file_check.expected_size or 0))
+    print(f"Checking {len(file_checks)} files in {folder} with {n_workers} workers")
+    with ProcessPoolExecutor(max_workers=n_workers) as executor:
+        futures = [executor.submit(check_file, folder, file_check, full_decode) for file_check in file_checks]
+        results = [future.result() for future in tqdm(futures, unit='file')]
+
+    report = create_report(benchmark_type, results, full_decode=full_decode,
+                           n_files_unverified_size=sum(1 for file_check in file_checks if file_check.expected_size is None))
+    if report_path is None:
+        report_path = f"{folder}/check_report.json"
+    save_json(report, str(report_path))
+    print_report(report)
+    print(f"Saved report to {report_path}")
+
+    return report
+
+
+def load_n_frames_per_sequence(benchmark_type: BenchmarkType) -> Dict[tuple, int]:
+    """
+    Expected number of frames of all videos of a sequence, keyed by (participant_id, sequence_name).
+    """
+
+    n_frames_per_sequence = dict()
+    if benchmark_type == 'nvs':
+        for participant_id, sequence_metadata in NVSMetadata.load().sequences.items():
+            n_frames_per_sequence[(participant_id, sequence_metadata.sequence_name)] = len(sequence_metadata.timesteps)
+    elif benchmark_type == 'mono_flame_avatar':
+        for participant_id, participant_metadata in MonoFLAMEAvatarMetadata.load().participants_metadata.items():
+            for sequence_name, sequence_metadata in participant_metadata.sequences_metadata.items():
+                n_frames_per_sequence[(participant_id, sequence_name)] = sequence_metadata.n_frames
+
+    return n_frames_per_sequence
+
+
+def create_report(benchmark_type: BenchmarkType, results: List[FileCheckResult], full_decode: bool, n_files_unverified_size: int = 0) -> Dict:
+    issues = defaultdict(list)  # issue type => [relative_url]
+    for result in results:
+        for issue_type in result.issues:
+            issues[issue_type].append(result.relative_url)
+
+    return dict(
+        created_at=datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        benchmark_type=benchmark_type,
+        full_decode=full_decode,
+        n_files=len(results),
+        n_files_with_issues=sum(1 for result in results if result.issues),
+        n_files_unverified_size=n_files_unverified_size,  # Not recorded in the download manifest
+        n_bytes=sum(result.size for result in results if result.size is not None),
+        issues={issue_type: sorted(relative_urls) for issue_type, relative_urls in sorted(issues.items())},
+        files={result.relative_url: asdict(result) for result in sorted(results, key=lambda result: result.relative_url)},
+    )
+
+
+def print_report(report: Dict):
+    if not report['issues']:
+        print(f"All {report['n_files']} files are complete and readable")
+        return
+
+    print(f"Found issues with {report['n_files_with_issues']} of {report['n_files']} files:")
+    for issue_type, relative_urls in report['issues'].items():
+        print(f" - {issue_type}: {len(relative_urls)} files")
+        for relative_url in relative_urls[:10]:
+            print(f"     {relative_url}: {report['files'][relative_url]['issues'][issue_type]}")
+        if len(relative_urls) > 10:
+            print(f"     ...")
+    print("Run nersemble-benchmark-download again to fetch missing files and files of wrong size. Delete unreadable files first")
+
+
+def main_cli():
+    report = tyro.cli(main)
+    sys.exit(1 if report['issues'] else 0)
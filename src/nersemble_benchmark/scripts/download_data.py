@@ -1,15 +1,21 @@
-from multiprocessing.pool import ThreadPool
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from contextlib import nullcontext
 from pathlib import Path
-from typing import Literal, Union, List, Tuple, Optional
+from typing import Literal, Union, List, Tuple, Optional, Dict, Iterable, Sequence
 
 import tyro
 from tqdm import tqdm
 
 from nersemble_benchmark.constants import BENCHMARK_NVS_IDS_AND_SEQUENCES, BENCHMARK_NVS_TRAIN_SERIALS, ASSETS, BENCHMARK_MONO_FLAME_AVATAR_IDS, \
     BENCHMARK_MONO_FLAME_AVATAR_SEQUENCES_TRAIN, BENCHMARK_MONO_FLAME_AVATAR_SEQUENCES_TEST, BENCHMARK_MONO_FLAME_AVATAR_TRAIN_SERIAL, \
-    BENCHMARK_MONO_FLAME_AVATAR_HOLD_OUT_SERIALS, BENCHMARK_SVFR_IMAGE_KEYS, OPTIONAL_ASSETS
+    BENCHMARK_MONO_FLAME_AVATAR_HOLD_OUT_SERIALS, OPTIONAL_ASSETS
+from nersemble_benchmark.data.preprocessing import PreprocessStep, PREPROCESS_STEPS, PreprocessingPipeline
 from nersemble_benchmark.env import NERSEMBLE_BENCHMARK_URL
-from nersemble_benchmark.util.download import download_file
+from nersemble_benchmark.util.benchmark_index import get_benchmark_index
+from nersemble_benchmark.util.download import download_file, create_session, DownloadProgress, load_checksum_manifest, DownloadThrottle, \
+    format_bytes
+from nersemble_benchmark.util.download_manifest import DownloadManifest
+from nersemble_benchmark.util.download_plan import DownloadEntry, create_download_plan, ScheduleType
 from nersemble_benchmark.util.metadata import NVSMetadata
 from nersemble_benchmark.util.security import validate_nersemble_benchmark_url
 
@@ -32,7 +38,18 @@ def main(
         pointcloud_frames: Union[Literal['all'], List[int]] = [0],
 
         n_workers: int = 1,
-        overwrite: bool = False):
+        n_parallel_chunks: int = 1,
+        max_bandwidth: Optional[float] = None,
+        max_in_flight: Optional[float] = None,
+        min_free_disk: Optional[float] = None,
+        checksum_manifest: Optional[str] = None,
+        schedule: ScheduleType = 'largest_first',
+        overwrite: bool = False,
+        dry_run: bool = False,
+        verify_local: bool = False,
+        preprocess: Optional[Union[Literal['all'], List[PreprocessStep]]] = None,
+        n_preprocess_workers: int = 2,
+        preprocess_queue_size: int = 8):
     """
     Downloads the data for the NeRSemble benchmark.
     This scripts gives various options to select which parts of the benchmark shall be downloaded.
@@ -56,67 +73,155 @@ def main(
             - space-separated list of timesteps: download pointclouds only for specified timestep(s)
     n_workers:
         How many parallel processes should be started to download data. More workers can lead to faster download but potentially overload your system.
+        Use --max_bandwidth and --max_in_flight to bound the load independently of the number of workers
+    n_parallel_chunks:
+        Large files (e.g., videos) are split into this many byte ranges that are downloaded in parallel
+    max_bandwidth:
+        Total download bandwidth in MB/s shared by all workers. Unlimited by default
+    max_in_flight:
+        Maximum number of MB that all currently running requests may add up to. Unlimited by default
+    min_free_disk:
+        Downloads are paused while less than this many GB are free on the disk of `benchmark_folder`
+    checksum_manifest:
+        Path or URL of a checksum manifest (JSON or sha256sum format, paths relative to the benchmark type folder).
+        If given, downloaded files are verified against it
+    schedule:
+        In which order files are downloaded. Files are always ordered by asset type first (calibration and tracking before videos
+        and pointclouds). Within an asset type:
+            - 'largest_first': Start large files first, such that no single large file is left running at the end
+            - 'smallest_first': Get as many files as possible early on
+            - 'in_order': Keep the order of participants/sequences/cameras (does not require fetching file sizes beforehand)
     overwrite:
-        Whether to overwrite already existing local files
+        Whether to overwrite already existing local files.
+        Otherwise, files that are recorded as complete in the local download manifest are skipped without any network request
+    dry_run:
+        Do not download anything. Instead, fetch the sizes of all selected files and report the total size per asset type and participant
+    verify_local:
+        Do not download anything. Instead, check the selected local files against the local download manifest
+        (existence, size and hash if known) without accessing the network
+    preprocess:
+        Preprocess every file as soon as its download completes, while other downloads continue. Possible steps:
+            - 'checksums': Compute the sha256 of every file and record it in the download manifest (used by --verify_local)
+            - 'alpha_bboxes': Build the foreground bounding box index of alpha map videos (used for foreground crops)
+            - 'pyramids': Build frame pyramids of image videos (used for loading downscaled frames)
+            - 'packed_pointclouds': Pack all pointclouds of a sequence into a single store once they are downloaded
+            - 'all': All of the above
+        Files that were already complete are preprocessed as well if their preprocessed assets are missing
+    n_preprocess_workers:
+        Number of processes for --preprocess
+    preprocess_queue_size:
+        Maximum number of downloaded files waiting for or in preprocessing. Downloads pause while the queue is full
     """
 
-    validate_nersemble_benchmark_url()
     assets = validate_assets(benchmark_type, assets)
+    if not verify_local:
+        validate_nersemble_benchmark_url()
 
     # ----------------------
     # Collect download links
     # ----------------------
+    download_entries = collect_benchmark_download_entries(benchmark_type, assets, participant, pointcloud_frames=pointcloud_frames)
+
+    if verify_local:
+        verify_local_files(benchmark_folder, benchmark_type, [download_entry.relative_url for download_entry in download_entries])
+        return
+
+    # ----------------------
+    # Plan downloads
+    # ----------------------
+    manifest = None if overwrite else DownloadManifest(f"{benchmark_folder}/{benchmark_type}")
+    download_plan = create_download_plan(download_entries,
+                                         f"{NERSEMBLE_BENCHMARK_URL}/{benchmark_type}",
+                                         manifest=manifest,
+                                         fetch_sizes=dry_run or (schedule != 'in_order' and n_workers > 1),
+                                         n_workers=max(n_workers, 8))
+    if dry_run:
+        download_plan.print_summary()
+        return
+
+    preprocess_steps = PREPROCESS_STEPS if preprocess == 'all' else preprocess
+    relative_urls = [download_entry.relative_url for download_entry in download_plan.schedule(schedule)]
+    if preprocess_steps:
+        # Files that are already complete are not downloaded again, but download_urls() still preprocesses them
+        relative_urls.extend(download_entry.relative_url for download_entry in download_plan.entries if download_entry.is_complete)
+    checksums = None if checksum_manifest is None else load_checksum_manifest(checksum_manifest)
+    throttle = None
+    if max_bandwidth is not None or max_in_flight is not None or min_free_disk is not None:
+        throttle = DownloadThrottle(max_bandwidth=None if max_bandwidth is None else max_bandwidth * 1024 ** 2,
+                                    max_in_flight_bytes=None if max_in_flight is None else int(max_in_flight * 1024 ** 2),
+                                    min_free_disk=None if min_free_disk is None else int(min_free_disk * 1024 ** 3))
+    download_urls(benchmark_folder, benchmark_type, relative_urls,
+                  overwrite=overwrite, n_workers=n_workers, n_parallel_chunks=n_parallel_chunks, checksums=checksums, throttle=throttle,
+                  preprocess_steps=preprocess_steps, n_preprocess_workers=n_preprocess_workers, preprocess_queue_size=preprocess_queue_size)
+
+
+def collect_benchmark_download_entries(benchmark_type: BenchmarkType,
+                                       assets: List[AssetType],
+                                       participant: Union[Literal['all'], List[int]] = 'all',
+                                       pointcloud_frames: Union[Literal['all'], List[int]] = [0]) -> List[DownloadEntry]:
+    """
+    All files of the given assets and participants of a benchmark, without duplicates.
+    """
+
+    benchmark_index = get_benchmark_index()
     if benchmark_type == 'nvs':
         if participant == 'all':
             benchmark_ids_sequences_and_timesteps = BENCHMARK_NVS_IDS_AND_SEQUENCES
             benchmark_ids_sequences_and_timesteps = [(p_id, seq_name, BENCHMARK_NVS_TRAIN_SERIALS) for p_id, seq_name in benchmark_ids_sequences_and_timesteps]
         else:
-            benchmark_ids_sequences_and_timesteps = [(p_id, seq_name, BENCHMARK_NVS_TRAIN_SERIALS) for p_id, seq_name in BENCHMARK_NVS_IDS_AND_SEQUENCES if p_id in participant]
-
-        nvs_metadata = NVSMetadata.load()
-        benchmark_ids_sequences_and_timesteps = [(p_id, seq_name, serials, nvs_metadata.sequences[p_id].timesteps)
-                                                 for p_id, seq_name, serials in benchmark_ids_sequences_and_timesteps]
+            validate_participant_ids(participant, benchmark_index.nvs_sequences.keys(), benchmark_type)
+            benchmark_ids_sequences_and_timesteps = [(p_id, benchmark_index.nvs_sequences[p_id], BENCHMARK_NVS_TRAIN_SERIALS) for p_id in participant]
+
+        # Timesteps are only needed to enumerate all pointclouds. Avoid the metadata request otherwise
+        if 'pointclouds' in assets and pointcloud_frames == 'all':
+            nvs_metadata = NVSMetadata.load()
+            benchmark_ids_sequences_and_timesteps = [(p_id, seq_name, serials, nvs_metadata.sequences[p_id].timesteps)
+                                                     for p_id, seq_name, serials in benchmark_ids_sequences_and_timesteps]
+        else:
+            benchmark_ids_sequences_and_timesteps = [(p_id, seq_name, serials, None) for p_id, seq_name, serials in benchmark_ids_sequences_and_timesteps]
 
-        relative_urls = collect_relative_urls(benchmark_type, benchmark_ids_sequences_and_timesteps, assets, pointcloud_frames=pointcloud_frames)
-        download_urls(benchmark_folder, benchmark_type, relative_urls, overwrite=overwrite, n_workers=n_workers)
+        download_entries = collect_download_entries(benchmark_type, benchmark_ids_sequences_and_timesteps, assets, pointcloud_frames=pointcloud_frames)
     elif benchmark_type == 'mono_flame_avatar':
         if participant == 'all':
             participant_ids = BENCHMARK_MONO_FLAME_AVATAR_IDS
         else:
+            validate_participant_ids(participant, benchmark_index.mono_flame_avatar_ids, benchmark_type)
             participant_ids = participant
 
         sequences = BENCHMARK_MONO_FLAME_AVATAR_SEQUENCES_TRAIN
         timesteps = None
         benchmark_ids_sequences_and_timesteps = [(p_id, seq_name, [BENCHMARK_MONO_FLAME_AVATAR_TRAIN_SERIAL], timesteps) for p_id in participant_ids for seq_name in sequences]
 
-        relative_urls = collect_relative_urls(benchmark_type, benchmark_ids_sequences_and_timesteps, assets)
-        download_urls(benchmark_folder, benchmark_type, relative_urls, overwrite=overwrite, n_workers=n_workers)
+        download_entries = collect_download_entries(benchmark_type, benchmark_ids_sequences_and_timesteps, assets)
 
         # Test inputs for hold-out sequences
         sequences = BENCHMARK_MONO_FLAME_AVATAR_SEQUENCES_TEST
         benchmark_ids_sequences_and_timesteps = [(p_id, seq_name, BENCHMARK_MONO_FLAME_AVATAR_HOLD_OUT_SERIALS, timesteps) for p_id in participant_ids for seq_name in sequences]
         assets_test = [asset for asset in assets if asset in ASSETS[benchmark_type]['test_assets']]
 
-        relative_urls = collect_relative_urls(benchmark_type, benchmark_ids_sequences_and_timesteps, assets_test)
-        download_urls(benchmark_folder, benchmark_type, relative_urls, overwrite=overwrite, n_workers=n_workers)
+        download_entries.extend(collect_download_entries(benchmark_type, benchmark_ids_sequences_and_timesteps, assets_test))
     elif benchmark_type == 'svfr':
         if participant == 'all':
-            participant_ids = BENCHMARK_SVFR_IMAGE_KEYS.keys()
+            participant_ids = benchmark_index.svfr_image_keys_per_participant.keys()
         else:
+            validate_participant_ids(participant, benchmark_index.svfr_ids, benchmark_type)
             participant_ids = participant
 
         benchmark_ids_sequences_and_timesteps = []
         for p_id in participant_ids:
-            image_keys = BENCHMARK_SVFR_IMAGE_KEYS[p_id]
-            for seq_name, timestep, serial in image_keys:
+            for _, seq_name, timestep, serial in benchmark_index.svfr_image_keys_per_participant[p_id]:
                 benchmark_ids_sequences_and_timesteps.append((p_id, seq_name, [serial], [timestep]))
 
-        relative_urls = collect_relative_urls(benchmark_type, benchmark_ids_sequences_and_timesteps, assets)
-        download_urls(benchmark_folder, benchmark_type, relative_urls, overwrite=overwrite, n_workers=n_workers)
+        download_entries = collect_download_entries(benchmark_type, benchmark_ids_sequences_and_timesteps, assets)
 
     else:
         raise NotImplementedError(f"Benchmark type {benchmark_type} not implemented")
 
+    # Per-person assets (e.g., calibration) are collected once per sequence
+    download_entries = list({download_entry.relative_url: download_entry for download_entry in download_entries}.values())
+
+    return download_entries
+
 
 def validate_assets(benchmark_type: BenchmarkType, assets: AssetsType):
     benchmark_assets = ASSETS[benchmark_type]
@@ -135,71 +240,199 @@ def validate_assets(benchmark_type: BenchmarkType, assets: AssetsType):
     return assets
 
 
+def validate_participant_ids(participant_ids: List[int], benchmark_participant_ids: Iterable[int], benchmark_type: BenchmarkType):
+    unexpected_participant_ids = [p_id for p_id in participant_ids if p_id not in benchmark_participant_ids]
+    assert len(unexpected_participant_ids) == 0, \
+        f"Participants {unexpected_participant_ids} are not part of the {benchmark_type} benchmark. Available: {sorted(benchmark_participant_ids)}"
+
+
 def collect_relative_urls(
         benchmark_type: BenchmarkType,
         sequence_config: List[Tuple[int, str, List[str], Optional[List[int]]]],
         assets: AssetsType,
-        pointcloud_frames: Union[Literal['all'], List[int]] = [0]):
+        pointcloud_frames: Union[Literal['all'], List[int]] = [0]) -> List[str]:
+    download_entries = collect_download_entries(benchmark_type, sequence_config, assets, pointcloud_frames=pointcloud_frames)
+    return [download_entry.relative_url for download_entry in download_entries]
+
+
+def collect_download_entries(
+        benchmark_type: BenchmarkType,
+        sequence_config: List[Tuple[int, str, List[str], Optional[List[int]]]],
+        assets: AssetsType,
+        pointcloud_frames: Union[Literal['all'], List[int]] = [0]) -> List[DownloadEntry]:
     benchmark_assets = ASSETS[benchmark_type]
-    relative_urls = []
+    download_entries = []
     for p_id, seq_name, serials, timesteps in sequence_config:
         for asset in assets:
             if 'per_person' in benchmark_assets and asset in benchmark_assets['per_person']:
                 relative_url = benchmark_assets['per_person'][asset]
                 relative_url = relative_url.format(p_id=p_id)
-                relative_urls.append(relative_url)
+                download_entries.append(DownloadEntry(relative_url, asset, p_id))
             elif 'per_cam' in benchmark_assets and asset in benchmark_assets['per_cam']:
                 for serial in serials:
                     relative_url = benchmark_assets['per_cam'][asset]
                     relative_url = relative_url.format(p_id=p_id, seq_name=seq_name, serial=serial)
-                    relative_urls.append(relative_url)
+                    download_entries.append(DownloadEntry(relative_url, asset, p_id))
             elif 'per_timestep' in benchmark_assets and asset in benchmark_assets['per_timestep']:
                 if asset == 'pointclouds' and pointcloud_frames != 'all':
                     timesteps = pointcloud_frames
                 for timestep in timesteps:
                     relative_url = benchmark_assets['per_timestep'][asset]
                     relative_url = relative_url.format(p_id=p_id, seq_name=seq_name, timestep=timestep)
-                    relative_urls.append(relative_url)
+                    download_entries.append(DownloadEntry(relative_url, asset, p_id))
             elif 'per_sequence' in benchmark_assets and asset in benchmark_assets['per_sequence']:
                 relative_url = benchmark_assets['per_sequence'][asset]
                 relative_url = relative_url.format(p_id=p_id, seq_name=seq_name)
-                relative_urls.append(relative_url)
+                download_entries.append(DownloadEntry(relative_url, asset, p_id))
             elif 'per_image' in benchmark_assets and asset in benchmark_assets['per_image']:
                 for serial in serials:
                     for timestep in timesteps:
                         relative_url = benchmark_assets['per_image'][asset]
                         relative_url = relative_url.format(p_id=p_id, seq_name=seq_name, timestep=timestep, serial=serial)
-                        relative_urls.append(relative_url)
+                        download_entries.append(DownloadEntry(relative_url, asset, p_id))
 
-    return relative_urls
+    return download_entries
 
 
 def download_urls(benchmark_folder: Path,
                   benchmark_type: str,
                   relative_urls: List[str],
                   overwrite: bool = False,
-                  n_workers: int = 1):
+                  n_workers: int = 1,
+                  n_retries: int = 5,
+                  n_parallel_chunks: int = 1,
+                  checksums: Optional[Dict[str, str]] = None,
+                  throttle: Optional[DownloadThrottle] = None,
+                  base_url: Optional[str] = None,
+                  preprocess_steps: Optional[Sequence[PreprocessStep]] = None,
+                  n_preprocess_workers: int = 2,
+                  preprocess_queue_size: int = 8) -> Dict:
+    """
+    Downloads the given files and records them in the local download manifest.
+    Returns the download statistics of `DownloadProgress.get_stats()`, which are empty if all files were already complete.
+    """
 
-    if n_workers == 1:
+    if base_url is None:
+        base_url = NERSEMBLE_BENCHMARK_URL
+
+    # Incremental sync: Only files that are missing from the manifest or changed locally need to be probed or fetched
+    manifest = DownloadManifest(f"{benchmark_folder}/{benchmark_type}")
+    progress = DownloadProgress()
+    complete_urls = []
+    if not overwrite:
+        complete_urls = [relative_url for relative_url in relative_urls if manifest.is_up_to_date(relative_url)]
+        relative_urls = [relative_url for relative_url in relative_urls if not manifest.is_up_to_date(relative_url)]
+        if complete_urls:
+            print(f"Skipping {len(complete_urls)} files that are already complete according to {manifest.FILE_NAME}")
+
+    if not relative_urls:
+        print("All files are up-to-date")
+        if not preprocess_steps:
+            return progress.get_stats()
+    elif n_workers == 1:
         print(f"[Warning] Downloading data with a single worker which may be slow. Consider setting --n_workers to a number greater than 1")
-        for relative_url in tqdm(relative_urls):
-            absolute_url = f"{NERSEMBLE_BENCHMARK_URL}/{benchmark_type}/{relative_url}"
-            target_path = f"{benchmark_folder}/{benchmark_type}/{relative_url}"
-            download_file(absolute_url, target_path, overwrite=overwrite)
     else:
         print(f"Downloading data with {n_workers} workers")
-        pool = ThreadPool(processes=n_workers)
-        futures = []
-        for relative_url in relative_urls:
-            absolute_url = f"{NERSEMBLE_BENCHMARK_URL}/{benchmark_type}/{relative_url}"
-            target_path = f"{benchmark_folder}/{benchmark_type}/{relative_url}"
-            future = pool.apply_async(download_file, (absolute_url, target_path, overwrite))
-            futures.append(future)
-
-        for future in tqdm(futures):
-            future.get()
-
-    print("Finished downloading data")
+
+    # Downloaded files are handed to a pool of preprocessing processes through a bounded queue while other downloads continue
+    pipeline = None
+    if preprocess_steps:
+        print(f"Preprocessing downloaded files ({', '.join(preprocess_steps)}) with {n_preprocess_workers} workers")
+        pipeline = PreprocessingPipeline(benchmark_folder, benchmark_type, preprocess_steps, relative_urls + complete_urls,
+                                         n_workers=n_preprocess_workers, max_queue_size=preprocess_queue_size)
+
+    # All workers share one connection pool, such that connections are kept alive across files
+    session = create_session(n_connections=n_workers * n_parallel_chunks, n_retries=n_retries)
+    progress_bar = tqdm(total=len(relative_urls), unit='file')
+
+    def download_and_record(relative_url: str):
+        absolute_url = f"{base_url}/{benchmark_type}/{relative_url}"
+        target_path = f"{benchmark_folder}/{benchmark_type}/{relative_url}"
+        expected_hash = None if checksums is None else checksums.get(relative_url)
+        download_result = download_file(absolute_url, target_path,
+                                        overwrite=overwrite, session=session, progress=progress, throttle=throttle, n_retries=n_retries,
+                                        expected_hash=expected_hash, n_parallel_chunks=n_parallel_chunks)
+        manifest.record(relative_url, etag=download_result.etag, hash=expected_hash)
+        if pipeline is not None:
+            pipeline.submit(relative_url, known_hash=expected_hash)
+
+    def preprocess_complete_file(relative_url: str):
+        pipeline.submit(relative_url, known_hash=manifest.get(relative_url).hash, is_new=False)
+
+    try:
+        with session, pipeline if pipeline is not None else nullcontext(), ThreadPoolExecutor(max_workers=n_workers) as executor:
+            pending = {executor.submit(download_and_record, relative_url) for relative_url in relative_urls}
+            # Already complete files are queued after all downloads, such that they do not hold up the network
+            pending_preprocessing = set()
+            if pipeline is not None:
+                pending_preprocessing = {executor.submit(preprocess_complete_file, relative_url) for relative_url in complete_urls}
+
+            # Refresh the live stats regularly, not only when a file finishes
+            while pending or pending_preprocessing:
+                done, _ = wait(pending | pending_preprocessing, timeout=1, return_when=FIRST_COMPLETED)
+                for future in done:
+                    future.result()
+                    if future in pending:
+                        progress_bar.update(1)
+                pending -= done
+                pending_preprocessing -= done
+                progress_bar.set_postfix_str(format_download_stats(progress, throttle, pipeline), refresh=False)
+                progress_bar.refresh()
+
+            if pipeline is not None:
+                progress_bar.close()
+                print(f"Waiting for {pipeline.n_submitted - pipeline.n_finished} remaining preprocessing tasks...")
+                for preprocess_result in pipeline.close():
+                    entry = manifest.get(preprocess_result.relative_url)
+                    if preprocess_result.hash is not None and entry is not None and entry.hash != preprocess_result.hash:
+                        manifest.record(preprocess_result.relative_url, etag=entry.etag, hash=preprocess_result.hash)
+                print(f"Finished {pipeline.n_finished} preprocessing tasks")
+    finally:
+        manifest.save()
+        progress_bar.close()
+
+    download_stats = progress.get_stats()
+    print(f"Finished downloading data: {download_stats['n_files']} files, {format_bytes(download_stats['n_bytes'])} "
+          f"at {format_bytes(download_stats['throughput'])}/s on average")
+    if len(download_stats['workers']) > 1:
+        for worker, worker_stats in sorted(download_stats['workers'].items()):
+            print(f" - {worker}: {format_bytes(worker_stats['n_bytes'])}")
+
+    return download_stats
+
+
+def format_download_stats(progress: DownloadProgress,
+                          throttle: Optional[DownloadThrottle] = None,
+                          pipeline: Optional[PreprocessingPipeline] = None) -> str:
+    download_stats = progress.get_stats()
+    n_active_workers = sum(1 for worker_stats in download_stats['workers'].values() if worker_stats['current_throughput'] > 0)
+    stats = f"{progress.format()}, {n_active_workers} active"
+    if throttle is not None:
+        stats = f"{stats}, {format_bytes(throttle.get_n_bytes_in_flight())} in flight"
+        if throttle.is_paused_for_disk_space:
+            stats = f"{stats}, PAUSED (disk full)"
+    if pipeline is not None:
+        stats = f"{stats}, {pipeline.n_finished}/{pipeline.n_submitted} preprocessed"
+    return stats
+
+
+def verify_local_files(benchmark_folder: Path, benchmark_type: str, relative_urls: List[str]) -> Dict[str, List[str]]:
+    manifest = DownloadManifest(f"{benchmark_folder}/{benchmark_type}")
+    issues = manifest.verify_local(relative_urls)
+
+    if issues:
+        print(f"Found issues with local files in {benchmark_folder}/{benchmark_type}:")
+        for issue_type, issue_files in issues.items():
+            print(f" - {issue_type}: {len(issue_files)} files")
+            for issue_file in issue_files[:10]:
+                print(f"     {issue_file}")
+            if len(issue_files) > 10:
+                print(f"     ...")
+        print("Run the download again without --verify_local to fix them")
+    else:
+        print(f"All {len(relative_urls)} files are complete")
+
+    return issues
 
 
 def main_cli():
@@ -0,0 +1,76 @@
+import sys
+from pathlib import Path
+from typing import List, Dict
+
+import tyro
+
+from nersemble_benchmark.data.submission_data import SubmissionType, merge_submission_shards, NVSSubmissionDataReader, \
+    MonoFlameAvatarSubmissionDataReader, SVFRSubmissionDataReader, SubmissionDataReader
+
+
+def main(
+        submission_type: SubmissionType,
+        zip_path: Path,
+        shard_paths: List[Path],
+        /,
+        skip_validation: bool = False) -> Dict[str, List]:
+    """
+    Merges partial submission .zip files into a single submission .zip and validates it.
+    The partial .zip files can be written in parallel, e.g., one per GPU or node, each with the items of one shard:
+
+        shard_items = get_shard_items(list_submission_items('nvs'), shard_id, n_shards)
+        with NVSSubmissionDataWriter(get_shard_path(zip_path, shard_id, n_shards)) as submission_writer:
+            for participant_id, sequence_name, serial in shard_items:
+                submission_writer.add_video(participant_id, sequence_name, serial, frames)
+
+    Videos and meshes are copied as they are stored in the partial .zip files without decoding or re-encoding them.
+
+    Parameters
+    ----------
+    submission_type:
+        For which benchmark the submission is
+    zip_path:
+        Where to store the merged submission .zip
+    shard_paths:
+        The partial submission .zip files
+    skip_validation:
+        Do not check the merged submission for missing or invalid files. Otherwise, the command exits with a non-zero
+        status if any issue is found
+    """
+
+    n_entries = merge_submission_shards([str(shard_path) for shard_path in shard_paths], str(zip_path))
+    print(f"Merged {len(shard_paths)} shards with {n_entries} files into {zip_path}")
+
+    if skip_validation:
+        return dict()
+
+    submission_reader = create_submission_reader(submission_type, str(zip_path))
+    submission_issues = submission_reader.validate_submission()
+    if submission_issues:
+        print(f"Found issues with the merged submission:")
+        for issue_type, issues in submission_issues.items():
+            print(f" - {issue_type}: {len(issues)}")
+            for issue in issues[:10]:
+                print(f"     {issue}")
+            if len(issues) > 10:
+                print(f"     ...")
+    else:
+        print("The merged submission is valid")
+
+    return submission_issues
+
+
+def create_submission_reader(submission_type: SubmissionType, zip_path: str) -> SubmissionDataReader:
+    if submission_type == 'nvs':
+        return NVSSubmissionDataReader(zip_path)
+    elif submission_type == 'mono_flame_avatar':
+        return MonoFlameAvatarSubmissionDataReader(zip_path)
+    elif submission_type == 'svfr':
+        return SVFRSubmissionDataReader(zip_path)
+    else:
+        raise NotImplementedError(f"Submission type {submission_type} not implemented")
+
+
+def main_cli():
+    submission_issues = tyro.cli(main)
+    sys.exit(1 if submission_issues else 0)
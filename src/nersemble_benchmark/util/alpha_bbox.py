@@ -0,0 +1,132 @@
+import json
+import os
+from typing import Iterable, Literal, Tuple, Optional
+
+import numpy as np
+from elias.util import ensure_directory_exists_for_file
+
+BBox = Tuple[int, int, int, int]  # x_min, y_min, x_max, y_max (exclusive) in pixels
+CropMode = Literal['alpha_bbox', 'alpha_bbox_video']
+
+# Alpha values above the threshold count as foreground. Compressed alpha maps have some noise around 0
+ALPHA_BBOX_THRESHOLD = 16
+
+
+# ==========================================================
+# Bounding boxes
+# ==========================================================
+
+def compute_alpha_bbox(alpha_map: np.ndarray, threshold: int = ALPHA_BBOX_THRESHOLD) -> np.ndarray:
+    """
+    Tight bounding box of the foreground of an (H, W) or (H, W, 1) uint8 alpha map as int16 [x_min, y_min, x_max, y_max].
+    Alpha maps without foreground get the empty box [0, 0, 0, 0].
+    """
+
+    if alpha_map.ndim == 3:
+        alpha_map = alpha_map[..., 0]
+
+    is_foreground = alpha_map > threshold
+    is_foreground_row = is_foreground.any(axis=1)
+    if not is_foreground_row.any():
+        return np.zeros(4, dtype=np.int16)
+    is_foreground_column = is_foreground.any(axis=0)
+
+    y_min = np.argmax(is_foreground_row)
+    y_max = len(is_foreground_row) - np.argmax(is_foreground_row[::-1])
+    x_min = np.argmax(is_foreground_column)
+    x_max = len(is_foreground_column) - np.argmax(is_foreground_column[::-1])
+
+    return np.array([x_min, y_min, x_max, y_max], dtype=np.int16)
+
+
+def compute_alpha_bboxes(alpha_maps: Iterable[np.ndarray], threshold: int = ALPHA_BBOX_THRESHOLD) -> np.ndarray:
+    """
+    Bounding boxes of all alpha maps of a video as (T, 4) int16 array.
+    """
+
+    bboxes = [compute_alpha_bbox(alpha_map, threshold=threshold) for alpha_map in alpha_maps]
+    return np.stack(bboxes) if bboxes else np.zeros((0, 4), dtype=np.int16)
+
+
+def is_empty_bbox(bbox: np.ndarray) -> bool:
+    return bbox[2] <= bbox[0] or bbox[3] <= bbox[1]
+
+
+def get_union_bbox(bboxes: np.ndarray) -> np.ndarray:
+    """
+    Smallest box containing all non-empty boxes of (T, 4). Empty if all boxes are empty.
+    """
+
+    bboxes = bboxes[(bboxes[:, 2] > bboxes[:, 0]) & (bboxes[:, 3] > bboxes[:, 1])]
+    if len(bboxes) == 0:
+        return np.zeros(4, dtype=np.int16)
+
+    return np.array([bboxes[:, 0].min(), bboxes[:, 1].min(), bboxes[:, 2].max(), bboxes[:, 3].max()], dtype=np.int16)
+
+
+def pad_bbox(bbox: np.ndarray, padding: int, height: int, width: int) -> BBox:
+    """
+    Grows the box by `padding` pixels on every side and clips it to the image. Empty boxes become the full image, such that
+    frames without foreground are not cropped away.
+    """
+
+    if is_empty_bbox(bbox):
+        return 0, 0, width, height
+
+    x_min, y_min, x_max, y_max = (int(v) for v in bbox)
+    return max(x_min - padding, 0), max(y_min - padding, 0), min(x_max + padding, width), min(y_max + padding, height)
+
+
+def crop_to_bbox(image: np.ndarray, bbox: BBox) -> np.ndarray:
+    """
+    Crops an (H, W, ...) image to a padded box from `pad_bbox()`. Returns a view.
+    """
+
+    x_min, y_min, x_max, y_max = bbox
+    return image[y_min:y_max, x_min:x_max]
+
+
+# ==========================================================
+# Storage
+# ==========================================================
+
+def save_alpha_bboxes(path: str, bboxes: np.ndarray, source: Optional[str] = None):
+    """
+    Stores the (T, 4) bounding boxes as .npy. The optional `source` identifies the alpha map video they were computed from
+    and is stored in a .json file next to it.
+    """
+
+    assert bboxes.ndim == 2 and bboxes.shape[1] == 4, f"Expected (T, 4) bounding boxes, got {bboxes.shape}"
+    ensure_directory_exists_for_file(path)
+    source_path = _get_source_path(path)
+    if os.path.exists(source_path):
+        os.remove(source_path)
+
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'wb') as f:
+        np.save(f, bboxes.astype(np.int16))
+    os.replace(temp_path, path)
+
+    if source is not None:
+        with open(source_path, 'w') as f:
+            json.dump(dict(source=source), f)
+
+
+def load_alpha_bboxes(path: str) -> np.ndarray:
+    return np.load(path)
+
+
+def load_alpha_bboxes_source(path: str) -> Optional[str]:
+    """
+    The `source` that the bounding boxes in `path` were saved with, None if unknown.
+    """
+
+    source_path = _get_source_path(path)
+    if not os.path.exists(source_path):
+        return None
+    with open(source_path) as f:
+        return json.load(f)['source']
+
+
+def _get_source_path(path: str) -> str:
+    return f"{os.path.splitext(path)[0]}.json"
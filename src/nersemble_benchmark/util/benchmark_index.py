@@ -0,0 +1,131 @@
+from dataclasses import dataclass
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Tuple, FrozenSet, Mapping, Literal
+
+from nersemble_benchmark.constants import BENCHMARK_NVS_IDS_AND_SEQUENCES, BENCHMARK_NVS_HOLD_OUT_SERIALS, BENCHMARK_NVS_TRAIN_SERIALS, \
+    BENCHMARK_MONO_FLAME_AVATAR_IDS, BENCHMARK_MONO_FLAME_AVATAR_SEQUENCES_TRAIN, BENCHMARK_MONO_FLAME_AVATAR_SEQUENCES_TEST, \
+    BENCHMARK_MONO_FLAME_AVATAR_SERIALS, BENCHMARK_MONO_FLAME_AVATAR_HOLD_OUT_SERIALS, BENCHMARK_SVFR_IMAGE_KEYS
+
+SVFRTask = Literal['posed', 'neutral']
+VideoKey = Tuple[int, str, str]  # participant_id, sequence_name, serial
+SVFRImageKey = Tuple[int, str, int, str]  # participant_id, sequence_name, timestep, serial
+
+SVFR_TASKS: Tuple[SVFRTask, ...] = ('posed', 'neutral')
+
+
+# ==========================================================
+# Submission file layout
+# ==========================================================
+
+def get_video_submission_path(participant_id: int, sequence_name: str, serial: str) -> str:
+    return f"{participant_id:03d}/{sequence_name}/cam_{serial}.mp4"
+
+
+def get_svfr_mesh_submission_path(participant_id: int, sequence_name: str, timestep: int, serial: str, svfr_task: SVFRTask) -> str:
+    return f"{participant_id:03d}/{sequence_name}_{timestep:03d}_{serial}/mesh_{svfr_task}.ply"
+
+
+def get_svfr_landmarks_submission_path(participant_id: int, sequence_name: str, timestep: int, serial: str, svfr_task: SVFRTask) -> str:
+    return f"{participant_id:03d}/{sequence_name}_{timestep:03d}_{serial}/landmarks_{svfr_task}.npy"
+
+
+# ==========================================================
+# Benchmark index
+# ==========================================================
+
+@dataclass(frozen=True)
+class BenchmarkIndex:
+    """
+    Immutable lookup structures over the benchmark splits in `constants.py`.
+    Tuples keep the order of the constants (for iterating), frozensets and mappings are for O(1) membership tests.
+    Use the shared instance from `get_benchmark_index()` instead of building one.
+    """
+
+    # NVS
+    nvs_sequences: Mapping[int, str]  # participant_id => benchmark sequence
+    nvs_hold_out_serials: FrozenSet[str]
+    nvs_train_serials: FrozenSet[str]
+    nvs_video_keys: Tuple[VideoKey, ...]  # videos of a submission
+    nvs_submission_files: Tuple[str, ...]
+    nvs_submission_file_set: FrozenSet[str]
+
+    # Mono FLAME Avatar
+    mono_flame_avatar_ids: FrozenSet[int]
+    mono_flame_avatar_sequences_train: FrozenSet[str]
+    mono_flame_avatar_sequences_test: FrozenSet[str]
+    mono_flame_avatar_serials: FrozenSet[str]  # train serial + hold-out serials
+    mono_flame_avatar_hold_out_serials: FrozenSet[str]
+    mono_flame_avatar_video_keys: Tuple[VideoKey, ...]  # videos of a submission
+    mono_flame_avatar_submission_files: Tuple[str, ...]
+    mono_flame_avatar_submission_file_set: FrozenSet[str]
+
+    # SVFR
+    svfr_ids: FrozenSet[int]
+    svfr_image_keys: Tuple[SVFRImageKey, ...]
+    svfr_image_key_set: FrozenSet[SVFRImageKey]
+    svfr_image_keys_per_participant: Mapping[int, Tuple[SVFRImageKey, ...]]
+    svfr_mesh_files: Mapping[SVFRTask, FrozenSet[str]]
+    svfr_landmark_files: Mapping[SVFRTask, FrozenSet[str]]
+    svfr_submission_files: Mapping[SVFRTask, FrozenSet[str]]  # meshes + landmarks
+
+    def is_nvs_video(self, participant_id: int, sequence_name: str, serial: str) -> bool:
+        return self.nvs_sequences.get(participant_id) == sequence_name and serial in self.nvs_hold_out_serials
+
+    def is_mono_flame_avatar_video(self, participant_id: int, sequence_name: str, serial: str) -> bool:
+        return (participant_id in self.mono_flame_avatar_ids
+                and sequence_name in self.mono_flame_avatar_sequences_test
+                and serial in self.mono_flame_avatar_serials)
+
+
+def build_benchmark_index() -> BenchmarkIndex:
+    nvs_video_keys = tuple((participant_id, sequence_name, serial)
+                           for participant_id, sequence_name in BENCHMARK_NVS_IDS_AND_SEQUENCES
+                           for serial in BENCHMARK_NVS_HOLD_OUT_SERIALS)
+    nvs_submission_files = tuple(get_video_submission_path(*video_key) for video_key in nvs_video_keys)
+
+    mono_flame_avatar_video_keys = tuple((participant_id, sequence_name, serial)
+                                         for participant_id in BENCHMARK_MONO_FLAME_AVATAR_IDS
+                                         for sequence_name in BENCHMARK_MONO_FLAME_AVATAR_SEQUENCES_TEST
+                                         for serial in BENCHMARK_MONO_FLAME_AVATAR_SERIALS)
+    mono_flame_avatar_submission_files = tuple(get_video_submission_path(*video_key) for video_key in mono_flame_avatar_video_keys)
+
+    svfr_image_keys_per_participant = {participant_id: tuple((participant_id, sequence_name, timestep, serial)
+                                                             for sequence_name, timestep, serial in person_keys)
+                                       for participant_id, person_keys in BENCHMARK_SVFR_IMAGE_KEYS.items()}
+    svfr_image_keys = tuple(image_key for person_keys in svfr_image_keys_per_participant.values() for image_key in person_keys)
+    svfr_mesh_files = {svfr_task: frozenset(get_svfr_mesh_submission_path(*image_key, svfr_task) for image_key in svfr_image_keys)
+                       for svfr_task in SVFR_TASKS}
+    svfr_landmark_files = {svfr_task: frozenset(get_svfr_landmarks_submission_path(*image_key, svfr_task) for image_key in svfr_image_keys)
+                           for svfr_task in SVFR_TASKS}
+
+    return BenchmarkIndex(
+        nvs_sequences=MappingProxyType(dict(BENCHMARK_NVS_IDS_AND_SEQUENCES)),
+        nvs_hold_out_serials=frozenset(BENCHMARK_NVS_HOLD_OUT_SERIALS),
+        nvs_train_serials=frozenset(BENCHMARK_NVS_TRAIN_SERIALS),
+        nvs_video_keys=nvs_video_keys,
+        nvs_submission_files=nvs_submission_files,
+        nvs_submission_file_set=frozenset(nvs_submission_files),
+
+        mono_flame_avatar_ids=frozenset(BENCHMARK_MONO_FLAME_AVATAR_IDS),
+        mono_flame_avatar_sequences_train=frozenset(BENCHMARK_MONO_FLAME_AVATAR_SEQUENCES_TRAIN),
+        mono_flame_avatar_sequences_test=frozenset(BENCHMARK_MONO_FLAME_AVATAR_SEQUENCES_TEST),
+        mono_flame_avatar_serials=frozenset(BENCHMARK_MONO_FLAME_AVATAR_SERIALS),
+        mono_flame_avatar_hold_out_serials=frozenset(BENCHMARK_MONO_FLAME_AVATAR_HOLD_OUT_SERIALS),
+        mono_flame_avatar_video_keys=mono_flame_avatar_video_keys,
+        mono_flame_avatar_submission_files=mono_flame_avatar_submission_files,
+        mono_flame_avatar_submission_file_set=frozenset(mono_flame_avatar_submission_files),
+
+        svfr_ids=frozenset(BENCHMARK_SVFR_IMAGE_KEYS.keys()),
+        svfr_image_keys=svfr_image_keys,
+        svfr_image_key_set=frozenset(svfr_image_keys),
+        svfr_image_keys_per_participant=MappingProxyType(svfr_image_keys_per_participant),
+        svfr_mesh_files=MappingProxyType(svfr_mesh_files),
+        svfr_landmark_files=MappingProxyType(svfr_landmark_files),
+        svfr_submission_files=MappingProxyType({svfr_task: svfr_mesh_files[svfr_task] | svfr_landmark_files[svfr_task] for svfr_task in SVFR_TASKS}),
+    )
+
+
+@lru_cache(maxsize=1)
+def get_benchmark_index() -> BenchmarkIndex:
+    return build_benchmark_index()
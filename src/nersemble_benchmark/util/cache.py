@@ -0,0 +1,220 @@
+import atexit
+import dataclasses
+import os
+import threading
+from multiprocessing import shared_memory
+from typing import Callable, Dict, Tuple, TypeVar, Any, Optional
+
+import numpy as np
+
+from nersemble_benchmark.util.profiling import increment
+
+T = TypeVar('T')
+
+
+# ==========================================================
+# Shared memory arrays
+# ==========================================================
+
+class SharedMemoryArray(np.ndarray):
+    """
+    ndarray whose data lives in a `multiprocessing.shared_memory` block.
+    Pickling only transfers the name of the block, such that worker processes (e.g., spawned DataLoader workers) attach
+    to the same memory instead of receiving a copy.
+    """
+
+    _shm: Optional[shared_memory.SharedMemory]
+
+    def __array_finalize__(self, obj):
+        self._shm = getattr(obj, '_shm', None)
+
+    def __reduce__(self):
+        if self._shm is None or not self.flags.c_contiguous:
+            return np.asarray(self).copy().__reduce__()
+
+        offset = self.ctypes.data - np.frombuffer(self._shm.buf, dtype=np.uint8).ctypes.data
+        return _attach_shared_memory_array, (self._shm.name, self.shape, self.dtype.str, offset)
+
+
+_OWNED_SHARED_MEMORY = []
+_OWNER_PID = os.getpid()
+
+
+def to_shared_memory_array(array: np.ndarray) -> SharedMemoryArray:
+    shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    _OWNED_SHARED_MEMORY.append(shm)
+    shared_array = np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf).view(SharedMemoryArray)
+    shared_array[...] = array
+    shared_array._shm = shm
+    return shared_array
+
+
+def _attach_shared_memory_array(name: str, shape: Tuple[int, ...], dtype: str, offset: int) -> SharedMemoryArray:
+    try:
+        shm = shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python < 3.13 always registers attached blocks. Child processes share the resource tracker of their parent,
+        # so this does not lead to the block being unlinked when the child exits
+        shm = shared_memory.SharedMemory(name=name)
+
+    shared_array = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf, offset=offset).view(SharedMemoryArray)
+    shared_array._shm = shm
+    shared_array.flags.writeable = False
+    return shared_array
+
+
+def release_shared_memory_arrays(value: Any):
+    """
+    Unlinks the shared memory blocks of all shared memory arrays in `value` that were created by this process.
+    Arrays that still reference a block stay valid, its memory is freed once the last of them is gone.
+    Afterwards, the arrays can no longer be pickled to other processes by name.
+    """
+
+    if isinstance(value, SharedMemoryArray):
+        _release_shared_memory_block(value._shm)
+    elif dataclasses.is_dataclass(value) and not isinstance(value, type):
+        for f in dataclasses.fields(value):
+            release_shared_memory_arrays(getattr(value, f.name))
+    elif isinstance(value, dict):
+        for v in value.values():
+            release_shared_memory_arrays(v)
+
+
+def _release_shared_memory_block(shm: Optional[shared_memory.SharedMemory]):
+    if shm is None or os.getpid() != _OWNER_PID or not any(shm is owned_shm for owned_shm in _OWNED_SHARED_MEMORY):
+        return
+
+    _OWNED_SHARED_MEMORY.remove(shm)
+    try:
+        shm.unlink()
+    except FileNotFoundError:
+        pass
+    # The block is not closed here: Arrays on top of it may still be in use. Every array references the block, so its
+    # mapping is closed once the last of them is garbage collected
+
+
+@atexit.register
+def _release_shared_memory():
+    if os.getpid() != _OWNER_PID:
+        # Forked children inherit the list of blocks, but only the creating process may unlink them
+        return
+
+    for shm in _OWNED_SHARED_MEMORY:
+        try:
+            shm.unlink()
+        except FileNotFoundError:
+            pass
+    _OWNED_SHARED_MEMORY.clear()
+
+
+# ==========================================================
+# Asset cache
+# ==========================================================
+
+def get_file_version(path: str) -> str:
+    """
+    Identifies the current content of a file by its size and modification time, e.g., to detect that assets derived from it
+    are outdated after it was re-downloaded.
+    """
+
+    stat = os.stat(path)
+    return f"{stat.st_size}-{stat.st_mtime_ns}"
+
+
+class AssetCache:
+    """
+    Per-process cache for parsed assets, keyed by file path and validated by the file version (see `get_file_version()`).
+    Cached arrays are read-only since they are shared between all callers.
+
+    With `use_shared_memory=True`, cached arrays are placed in shared memory. Forked DataLoader workers then read the
+    parent's parsed arrays without copy-on-write duplication, and a pickled cache (e.g., sent to spawned workers and
+    installed there via `set_asset_cache()`) attaches to the parent's memory instead of copying it.
+    """
+
+    def __init__(self, use_shared_memory: bool = False):
+        self._use_shared_memory = use_shared_memory
+        self._entries: Dict[Tuple[str, str], Tuple[str, Any]] = dict()  # (path, loader) => (file version, value)
+        self._lock = threading.Lock()
+        self.n_hits = 0
+        self.n_misses = 0
+
+    def get(self, path: str, loader: Callable[[str], T]) -> T:
+        key = (os.path.abspath(path), f"{loader.__module__}.{loader.__qualname__}")
+        version = get_file_version(path)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version:
+                self.n_hits += 1
+                increment("cache.hits")
+                return entry[1]
+
+        value = self._freeze(loader(path))
+
+        increment("cache.misses")
+        with self._lock:
+            self.n_misses += 1
+            replaced_entry = self._entries.get(key)
+            self._entries[key] = (version, value)
+
+        if replaced_entry is not None:
+            # The file changed (or another thread loaded it concurrently). Free the shared memory of the outdated entry
+            release_shared_memory_arrays(replaced_entry[1])
+
+        return value
+
+    def clear(self):
+        with self._lock:
+            entries = list(self._entries.values())
+            self._entries.clear()
+
+        for _, value in entries:
+            release_shared_memory_arrays(value)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __getstate__(self):
+        with self._lock:
+            return dict(use_shared_memory=self._use_shared_memory, entries=dict(self._entries))
+
+    def __setstate__(self, state):
+        self.__init__(use_shared_memory=state['use_shared_memory'])
+        self._entries = state['entries']
+
+    def _freeze(self, value: Any) -> Any:
+        if isinstance(value, np.ndarray):
+            if self._use_shared_memory:
+                value = to_shared_memory_array(value)
+            value.flags.writeable = False
+            return value
+        elif dataclasses.is_dataclass(value):
+            array_fields = {f.name: self._freeze(getattr(value, f.name))
+                            for f in dataclasses.fields(value) if f.init and isinstance(getattr(value, f.name), np.ndarray)}
+            return dataclasses.replace(value, **array_fields)
+        elif isinstance(value, dict):
+            return {k: self._freeze(v) for k, v in value.items()}
+        else:
+            return value
+
+
+_ASSET_CACHE: Optional[AssetCache] = AssetCache()
+
+
+def get_asset_cache() -> Optional[AssetCache]:
+    return _ASSET_CACHE
+
+
+def set_asset_cache(asset_cache: Optional[AssetCache]):
+    """
+    Replaces the per-process asset cache. Passing None disables caching.
+    """
+
+    global _ASSET_CACHE
+    _ASSET_CACHE = asset_cache
+
+
+def load_cached(path: str, loader: Callable[[str], T]) -> T:
+    if _ASSET_CACHE is None:
+        return loader(path)
+    return _ASSET_CACHE.get(path, loader)
@@ -0,0 +1,127 @@
+from dataclasses import dataclass, field
+from typing import List, Dict, Optional, TYPE_CHECKING
+
+import numpy as np
+
+if TYPE_CHECKING:
+    import torch
+
+
+@dataclass
+class StackedCameraParams:
+    """
+    Calibration of C cameras stacked into contiguous arrays for batched projection.
+    world_2_cam poses follow the OpenCV camera coordinate convention (same as `CameraParams`).
+    """
+
+    serials: List[str]
+    world_2_cam: np.ndarray  # (C, 4, 4)
+    intrinsics: np.ndarray  # (C, 3, 3)
+    serial_to_index: Dict[str, int] = field(init=False, repr=False)
+
+    def __post_init__(self):
+        assert self.world_2_cam.shape == (len(self.serials), 4, 4), f"Expected world_2_cam of shape {(len(self.serials), 4, 4)}, got {self.world_2_cam.shape}"
+        assert self.intrinsics.shape == (len(self.serials), 3, 3), f"Expected intrinsics of shape {(len(self.serials), 3, 3)}, got {self.intrinsics.shape}"
+        self.serial_to_index = {serial: i for i, serial in enumerate(self.serials)}
+
+    def __len__(self) -> int:
+        return len(self.serials)
+
+    def index(self, serial: str) -> int:
+        return self.serial_to_index[serial]
+
+    def select(self, serials: List[str]) -> 'StackedCameraParams':
+        indices = [self.serial_to_index[serial] for serial in serials]
+        return StackedCameraParams(list(serials), self.world_2_cam[indices], self.intrinsics[indices])
+
+    def get_cam_2_world(self) -> np.ndarray:
+        return invert_rigid_transformations(self.world_2_cam)
+
+    def get_camera_centers(self) -> np.ndarray:
+        return self.get_cam_2_world()[:, :3, 3]
+
+    def get_projection_matrices(self) -> np.ndarray:
+        return self.intrinsics @ self.world_2_cam[:, :3, :]  # (C, 3, 4)
+
+    def project(self, points: np.ndarray) -> np.ndarray:
+        """
+        Projects points [N, 3] into all cameras at once.
+
+        Returns
+        -------
+            Projected points [C, N, 3] in image space where the third coordinate is the depth in the respective camera.
+            Same convention as `dreifus.render.project()`.
+        """
+
+        return project_batched(points, self.get_projection_matrices())
+
+    def project_torch(self, points: 'torch.Tensor') -> 'torch.Tensor':
+        """
+        Same as `project()`, but for torch tensors [N, 3] or [B, N, 3]. Runs on the device of the given points.
+        """
+
+        import torch
+
+        projection_matrices = torch.from_numpy(self.get_projection_matrices()).to(device=points.device, dtype=points.dtype)
+        return project_batched_torch(points, projection_matrices)
+
+    def is_visible(self, points: np.ndarray, width: int, height: int, min_depth: float = 0) -> np.ndarray:
+        """
+        [C, N] mask indicating which points project inside the image of which camera (occlusions are not handled).
+        """
+
+        projected = self.project(points)
+        return compute_visibility(projected, width, height, min_depth=min_depth)
+
+
+def invert_rigid_transformations(transformations: np.ndarray) -> np.ndarray:
+    rotations_inv = np.swapaxes(transformations[..., :3, :3], -1, -2)
+    inverted = np.zeros_like(transformations)
+    inverted[..., :3, :3] = rotations_inv
+    inverted[..., :3, 3] = -(rotations_inv @ transformations[..., :3, 3:4])[..., 0]
+    inverted[..., 3, 3] = 1
+    return inverted
+
+
+def project_batched(points: np.ndarray, projection_matrices: np.ndarray) -> np.ndarray:
+    """
+    Projects points [N, 3] with C projection matrices K @ [R | t] of shape [C, 3, 4].
+    Returns [C, N, 3] where the first two coordinates are pixels and the last coordinate is the depth.
+    """
+
+    assert points.ndim == 2 and points.shape[1] == 3
+
+    projected = np.einsum('cij,nj->cni', projection_matrices[:, :, :3], points) + projection_matrices[:, None, :, 3]
+    depths = projected[..., 2:3].copy()
+    projected[..., :2] /= depths
+    return projected
+
+
+def project_batched_torch(points: 'torch.Tensor', projection_matrices: 'torch.Tensor') -> 'torch.Tensor':
+    """
+    torch version of `project_batched()`. Points may also be batched [B, N, 3], the result is then [B, C, N, 3].
+    """
+
+    import torch
+
+    projected = torch.einsum('cij,...nj->...cni', projection_matrices[:, :, :3], points) + projection_matrices[:, None, :, 3]
+    depths = projected[..., 2:3]
+    return torch.cat([projected[..., :2] / depths, depths], dim=-1)
+
+
+def compute_visibility(projected: np.ndarray, width: int, height: int, min_depth: float = 0) -> np.ndarray:
+    x = projected[..., 0]
+    y = projected[..., 1]
+    depth = projected[..., 2]
+    return (depth > min_depth) & (x >= 0) & (x < width) & (y >= 0) & (y < height)
+
+
+def stack_camera_params(world_2_cam: Dict[str, np.ndarray],
+                        intrinsics: Dict[str, np.ndarray],
+                        serials: Optional[List[str]] = None) -> StackedCameraParams:
+    if serials is None:
+        serials = list(world_2_cam.keys())
+
+    world_2_cam_stacked = np.stack([np.asarray(world_2_cam[serial], dtype=np.float32) for serial in serials])
+    intrinsics_stacked = np.stack([np.asarray(intrinsics[serial], dtype=np.float32) for serial in serials])
+    return StackedCameraParams(list(serials), world_2_cam_stacked, intrinsics_stacked)
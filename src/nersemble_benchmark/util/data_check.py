@@ -0,0 +1,110 @@
+import os
+import zipfile
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Optional, Dict
+
+import av
+import numpy as np
+from elias.util import load_json
+
+from nersemble_benchmark.util.pointcloud import read_pointcloud, read_pointcloud_size, read_pointcloud_min_file_size
+from nersemble_benchmark.util.profiling import timed, increment
+
+
+@dataclass
+class FileCheck:
+    # @formatter:off
+    relative_url: str
+    asset: str
+    expected_size: Optional[int] = None         # From the download manifest
+    expected_n_frames: Optional[int] = None     # Only for videos, from the benchmark metadata
+    # @formatter:on
+
+
+@dataclass
+class FileCheckResult:
+    relative_url: str
+    asset: str
+    size: Optional[int] = None
+    n_frames: Optional[int] = None
+    issues: Dict[str, str] = field(default_factory=dict)  # issue type => description
+
+
+def check_file(folder: str, file_check: FileCheck, full_decode: bool = False) -> FileCheckResult:
+    """
+    Checks that a local benchmark file exists, has the expected size and can be read:
+     - .mp4: The frame count stored in the container matches the expected number of frames. With `full_decode`, every frame
+       is decoded and counted
+     - .npz: The archive index can be read. With `full_decode`, all arrays are loaded, which also verifies their checksums
+     - .pcd/.ply: The header can be parsed and binary files are large enough for all points announced in the header.
+       With `full_decode`, all points are read
+     - .json/.png: The file can be parsed
+
+    Parameters
+    ----------
+    folder:
+        The benchmark type folder that `relative_url` is relative to
+    """
+
+    result = FileCheckResult(file_check.relative_url, file_check.asset)
+    path = f"{folder}/{file_check.relative_url}"
+    if not Path(path).exists():
+        result.issues['missing'] = f"{path} does not exist"
+        return result
+
+    result.size = os.path.getsize(path)
+    if file_check.expected_size is not None and result.size != file_check.expected_size:
+        result.issues['wrong_size'] = f"{result.size} bytes instead of {file_check.expected_size} bytes"
+    elif result.size == 0:
+        result.issues['empty'] = f"{path} is empty"
+        return result
+
+    suffix = Path(path).suffix.lower()
+    try:
+        with timed(f"check.{suffix[1:]}"):
+            if suffix == '.mp4':
+                result.n_frames = _check_video(path, full_decode)
+                if file_check.expected_n_frames is not None and result.n_frames != file_check.expected_n_frames:
+                    result.issues['wrong_frame_count'] = f"{result.n_frames} frames instead of {file_check.expected_n_frames}"
+            elif suffix == '.npz':
+                with np.load(path) as npz:
+                    if full_decode:
+                        for key in npz.files:
+                            npz[key]
+            elif suffix in {'.pcd', '.ply'}:
+                n_points = read_pointcloud_size(path)
+                min_file_size = read_pointcloud_min_file_size(path)
+                if min_file_size is not None and result.size < min_file_size:
+                    result.issues['unreadable'] = f"Truncated: {result.size} bytes, but {n_points} points need {min_file_size} bytes"
+                elif full_decode:
+                    points, _, _ = read_pointcloud(path)
+                    if len(points) != n_points:
+                        result.issues['unreadable'] = f"Read {len(points)} points instead of {n_points}"
+            elif suffix == '.json':
+                load_json(path)
+            elif suffix == '.png':
+                import imageio.v3 as iio
+                if full_decode:
+                    iio.imread(path)
+                else:
+                    iio.improps(path)
+    except (av.error.FFmpegError, ValueError, OSError, KeyError, EOFError, zipfile.BadZipFile) as e:
+        # Truncated or corrupted files fail in the respective parser
+        result.issues['unreadable'] = f"{type(e).__name__}: {e}"
+
+    increment("check.files")
+    increment("check.bytes", result.size)
+    return result
+
+
+def _check_video(path: str, full_decode: bool) -> int:
+    with av.open(path) as container:
+        stream = container.streams.video[0]
+        if not full_decode:
+            return stream.frames
+
+        n_frames = 0
+        for _ in container.decode(stream):
+            n_frames += 1
+        return n_frames
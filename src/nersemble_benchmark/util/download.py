@@ -1,33 +1,524 @@
+import hashlib
+import json
 import os
-import urllib
+import shutil
+import threading
+import time
+from collections import deque, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass
 from pathlib import Path
-from urllib.error import HTTPError, URLError
+from typing import Optional, Tuple, Dict
 
 import requests
-from elias.util import ensure_directory_exists_for_file
+from elias.util import ensure_directory_exists_for_file, load_json, save_json
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
+from nersemble_benchmark.util.profiling import timed, increment
+
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+TRANSIENT_ERRORS = (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError)
+
+
+def create_session(n_connections: int = 1, n_retries: int = 5, backoff_factor: float = 0.5) -> requests.Session:
+    """
+    Creates an HTTP session whose connections are kept alive and re-used across downloads.
+    Failed requests (connection errors and 429/5xx responses) are retried with exponential backoff.
+
+    Parameters
+    ----------
+    n_connections:
+        Size of the connection pool. Should be at least the number of threads that share the session
+    n_retries:
+        How often a failed request is retried
+    backoff_factor:
+        Retry i waits backoff_factor * 2^(i-1) seconds
+    """
+
+    retry = Retry(total=n_retries,
+                  backoff_factor=backoff_factor,
+                  status_forcelist=RETRY_STATUS_CODES,
+                  allowed_methods=["HEAD", "GET"],
+                  raise_on_status=False)
+    adapter = HTTPAdapter(pool_connections=n_connections, pool_maxsize=n_connections, max_retries=retry)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+class DownloadProgress:
+    """
+    Thread-safe counter of downloaded bytes for reporting the aggregate and per-worker throughput of parallel downloads.
+    Current throughputs are measured over a sliding window of `window_seconds`.
+    """
+
+    def __init__(self, window_seconds: float = 5):
+        self._lock = threading.Lock()
+        self._start_time = time.perf_counter()
+        self._window_seconds = window_seconds
+        self._recent_chunks = deque()  # (time, worker, n_bytes)
+        self._n_bytes_per_worker = defaultdict(int)
+        self.n_bytes = 0
+        self.n_files = 0
+
+    def add_bytes(self, n_bytes: int):
+        worker = threading.current_thread().name
+        now = time.perf_counter()
+        with self._lock:
+            self.n_bytes += n_bytes
+            self._n_bytes_per_worker[worker] += n_bytes
+            self._recent_chunks.append((now, worker, n_bytes))
+            self._trim_window(now)
+
+    def add_file(self):
+        with self._lock:
+            self.n_files += 1
+
+    def get_throughput(self) -> float:
+        elapsed = time.perf_counter() - self._start_time
+        return self.n_bytes / elapsed if elapsed > 0 else 0
+
+    def get_current_throughput(self) -> float:
+        now = time.perf_counter()
+        with self._lock:
+            self._trim_window(now)
+            n_recent_bytes = sum(n_bytes for _, _, n_bytes in self._recent_chunks)
+        return n_recent_bytes / min(self._window_seconds, max(now - self._start_time, 1e-6))
+
+    def get_stats(self) -> Dict:
+        now = time.perf_counter()
+        window = min(self._window_seconds, max(now - self._start_time, 1e-6))
+        with self._lock:
+            self._trim_window(now)
+            recent_bytes_per_worker = defaultdict(int)
+            for _, worker, n_bytes in self._recent_chunks:
+                recent_bytes_per_worker[worker] += n_bytes
+            workers = {worker: dict(n_bytes=n_bytes, current_throughput=recent_bytes_per_worker[worker] / window)
+                       for worker, n_bytes in self._n_bytes_per_worker.items()}
+            n_recent_bytes = sum(recent_bytes_per_worker.values())
+
+        return dict(n_bytes=self.n_bytes,
+                    n_files=self.n_files,
+                    throughput=self.get_throughput(),
+                    current_throughput=n_recent_bytes / window,
+                    workers=workers)
+
+    def format(self) -> str:
+        return f"{format_bytes(self.n_bytes)}, {format_bytes(self.get_current_throughput())}/s"
+
+    def _trim_window(self, now: float):
+        while self._recent_chunks and self._recent_chunks[0][0] < now - self._window_seconds:
+            self._recent_chunks.popleft()
+
+
+class DownloadThrottle:
+    """
+    Limits shared by all download threads:
+        - max_bandwidth: Global bandwidth cap in bytes/s (token bucket)
+        - max_in_flight_bytes: Upper bound on the sum of bytes of all currently running requests. Bytes are reserved before
+          a request is sent. A single request that is larger than the limit is still allowed if nothing else is running
+        - min_free_disk: Downloads are paused while the target file system has less free bytes than this
+    """
+
+    def __init__(self,
+                 max_bandwidth: Optional[float] = None,
+                 max_in_flight_bytes: Optional[int] = None,
+                 min_free_disk: Optional[int] = None,
+                 disk_check_interval: float = 1):
+        self._max_bandwidth = max_bandwidth
+        self._max_in_flight_bytes = max_in_flight_bytes
+        self._min_free_disk = min_free_disk
+        self._disk_check_interval = disk_check_interval
+
+        self._bandwidth_lock = threading.Lock()
+        self._tokens = 0 if max_bandwidth is None else max_bandwidth
+        self._last_refill = time.perf_counter()
+
+        self._in_flight_condition = threading.Condition()
+        self._n_bytes_in_flight = 0
+
+        self._disk_lock = threading.Lock()
+        self._last_disk_check = 0
+        self.is_paused_for_disk_space = False
+
+    def consume_bandwidth(self, n_bytes: int):
+        if self._max_bandwidth is None:
+            return
+
+        with self._bandwidth_lock:
+            now = time.perf_counter()
+            self._tokens = min(self._max_bandwidth, self._tokens + (now - self._last_refill) * self._max_bandwidth)
+            self._last_refill = now
+            # Tokens may become negative. The debt is paid by sleeping, such that chunks larger than the bucket do not block forever
+            self._tokens -= n_bytes
+            wait_time = -self._tokens / self._max_bandwidth if self._tokens < 0 else 0
+
+        if wait_time > 0:
+            time.sleep(wait_time)
+
+    @contextmanager
+    def reserve_in_flight(self, n_bytes: int):
+        if self._max_in_flight_bytes is None:
+            yield
+            return
+
+        with self._in_flight_condition:
+            while self._n_bytes_in_flight > 0 and self._n_bytes_in_flight + n_bytes > self._max_in_flight_bytes:
+                self._in_flight_condition.wait()
+            self._n_bytes_in_flight += n_bytes
+
+        try:
+            yield
+        finally:
+            with self._in_flight_condition:
+                self._n_bytes_in_flight -= n_bytes
+                self._in_flight_condition.notify_all()
+
+    def wait_for_disk_space(self, path: str):
+        if self._min_free_disk is None:
+            return
+
+        folder = str(Path(path).parent)
+        with self._disk_lock:
+            now = time.perf_counter()
+            if not self.is_paused_for_disk_space and now - self._last_disk_check < self._disk_check_interval:
+                return
+            self._last_disk_check = now
+
+            while shutil.disk_usage(folder).free < self._min_free_disk:
+                if not self.is_paused_for_disk_space:
+                    print(f"Less than {format_bytes(self._min_free_disk)} free disk space left in {folder}. Pausing downloads...")
+                    self.is_paused_for_disk_space = True
+                # Other threads queue up on the lock and are paused as well
+                time.sleep(5 * self._disk_check_interval)
+
+            if self.is_paused_for_disk_space:
+                print("Enough free disk space available again. Resuming downloads")
+                self.is_paused_for_disk_space = False
+
+    def get_n_bytes_in_flight(self) -> int:
+        return self._n_bytes_in_flight
+
+    @property
+    def limits_in_flight_bytes(self) -> bool:
+        return self._max_in_flight_bytes is not None
+
+
+def format_bytes(n_bytes: float) -> str:
+    for unit in ['B', 'KB', 'MB', 'GB', 'TB']:
+        if abs(n_bytes) < 1000 or unit == 'TB':
+            return f"{n_bytes:.1f}{unit}"
+        n_bytes /= 1000
+
+
+@dataclass
+class RemoteFileInfo:
+    size: int
+    accepts_ranges: bool = False
+    etag: Optional[str] = None
+
+
+@dataclass
+class DownloadResult:
+    size: int
+    etag: Optional[str] = None
+    skipped: bool = False  # True if the local file was already complete and nothing was downloaded
+
+
+def download_file(url: str,
+                  target_path: str,
+                  overwrite: bool = False,
+                  session: Optional[requests.Session] = None,
+                  progress: Optional[DownloadProgress] = None,
+                  throttle: Optional[DownloadThrottle] = None,
+                  n_retries: int = 5,
+                  backoff_factor: float = 0.5,
+                  chunk_size: int = 1024 * 1024,
+                  expected_hash: Optional[str] = None,
+                  n_parallel_chunks: int = 1,
+                  parallel_chunks_min_size: int = 256 * 1024 * 1024) -> DownloadResult:
+    """
+    Downloads a file into `{target_path}.part` and atomically renames it to `target_path` once it is complete.
+    Interrupted downloads are resumed from an existing .part file via HTTP Range requests.
+
+    Parameters
+    ----------
+    expected_hash:
+        If given, the finished file is verified against it before being renamed. Either "<algorithm>:<hex digest>" or a bare
+        md5/sha1/sha256 hex digest
+    n_parallel_chunks:
+        Files larger than `parallel_chunks_min_size` are split into that many byte ranges that are downloaded in parallel
+    """
+
+    if session is None:
+        with create_session(n_retries=n_retries, backoff_factor=backoff_factor) as session:
+            return download_file(url, target_path, overwrite=overwrite, session=session, progress=progress, throttle=throttle,
+                                 n_retries=n_retries, backoff_factor=backoff_factor, chunk_size=chunk_size, expected_hash=expected_hash,
+                                 n_parallel_chunks=n_parallel_chunks, parallel_chunks_min_size=parallel_chunks_min_size)
 
-def download_file(url: str, target_path: str, overwrite: bool = False) -> None:
     ensure_directory_exists_for_file(target_path)
+    partial_path = get_partial_path(target_path)
 
-    if not overwrite and Path(target_path).exists():
-        response = requests.head(url)
-        download_size = int(response.headers['content-length'])
+    if overwrite:
+        _remove_partial_download(partial_path)
+    elif Path(target_path).exists():
+        remote_file_info = probe_url(url, session)
+        download_size = remote_file_info.size
         local_file_size = os.path.getsize(target_path)
 
-        if download_size == local_file_size:
+        if download_size == local_file_size and (expected_hash is None or verify_file_hash(target_path, expected_hash)):
             print(f"{target_path} already exists, skipping")
-            return
+            return DownloadResult(local_file_size, etag=remote_file_info.etag, skipped=True)
+        elif local_file_size < download_size and not Path(partial_path).exists():
+            # Files from older versions of the downloader were written directly to the target path
+            print(f"{target_path} seems to be incomplete. Resuming download...")
+            os.replace(target_path, partial_path)
         else:
-            print(f"{target_path} seems to be incomplete. Re-downloading...")
+            print(f"{target_path} seems to be corrupted. Re-downloading...")
+            os.remove(target_path)
+            _remove_partial_download(partial_path)
 
     print(f"Downloading file from {url} to {target_path}")
 
+    chunks_state_path = get_chunks_state_path(partial_path)
+    remote_file_info = None
+    if n_parallel_chunks > 1 or Path(chunks_state_path).exists() or (throttle is not None and throttle.limits_in_flight_bytes):
+        # The in-flight budget of a request is reserved before it is sent and therefore needs the size upfront
+        remote_file_info = probe_url(url, session)
+
+    use_chunks = remote_file_info is not None and remote_file_info.accepts_ranges and remote_file_info.size >= parallel_chunks_min_size
+    if Path(chunks_state_path).exists():
+        # The .part file of an interrupted chunked download is preallocated to the full size and mostly zeros. It can
+        # only be resumed chunk by chunk, appending to it sequentially would take it for complete
+        chunks_state = load_json(chunks_state_path)
+        if remote_file_info.accepts_ranges and chunks_state['size'] == remote_file_info.size:
+            use_chunks = True
+            n_parallel_chunks = len(chunks_state['boundaries']) - 1
+        else:
+            _remove_partial_download(partial_path)
+
+    with timed("download.transfer"):
+        if use_chunks:
+            _download_chunked(url, partial_path, remote_file_info.size, n_parallel_chunks, session, progress, throttle, n_retries, backoff_factor, chunk_size)
+            etag = remote_file_info.etag
+        else:
+            download_size = None if remote_file_info is None else remote_file_info.size
+            etag = _download_sequential(url, partial_path, download_size, session, progress, throttle, n_retries, backoff_factor, chunk_size)
+
+    if expected_hash is not None:
+        with timed("download.verify_hash"):
+            is_hash_valid = verify_file_hash(partial_path, expected_hash)
+        if not is_hash_valid:
+            _remove_partial_download(partial_path)
+            raise ValueError(f"Checksum of file downloaded from {url} does not match {expected_hash}")
+
+    os.replace(partial_path, target_path)
+
+    increment("download.files")
+    if progress is not None:
+        progress.add_file()
+
+    return DownloadResult(os.path.getsize(target_path), etag=etag)
+
+
+def probe_url(url: str, session: requests.Session) -> RemoteFileInfo:
+    response = session.head(url, allow_redirects=True)
+    response.raise_for_status()
+    download_size = int(response.headers['content-length'])
+    accepts_ranges = response.headers.get('accept-ranges', 'none').lower() == 'bytes'
+    return RemoteFileInfo(download_size, accepts_ranges=accepts_ranges, etag=response.headers.get('etag'))
+
+
+def get_partial_path(target_path: str) -> str:
+    return f"{target_path}.part"
+
+
+def get_chunks_state_path(partial_path: str) -> str:
+    return f"{partial_path}.chunks.json"
+
+
+def _remove_partial_download(partial_path: str):
+    for path in [partial_path, get_chunks_state_path(partial_path)]:
+        if Path(path).exists():
+            os.remove(path)
+
+
+def _reserve_in_flight(throttle: Optional[DownloadThrottle], n_bytes: int):
+    return nullcontext() if throttle is None else throttle.reserve_in_flight(n_bytes)
+
+
+def _write_chunk(f, chunk: bytes, path: str, progress: Optional[DownloadProgress], throttle: Optional[DownloadThrottle]):
+    if throttle is not None:
+        throttle.wait_for_disk_space(path)
+        throttle.consume_bandwidth(len(chunk))
+    f.write(chunk)
+    increment("download.bytes", len(chunk))
+    if progress is not None:
+        progress.add_bytes(len(chunk))
+
+
+def _download_sequential(url: str,
+                         partial_path: str,
+                         download_size: Optional[int],
+                         session: requests.Session,
+                         progress: Optional[DownloadProgress],
+                         throttle: Optional[DownloadThrottle],
+                         n_retries: int,
+                         backoff_factor: float,
+                         chunk_size: int) -> Optional[str]:
+    # Connection errors before the response are retried by the session.
+    # Errors while streaming the body (e.g., connection resets) are retried here by resuming from the already written bytes
+    for i_try in range(n_retries + 1):
+        offset = os.path.getsize(partial_path) if Path(partial_path).exists() else 0
+        headers = {'Range': f"bytes={offset}-"} if offset > 0 else None
+        n_bytes_expected = 0 if download_size is None else max(download_size - offset, 0)
+        try:
+            with _reserve_in_flight(throttle, n_bytes_expected), session.get(url, stream=True, headers=headers) as response:
+                if response.status_code == 416:
+                    # Range not satisfiable: The .part file already has the full size (or is larger than the remote file).
+                    # Sequential downloads only ever append received bytes, so a full-size .part file without chunk state is complete
+                    total_size = int(response.headers.get('content-range', '*/-1').split('/')[-1])
+                    if total_size == offset and not Path(get_chunks_state_path(partial_path)).exists():
+                        return response.headers.get('etag')
+                    _remove_partial_download(partial_path)
+                    continue
+
+                response.raise_for_status()
+                # Servers that ignore the Range header send the whole file with status 200
+                mode = 'ab' if response.status_code == 206 else 'wb'
+                with open(partial_path, mode) as f:
+                    for chunk in response.iter_content(chunk_size=chunk_size):
+                        _write_chunk(f, chunk, partial_path, progress, throttle)
+                return response.headers.get('etag')
+        except requests.HTTPError as e:
+            print(f"HTTP error occurred reaching {url}: {e}")
+            raise e
+        except TRANSIENT_ERRORS as e:
+            if i_try == n_retries:
+                print(f"URL error occurred reaching {url}: {e}")
+                raise e
+            time.sleep(backoff_factor * 2 ** i_try)
+
+
+def _download_chunked(url: str,
+                      partial_path: str,
+                      download_size: int,
+                      n_chunks: int,
+                      session: requests.Session,
+                      progress: Optional[DownloadProgress],
+                      throttle: Optional[DownloadThrottle],
+                      n_retries: int,
+                      backoff_factor: float,
+                      chunk_size: int):
+    # The number of downloaded bytes per range is persisted next to the .part file such that chunked downloads can be resumed as well
+    chunks_state_path = get_chunks_state_path(partial_path)
+    boundaries = [download_size * i // n_chunks for i in range(n_chunks + 1)]
+    n_bytes_done = [0] * n_chunks
+    if Path(chunks_state_path).exists() and Path(partial_path).exists():
+        chunks_state = load_json(chunks_state_path)
+        if chunks_state['size'] == download_size and chunks_state['boundaries'] == boundaries:
+            n_bytes_done = chunks_state['n_bytes_done']
+
+    if not Path(partial_path).exists() or os.path.getsize(partial_path) != download_size:
+        n_bytes_done = [0] * n_chunks
+        # The state is written before preallocating, such that a preallocated .part file is never left without it
+        save_json(dict(size=download_size, boundaries=boundaries, n_bytes_done=n_bytes_done), chunks_state_path)
+        with open(partial_path, 'wb') as f:
+            f.truncate(download_size)
+
+    def download_range(i_chunk: int):
+        for i_try in range(n_retries + 1):
+            start = boundaries[i_chunk] + n_bytes_done[i_chunk]
+            end = boundaries[i_chunk + 1] - 1
+            if start > end:
+                return
+            try:
+                with _reserve_in_flight(throttle, end - start + 1), \
+                        session.get(url, stream=True, headers={'Range': f"bytes={start}-{end}"}) as response:
+                    response.raise_for_status()
+                    assert response.status_code == 206, f"Server did not respond with partial content for range request to {url}"
+                    with open(partial_path, 'r+b') as f:
+                        f.seek(start)
+                        for chunk in response.iter_content(chunk_size=chunk_size):
+                            _write_chunk(f, chunk, partial_path, progress, throttle)
+                            n_bytes_done[i_chunk] += len(chunk)
+                return
+            except TRANSIENT_ERRORS as e:
+                if i_try == n_retries:
+                    print(f"URL error occurred reaching {url}: {e}")
+                    raise e
+                time.sleep(backoff_factor * 2 ** i_try)
+
     try:
-        urllib.request.urlretrieve(url, target_path)
-    except HTTPError as e:
-        print(f"HTTP error occurred reaching {url}: {e}")
-        raise e
-    except URLError as e:
-        print(f"URL error occurred reaching {url}: {e}")
-        raise e
+        with ThreadPoolExecutor(max_workers=n_chunks) as executor:
+            for future in [executor.submit(download_range, i_chunk) for i_chunk in range(n_chunks)]:
+                future.result()
+    finally:
+        save_json(dict(size=download_size, boundaries=boundaries, n_bytes_done=n_bytes_done), chunks_state_path)
+
+    os.remove(chunks_state_path)
+
+
+# ==========================================================
+# Checksums
+# ==========================================================
+
+HASH_ALGORITHMS_BY_LENGTH = {32: 'md5', 40: 'sha1', 64: 'sha256', 128: 'sha512'}
+
+
+def compute_file_hash(path: str, algorithm: str = 'sha256', block_size: int = 8 * 1024 * 1024) -> str:
+    file_hash = hashlib.new(algorithm)
+    with open(path, 'rb') as f:
+        while True:
+            block = f.read(block_size)
+            if not block:
+                break
+            file_hash.update(block)
+    return file_hash.hexdigest()
+
+
+def parse_expected_hash(expected_hash: str) -> Tuple[str, str]:
+    if ':' in expected_hash:
+        algorithm, hex_digest = expected_hash.split(':', 1)
+    else:
+        hex_digest = expected_hash
+        assert len(hex_digest) in HASH_ALGORITHMS_BY_LENGTH, f"Cannot infer hash algorithm of {expected_hash}"
+        algorithm = HASH_ALGORITHMS_BY_LENGTH[len(hex_digest)]
+    return algorithm.lower(), hex_digest.lower()
+
+
+def verify_file_hash(path: str, expected_hash: str) -> bool:
+    algorithm, hex_digest = parse_expected_hash(expected_hash)
+    return compute_file_hash(path, algorithm) == hex_digest
+
+
+def load_checksum_manifest(path_or_url: str) -> Dict[str, str]:
+    """
+    Loads a checksum manifest mapping relative paths to hashes. Supported formats:
+        - JSON: {"<relative path>": "<hash>", ...}
+        - Output of sha256sum/md5sum: "<hex digest>  <relative path>" per line
+    """
+
+    if path_or_url.startswith('http://') or path_or_url.startswith('https://'):
+        with create_session() as session:
+            response = session.get(path_or_url)
+            response.raise_for_status()
+            content = response.text
+    else:
+        content = Path(path_or_url).read_text()
+
+    if content.lstrip().startswith('{'):
+        return json.loads(content)
+
+    checksums = dict()
+    for line in content.splitlines():
+        if line.strip():
+            hex_digest, relative_path = line.strip().split(maxsplit=1)
+            relative_path = relative_path.lstrip('*')  # Binary mode marker of sha256sum
+            if relative_path.startswith('./'):
+                relative_path = relative_path[2:]
+            checksums[relative_path] = hex_digest
+    return checksums
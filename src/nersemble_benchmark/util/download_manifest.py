@@ -0,0 +1,136 @@
+import json
+import os
+import threading
+from dataclasses import dataclass, asdict
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Optional, List
+
+from elias.util import ensure_directory_exists_for_file
+
+from nersemble_benchmark.util.download import verify_file_hash
+
+
+@dataclass
+class DownloadManifestEntry:
+    size: int
+    mtime_ns: int
+    completed_at: str
+    etag: Optional[str] = None
+    hash: Optional[str] = None
+
+
+class DownloadManifest:
+    """
+    Local record of completely downloaded files, stored as `download_manifest.json` in the benchmark type folder.
+    Files whose size and modification time still match their manifest entry are known to be complete without asking the server.
+    """
+
+    FILE_NAME = "download_manifest.json"
+
+    def __init__(self, folder: str, autosave_every: int = 100):
+        self._folder = folder
+        self._path = f"{folder}/{self.FILE_NAME}"
+        self._autosave_every = autosave_every
+        self._lock = threading.Lock()
+        self._n_unsaved_changes = 0
+        self._entries: Dict[str, DownloadManifestEntry] = dict()
+
+        if Path(self._path).exists():
+            with open(self._path, 'r') as f:
+                self._entries = {relative_url: DownloadManifestEntry(**entry) for relative_url, entry in json.load(f).items()}
+
+    def __contains__(self, relative_url: str) -> bool:
+        return relative_url in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, relative_url: str) -> Optional[DownloadManifestEntry]:
+        return self._entries.get(relative_url)
+
+    def get_local_path(self, relative_url: str) -> str:
+        return f"{self._folder}/{relative_url}"
+
+    def is_up_to_date(self, relative_url: str) -> bool:
+        """
+        Whether the local file exists and still matches its manifest entry. Does not access the network.
+        """
+
+        entry = self._entries.get(relative_url)
+        if entry is None:
+            return False
+
+        try:
+            stat = os.stat(self.get_local_path(relative_url))
+        except FileNotFoundError:
+            return False
+
+        return stat.st_size == entry.size and stat.st_mtime_ns == entry.mtime_ns
+
+    def record(self, relative_url: str, etag: Optional[str] = None, hash: Optional[str] = None):
+        stat = os.stat(self.get_local_path(relative_url))
+        entry = DownloadManifestEntry(size=stat.st_size,
+                                      mtime_ns=stat.st_mtime_ns,
+                                      completed_at=datetime.now(timezone.utc).isoformat(timespec='seconds'),
+                                      etag=etag,
+                                      hash=hash)
+        with self._lock:
+            self._entries[relative_url] = entry
+            self._n_unsaved_changes += 1
+            needs_save = self._n_unsaved_changes >= self._autosave_every
+
+        if needs_save:
+            self.save()
+
+    def remove(self, relative_url: str):
+        with self._lock:
+            if relative_url in self._entries:
+                del self._entries[relative_url]
+                self._n_unsaved_changes += 1
+
+    def save(self):
+        with self._lock:
+            entries = {relative_url: asdict(entry) for relative_url, entry in sorted(self._entries.items())}
+            self._n_unsaved_changes = 0
+
+            # Write to a temporary file first such that an interrupted save cannot corrupt the manifest
+            ensure_directory_exists_for_file(self._path)
+            temp_path = f"{self._path}.tmp"
+            with open(temp_path, 'w') as f:
+                json.dump(entries, f, indent=1)
+            os.replace(temp_path, self._path)
+
+    def verify_local(self, relative_urls: List[str], check_hashes: bool = True) -> Dict[str, List[str]]:
+        """
+        Checks the local files of the given relative URLs against the manifest without accessing the network.
+        Files with a modified timestamp but correct size (and hash) are considered intact.
+        """
+
+        not_in_manifest = []
+        missing_files = []
+        wrong_sizes = []
+        wrong_hashes = []
+        for relative_url in relative_urls:
+            entry = self._entries.get(relative_url)
+            local_path = self.get_local_path(relative_url)
+            if entry is None:
+                not_in_manifest.append(relative_url)
+            elif not Path(local_path).exists():
+                missing_files.append(relative_url)
+            elif os.path.getsize(local_path) != entry.size:
+                wrong_sizes.append(relative_url)
+            elif check_hashes and entry.hash is not None and not verify_file_hash(local_path, entry.hash):
+                wrong_hashes.append(relative_url)
+
+        issues = dict()
+        if not_in_manifest:
+            issues['not_in_manifest'] = not_in_manifest
+        if missing_files:
+            issues['missing_files'] = missing_files
+        if wrong_sizes:
+            issues['wrong_sizes'] = wrong_sizes
+        if wrong_hashes:
+            issues['wrong_hashes'] = wrong_hashes
+
+        return issues
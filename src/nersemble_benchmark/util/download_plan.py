@@ -0,0 +1,125 @@
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import List, Optional, Literal, Dict, Tuple
+
+import requests
+from tqdm import tqdm
+
+from nersemble_benchmark.constants import ASSET_DOWNLOAD_PRIORITIES
+from nersemble_benchmark.util.download import probe_url, format_bytes, create_session
+from nersemble_benchmark.util.download_manifest import DownloadManifest
+
+ScheduleType = Literal['in_order', 'largest_first', 'smallest_first']
+
+
+@dataclass
+class DownloadEntry:
+    relative_url: str
+    asset: str
+    participant_id: int
+    size: Optional[int] = None
+    is_complete: bool = False  # Already complete locally according to the download manifest
+
+
+class DownloadPlan:
+    """
+    Resolved list of files to download together with their sizes.
+    Used to estimate the required disk space/bandwidth before downloading and to decide in which order files are downloaded.
+    """
+
+    def __init__(self, entries: List[DownloadEntry]):
+        self._entries = entries
+
+    @property
+    def entries(self) -> List[DownloadEntry]:
+        return self._entries
+
+    def get_remaining_entries(self) -> List[DownloadEntry]:
+        return [entry for entry in self._entries if not entry.is_complete]
+
+    def schedule(self, schedule: ScheduleType = 'largest_first') -> List[DownloadEntry]:
+        """
+        Orders the remaining downloads by asset priority (e.g., calibration and tracking before videos).
+        Within a priority class, largest-first packing avoids that a single large file is started last and dominates the tail
+        of a parallel download. Smallest-first maximizes the number of usable files early on.
+        """
+
+        remaining_entries = self.get_remaining_entries()
+
+        def sort_key(entry: DownloadEntry) -> Tuple:
+            priority = ASSET_DOWNLOAD_PRIORITIES.get(entry.asset, len(ASSET_DOWNLOAD_PRIORITIES))
+            size = entry.size if entry.size is not None else 0
+            if schedule == 'largest_first':
+                return priority, -size
+            elif schedule == 'smallest_first':
+                return priority, size
+            else:
+                return priority,
+
+        return sorted(remaining_entries, key=sort_key)  # sorted() is stable, so 'in_order' keeps the collection order
+
+    def get_size_summary(self, group_by: Literal['asset', 'participant']) -> Dict[str, Dict[str, int]]:
+        summary = defaultdict(lambda: dict(n_files=0, n_bytes=0, n_files_remaining=0, n_bytes_remaining=0, n_files_unknown_size=0))
+        for entry in self._entries:
+            key = entry.asset if group_by == 'asset' else entry.participant_id
+            group = summary[key]
+            group['n_files'] += 1
+            if entry.size is None:
+                group['n_files_unknown_size'] += 1
+            else:
+                group['n_bytes'] += entry.size
+            if not entry.is_complete:
+                group['n_files_remaining'] += 1
+                group['n_bytes_remaining'] += entry.size if entry.size is not None else 0
+
+        return dict(summary)
+
+    def get_total_size(self, remaining_only: bool = False) -> int:
+        return sum(entry.size for entry in self._entries if entry.size is not None and not (remaining_only and entry.is_complete))
+
+    def print_summary(self):
+        for group_by in ['asset', 'participant']:
+            print(f"{group_by:>12} | {'#files':>8} | {'size':>10} | {'to download':>12}")
+            print(f"{'-' * 13}+{'-' * 10}+{'-' * 12}+{'-' * 13}")
+            for key, group in sorted(self.get_size_summary(group_by).items()):
+                unknown = f" (+{group['n_files_unknown_size']} unknown)" if group['n_files_unknown_size'] > 0 else ""
+                print(f"{key:>12} | {group['n_files']:>8} | {format_bytes(group['n_bytes']):>10} | {format_bytes(group['n_bytes_remaining']):>12}{unknown}")
+            print()
+
+        n_remaining = len(self.get_remaining_entries())
+        print(f"Total: {len(self._entries)} files, {format_bytes(self.get_total_size())}. "
+              f"To download: {n_remaining} files, {format_bytes(self.get_total_size(remaining_only=True))}")
+
+
+def create_download_plan(entries: List[DownloadEntry],
+                         base_url: str,
+                         manifest: Optional[DownloadManifest] = None,
+                         fetch_sizes: bool = True,
+                         n_workers: int = 8,
+                         session: Optional[requests.Session] = None) -> DownloadPlan:
+    """
+    Marks entries that are already complete according to the manifest and fetches the sizes of all other entries via
+    concurrent HEAD requests.
+    """
+
+    if fetch_sizes and session is None:
+        with create_session(n_connections=n_workers) as session:
+            return create_download_plan(entries, base_url, manifest=manifest, fetch_sizes=fetch_sizes, n_workers=n_workers, session=session)
+
+    for entry in entries:
+        if manifest is not None and manifest.is_up_to_date(entry.relative_url):
+            entry.is_complete = True
+            entry.size = manifest.get(entry.relative_url).size
+
+    if fetch_sizes:
+        def fetch_size(entry: DownloadEntry):
+            entry.size = probe_url(f"{base_url}/{entry.relative_url}", session).size
+
+        entries_to_probe = [entry for entry in entries if entry.size is None]
+        with ThreadPoolExecutor(max_workers=n_workers) as executor:
+            futures = [executor.submit(fetch_size, entry) for entry in entries_to_probe]
+            for future in tqdm(futures, desc="Fetching download sizes", unit='file'):
+                future.result()
+
+    return DownloadPlan(entries)
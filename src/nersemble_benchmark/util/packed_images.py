@@ -0,0 +1,89 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import List, Callable, Sequence, Hashable, Dict
+
+import numpy as np
+from elias.util import ensure_directory_exists
+
+
+class PackedImages:
+    """
+    Equally-sized images packed into a single array that can be memory-mapped. Images are addressed by (tuple) keys.
+
+    Layout:
+        images.npy  (N, H, W, C)    uint8
+        keys.json   [N]             list of keys (tuples are stored as lists)
+    """
+
+    def __init__(self, folder: str, mmap: bool = True):
+        self._folder = folder
+        self._images = np.load(f"{folder}/images.npy", mmap_mode='r' if mmap else None)
+        with open(f"{folder}/keys.json") as f:
+            self._keys = [_to_key(key) for key in json.load(f)]
+        self._key_to_idx: Dict[Hashable, int] = {key: i for i, key in enumerate(self._keys)}
+
+    @staticmethod
+    def exists(folder: str) -> bool:
+        return Path(f"{folder}/keys.json").exists()
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._key_to_idx
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    @property
+    def images(self) -> np.ndarray:
+        """
+        Zero-copy (memory-mapped) view of all images (N, H, W, C).
+        """
+
+        return self._images
+
+    def list_keys(self) -> List[Hashable]:
+        return list(self._keys)
+
+    def load(self, key: Hashable) -> np.ndarray:
+        return np.array(self._images[self._key_to_idx[key]])
+
+    def load_many(self, keys: Sequence[Hashable]) -> np.ndarray:
+        indices = [self._key_to_idx[key] for key in keys]
+        return self._images[indices]
+
+    @staticmethod
+    def pack(folder: str, keys: Sequence[Hashable], load_image: Callable[[Hashable], np.ndarray], n_workers: int = 8) -> 'PackedImages':
+        """
+        Decodes the images of the given keys in parallel threads and writes them into a single store in `folder`.
+        All images must have the same resolution and number of channels.
+        """
+
+        assert len(keys) > 0, "No images to pack"
+        first_image = load_image(keys[0])
+
+        ensure_directory_exists(folder)
+        # A previous store in the same folder is incomplete from here on
+        Path(f"{folder}/keys.json").unlink(missing_ok=True)
+        images = np.lib.format.open_memmap(f"{folder}/images.npy", mode='w+', dtype=np.uint8, shape=(len(keys), *first_image.shape))
+
+        def pack_image(i: int):
+            image = first_image if i == 0 else load_image(keys[i])
+            assert image.shape == first_image.shape, \
+                f"All packed images must have the same shape. {keys[i]} has shape {image.shape}, expected {first_image.shape}"
+            images[i] = image
+
+        with ThreadPoolExecutor(max_workers=n_workers) as executor:
+            list(executor.map(pack_image, range(len(keys))))
+
+        images.flush()
+        del images
+
+        # keys.json is written last and marks the store as complete
+        with open(f"{folder}/keys.json", 'w') as f:
+            json.dump([list(key) if isinstance(key, tuple) else key for key in keys], f)
+
+        return PackedImages(folder)
+
+
+def _to_key(key) -> Hashable:
+    return tuple(key) if isinstance(key, list) else key
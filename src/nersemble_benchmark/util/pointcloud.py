@@ -0,0 +1,373 @@
+from pathlib import Path
+from typing import Tuple, Dict, List, Optional
+
+import numpy as np
+from elias.util import ensure_directory_exists, save_json, load_json
+
+from nersemble_benchmark.util.cache import get_file_version
+
+PointCloud = Tuple[np.ndarray, np.ndarray, np.ndarray]  # points (N, 3), colors (N, 3) in [0, 1], normals (N, 3)
+
+_PCD_TYPES = {
+    ('F', 4): np.float32, ('F', 8): np.float64,
+    ('U', 1): np.uint8, ('U', 2): np.uint16, ('U', 4): np.uint32, ('U', 8): np.uint64,
+    ('I', 1): np.int8, ('I', 2): np.int16, ('I', 4): np.int32, ('I', 8): np.int64,
+}
+
+_PLY_TYPES = {
+    'char': 'i1', 'int8': 'i1', 'uchar': 'u1', 'uint8': 'u1',
+    'short': 'i2', 'int16': 'i2', 'ushort': 'u2', 'uint16': 'u2',
+    'int': 'i4', 'int32': 'i4', 'uint': 'u4', 'uint32': 'u4',
+    'float': 'f4', 'float32': 'f4', 'double': 'f8', 'float64': 'f8',
+}
+
+
+# ==========================================================
+# Reading single pointcloud files
+# ==========================================================
+
+def read_pointcloud(path: str) -> PointCloud:
+    """
+    Reads a .pcd or .ply pointcloud directly with NumPy.
+    Returns the same float32 (points, colors, normals) triple as reading the file with open3d would.
+    Missing colors or normals are returned as empty (0, 3) arrays.
+    """
+
+    suffix = Path(path).suffix.lower()
+    if suffix == '.pcd':
+        return read_pcd(path)
+    elif suffix == '.ply':
+        return read_ply(path)
+    else:
+        raise ValueError(f"Unsupported pointcloud format: {path}")
+
+
+def read_pcd(path: str) -> PointCloud:
+    with open(path, 'rb') as f:
+        header = _read_pcd_header(f)
+        n_points = header['n_points']
+        dtype = header['dtype']
+        data_format = header['data']
+
+        if data_format == 'binary':
+            data = np.frombuffer(f.read(n_points * dtype.itemsize), dtype=dtype, count=n_points)
+        elif data_format == 'ascii':
+            values = np.loadtxt(f, dtype=np.float64, ndmin=2)
+            data = np.empty(n_points, dtype=dtype)
+            if values.shape[1] != sum(dtype[name].shape[0] if dtype[name].shape else 1 for name in dtype.names):
+                raise ValueError(f"Number of values per point does not match FIELDS and COUNT in the header of {path}")
+            i_column = 0  # Fields with COUNT > 1 span multiple columns
+            for name in dtype.names:
+                count = dtype[name].shape[0] if dtype[name].shape else 1
+                field_values = values[:, i_column] if count == 1 else values[:, i_column:i_column + count]
+                if name == 'rgb' and dtype[name] == np.float32:
+                    # Packed colors are written as integer literals in ASCII files
+                    data[name] = field_values.astype(np.uint32).view(np.float32)
+                else:
+                    data[name] = field_values
+                i_column += count
+        else:
+            # binary_compressed uses LZF which has no NumPy decoder. This path is rare, so we fall back to open3d
+            return _read_pointcloud_open3d(path)
+
+    points = _stack_fields(data, ['x', 'y', 'z'])
+
+    if 'rgb' in dtype.names or 'rgba' in dtype.names:
+        packed = data['rgb' if 'rgb' in dtype.names else 'rgba']
+        packed = np.ascontiguousarray(packed).view(np.uint32)
+        colors = np.stack([(packed >> 16) & 0xFF, (packed >> 8) & 0xFF, packed & 0xFF], axis=-1).astype(np.float32) / 255
+    else:
+        colors = np.zeros((0, 3), dtype=np.float32)
+
+    if 'normal_x' in dtype.names:
+        normals = _stack_fields(data, ['normal_x', 'normal_y', 'normal_z'])
+    else:
+        normals = np.zeros((0, 3), dtype=np.float32)
+
+    return points, colors, normals
+
+
+def read_ply(path: str) -> PointCloud:
+    with open(path, 'rb') as f:
+        header = _read_ply_header(f)
+        n_points = header['n_points']
+        dtype = header['dtype']
+
+        if header['format'] == 'ascii':
+            values = np.loadtxt(f, dtype=np.float64, ndmin=2, max_rows=n_points)
+            data = np.empty(n_points, dtype=dtype.newbyteorder('='))
+            for i, name in enumerate(dtype.names):
+                data[name] = values[:, i]
+        else:
+            f.seek(header['vertex_offset'], 1)
+            data = np.frombuffer(f.read(n_points * dtype.itemsize), dtype=dtype, count=n_points)
+
+    points = _stack_fields(data, ['x', 'y', 'z'])
+
+    if 'red' in dtype.names:
+        colors = _stack_fields(data, ['red', 'green', 'blue'])
+        if dtype['red'].kind in 'ui':
+            colors /= np.iinfo(dtype['red']).max
+    else:
+        colors = np.zeros((0, 3), dtype=np.float32)
+
+    if 'nx' in dtype.names:
+        normals = _stack_fields(data, ['nx', 'ny', 'nz'])
+    else:
+        normals = np.zeros((0, 3), dtype=np.float32)
+
+    return points, colors, normals
+
+
+def read_pointcloud_size(path: str) -> int:
+    """
+    Only parses the header to obtain the number of points in the given pointcloud file.
+    """
+
+    with open(path, 'rb') as f:
+        if Path(path).suffix.lower() == '.pcd':
+            return _read_pcd_header(f)['n_points']
+        else:
+            return _read_ply_header(f)['n_points']
+
+
+def read_pointcloud_min_file_size(path: str) -> Optional[int]:
+    """
+    Only parses the header to compute how many bytes a binary pointcloud file needs to hold all points announced in its
+    header, e.g., to detect truncated files without reading them. None for ASCII and compressed files, whose data size does
+    not follow from the header.
+    """
+
+    with open(path, 'rb') as f:
+        if Path(path).suffix.lower() == '.pcd':
+            header = _read_pcd_header(f)
+            if header['data'] != 'binary':
+                return None
+            return f.tell() + header['n_points'] * header['dtype'].itemsize
+        else:
+            header = _read_ply_header(f)
+            if header['format'] == 'ascii':
+                return None
+            # Elements after the vertices (e.g., faces) are not included
+            return f.tell() + header['vertex_offset'] + header['n_points'] * header['dtype'].itemsize
+
+
+def _stack_fields(data: np.ndarray, names: List[str]) -> np.ndarray:
+    stacked = np.empty((len(data), len(names)), dtype=np.float32)
+    for i, name in enumerate(names):
+        stacked[:, i] = data[name]
+    return stacked
+
+
+def _read_pcd_header(f) -> Dict:
+    header = dict()
+    while True:
+        line = f.readline()
+        if not line:
+            raise ValueError(f"Unexpected end of PCD header in {f.name}")
+        line = line.decode('ascii').strip()
+        if not line or line.startswith('#'):
+            continue
+        key, *values = line.split()
+        header[key.upper()] = values
+        if key.upper() == 'DATA':
+            break
+
+    fields = header['FIELDS']
+    sizes = [int(size) for size in header['SIZE']]
+    types = header['TYPE']
+    counts = [int(count) for count in header.get('COUNT', ['1'] * len(fields))]
+    dtype = []
+    for field, size, type, count in zip(fields, sizes, types, counts):
+        field_dtype = _PCD_TYPES[(type, size)]
+        if field == '_':
+            # Padding fields may appear multiple times
+            field = f"_{len(dtype)}"
+        dtype.append((field, field_dtype) if count == 1 else (field, field_dtype, (count,)))
+
+    n_points = int(header['POINTS'][0]) if 'POINTS' in header else int(header['WIDTH'][0]) * int(header['HEIGHT'][0])
+
+    return dict(n_points=n_points, dtype=np.dtype(dtype), data=header['DATA'][0].lower())
+
+
+def _read_ply_header(f) -> Dict:
+    if f.readline().strip() != b'ply':
+        raise ValueError(f"{f.name} is not a PLY file")
+
+    ply_format = None
+    elements = []  # [(name, count, [(property_name, dtype) or (property_name, None) for lists])]
+    while True:
+        line = f.readline()
+        if not line:
+            raise ValueError(f"Unexpected end of PLY header in {f.name}")
+        tokens = line.decode('ascii').split()
+        if not tokens:
+            continue
+        if tokens[0] == 'format':
+            ply_format = tokens[1]
+        elif tokens[0] == 'element':
+            elements.append((tokens[1], int(tokens[2]), []))
+        elif tokens[0] == 'property':
+            if tokens[1] == 'list':
+                elements[-1][2].append((tokens[4], None))
+            else:
+                elements[-1][2].append((tokens[2], _PLY_TYPES[tokens[1]]))
+        elif tokens[0] == 'end_header':
+            break
+
+    byte_order = {'binary_little_endian': '<', 'binary_big_endian': '>', 'ascii': '='}[ply_format]
+
+    # Only fixed-size elements may precede the vertices, otherwise we cannot compute the vertex offset without parsing them
+    vertex_offset = 0
+    for name, count, properties in elements:
+        if any(property_dtype is None for _, property_dtype in properties):
+            if name == 'vertex':
+                raise ValueError(f"List properties for vertices are not supported: {f.name}")
+            if ply_format == 'ascii':
+                raise ValueError(f"Elements before vertices are not supported for ASCII PLY files: {f.name}")
+            raise ValueError(f"Variable-size element '{name}' before vertices is not supported: {f.name}")
+
+        dtype = np.dtype([(property_name, byte_order + property_dtype) for property_name, property_dtype in properties])
+        if name == 'vertex':
+            return dict(n_points=count, dtype=dtype, format=ply_format, vertex_offset=vertex_offset)
+        vertex_offset += count * dtype.itemsize
+
+    raise ValueError(f"{f.name} does not contain vertices")
+
+
+def _read_pointcloud_open3d(path: str) -> PointCloud:
+    import open3d as o3d
+
+    pcd = o3d.io.read_point_cloud(path)
+    points = np.asarray(pcd.points, dtype=np.float32)
+    colors = np.asarray(pcd.colors, dtype=np.float32)
+    normals = np.asarray(pcd.normals, dtype=np.float32)
+    return points, colors, normals
+
+
+# ==========================================================
+# Packed pointcloud store
+# ==========================================================
+
+class PackedPointClouds:
+    """
+    All pointclouds of a sequence packed into a single folder of .npy columns that can be memory-mapped.
+    Points of timestep `timesteps[i]` are stored in rows `offsets[i]:offsets[i + 1]` of each column.
+
+    Layout:
+        timesteps.npy   (T,)        int32
+        offsets.npy     (T + 1,)    int64
+        has_colors.npy  (T,)        bool
+        has_normals.npy (T,)        bool
+        points.npy      (N, 3)      float32
+        colors.npy      (N, 3)      uint8
+        normals.npy     (N, 3)      float32
+        sources.json    (T,)        version of the packed file per timestep (see `get_file_version()`)
+
+    Rows of pointclouds without colors or normals are zero in the respective column. `load()` returns empty (0, 3) arrays
+    for them, just like `read_pointcloud()`.
+    """
+
+    def __init__(self, folder: str, mmap: bool = True):
+        mmap_mode = 'r' if mmap else None
+        self._folder = folder
+        self._timesteps = np.load(f"{folder}/timesteps.npy")
+        self._offsets = np.load(f"{folder}/offsets.npy")
+        self._points = np.load(f"{folder}/points.npy", mmap_mode=mmap_mode)
+        self._colors = np.load(f"{folder}/colors.npy", mmap_mode=mmap_mode)
+        self._normals = np.load(f"{folder}/normals.npy", mmap_mode=mmap_mode)
+        self._has_colors = np.load(f"{folder}/has_colors.npy")
+        self._has_normals = np.load(f"{folder}/has_normals.npy")
+        self._sources: List[str] = load_json(f"{folder}/sources.json")
+        self._timestep_to_idx = {int(timestep): i for i, timestep in enumerate(self._timesteps)}
+
+    @staticmethod
+    def exists(folder: str) -> bool:
+        return Path(f"{folder}/offsets.npy").exists()
+
+    def __contains__(self, timestep: int) -> bool:
+        return timestep in self._timestep_to_idx
+
+    def __len__(self) -> int:
+        return len(self._timesteps)
+
+    def list_timesteps(self) -> List[int]:
+        return self._timesteps.tolist()
+
+    def get_source(self, timestep: int) -> str:
+        """
+        Version of the pointcloud file that the timestep was packed from, to be compared with `get_file_version()`.
+        """
+
+        return self._sources[self._timestep_to_idx[timestep]]
+
+    def load(self, timestep: int) -> PointCloud:
+        i = self._timestep_to_idx[timestep]
+        start, end = self._offsets[i], self._offsets[i + 1]
+        points = np.array(self._points[start:end])
+        if self._has_colors[i]:
+            colors = self._colors[start:end].astype(np.float32) / 255
+        else:
+            colors = np.zeros((0, 3), dtype=np.float32)
+        if self._has_normals[i]:
+            normals = np.array(self._normals[start:end])
+        else:
+            normals = np.zeros((0, 3), dtype=np.float32)
+        return points, colors, normals
+
+    def load_points(self, timestep: int) -> np.ndarray:
+        """
+        Zero-copy (memory-mapped) view of the points of a single timestep.
+        """
+
+        i = self._timestep_to_idx[timestep]
+        return self._points[self._offsets[i]:self._offsets[i + 1]]
+
+    @staticmethod
+    def pack(folder: str, pointcloud_paths: Dict[int, str]) -> 'PackedPointClouds':
+        """
+        Packs the given pointcloud files (timestep => path) into a single store in `folder`.
+        Only the headers are parsed in a first pass, such that the data can be streamed into the memory-mapped columns
+        without holding all pointclouds in memory at once.
+        """
+
+        timesteps = sorted(pointcloud_paths.keys())
+        sizes = [read_pointcloud_size(pointcloud_paths[timestep]) for timestep in timesteps]
+        offsets = np.zeros(len(timesteps) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum(sizes)
+        n_total = int(offsets[-1])
+
+        ensure_directory_exists(folder)
+        # A previous store in the same folder is incomplete from here on
+        Path(f"{folder}/offsets.npy").unlink(missing_ok=True)
+        open_memmap = np.lib.format.open_memmap
+        points = open_memmap(f"{folder}/points.npy", mode='w+', dtype=np.float32, shape=(n_total, 3))
+        colors = open_memmap(f"{folder}/colors.npy", mode='w+', dtype=np.uint8, shape=(n_total, 3))
+        normals = open_memmap(f"{folder}/normals.npy", mode='w+', dtype=np.float32, shape=(n_total, 3))
+
+        has_colors = np.zeros(len(timesteps), dtype=bool)
+        has_normals = np.zeros(len(timesteps), dtype=bool)
+        sources = []
+        for i, timestep in enumerate(timesteps):
+            start, end = offsets[i], offsets[i + 1]
+            sources.append(get_file_version(pointcloud_paths[timestep]))
+            pcd_points, pcd_colors, pcd_normals = read_pointcloud(pointcloud_paths[timestep])
+            points[start:end] = pcd_points
+            has_colors[i] = len(pcd_colors) > 0
+            has_normals[i] = len(pcd_normals) > 0
+            colors[start:end] = np.round(pcd_colors * 255) if has_colors[i] else 0
+            normals[start:end] = pcd_normals if has_normals[i] else 0
+
+        points.flush()
+        colors.flush()
+        normals.flush()
+        del points, colors, normals
+
+        # offsets.npy is written last and marks the store as complete
+        np.save(f"{folder}/timesteps.npy", np.asarray(timesteps, dtype=np.int32))
+        np.save(f"{folder}/has_colors.npy", has_colors)
+        np.save(f"{folder}/has_normals.npy", has_normals)
+        save_json(sources, f"{folder}/sources.json")
+        np.save(f"{folder}/offsets.npy", offsets)
+
+        return PackedPointClouds(folder)
@@ -0,0 +1,305 @@
+import functools
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from typing import Dict, Optional, Literal, Callable, Iterator, TypeVar
+
+from elias.util import ensure_directory_exists_for_file
+
+from nersemble_benchmark.env import NERSEMBLE_BENCHMARK_PROFILING
+
+T = TypeVar('T')
+ProfilingFormat = Literal['json', 'prometheus']
+
+# Upper bounds of the latency histogram buckets in seconds (roughly 2.5x apart)
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 60, float('inf'))
+
+
+# ==========================================================
+# Metrics
+# ==========================================================
+
+class LatencyHistogram:
+    def __init__(self):
+        self.bucket_counts = [0] * len(LATENCY_BUCKETS)
+        self.count = 0
+        self.sum = 0.
+        self.min = float('inf')
+        self.max = 0.
+
+    def observe(self, seconds: float):
+        self.bucket_counts[bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        self.min = min(self.min, seconds)
+        self.max = max(self.max, seconds)
+
+    def get_quantile(self, quantile: float) -> float:
+        """
+        Estimates a quantile by linear interpolation within the bucket that contains it (same as Prometheus).
+        """
+
+        if self.count == 0:
+            return float('nan')
+
+        rank = quantile * self.count
+        n_observations_below = 0
+        for i_bucket, bucket_count in enumerate(self.bucket_counts):
+            if n_observations_below + bucket_count >= rank and bucket_count > 0:
+                lower = LATENCY_BUCKETS[i_bucket - 1] if i_bucket > 0 else 0
+                upper = min(LATENCY_BUCKETS[i_bucket], self.max)
+                lower = max(lower, self.min)
+                return lower + (upper - lower) * (rank - n_observations_below) / bucket_count
+            n_observations_below += bucket_count
+
+        return self.max
+
+    def to_dict(self) -> Dict:
+        return dict(count=self.count,
+                    sum=self.sum,
+                    mean=self.sum / self.count if self.count > 0 else float('nan'),
+                    min=self.min if self.count > 0 else float('nan'),
+                    max=self.max if self.count > 0 else float('nan'),
+                    p50=self.get_quantile(0.5),
+                    p90=self.get_quantile(0.9),
+                    p99=self.get_quantile(0.99))
+
+
+class ProfilingRegistry:
+    """
+    Thread-safe collection of counters (e.g., frames decoded, bytes read) and latency histograms (seconds per call).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, float] = dict()
+        self._histograms: Dict[str, LatencyHistogram] = dict()
+
+    def increment(self, name: str, value: float = 1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def observe(self, name: str, seconds: float):
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = LatencyHistogram()
+                self._histograms[name] = histogram
+            histogram.observe(seconds)
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return dict(counters=dict(sorted(self._counters.items())),
+                        latencies={name: histogram.to_dict() for name, histogram in sorted(self._histograms.items())})
+
+    def to_prometheus(self, prefix: str = 'nersemble_benchmark') -> str:
+        lines = []
+        with self._lock:
+            for name, value in sorted(self._counters.items()):
+                metric_name = f"{prefix}_{_to_prometheus_name(name)}_total"
+                lines.append(f"# TYPE {metric_name} counter")
+                lines.append(f"{metric_name} {value}")
+
+            for name, histogram in sorted(self._histograms.items()):
+                metric_name = f"{prefix}_{_to_prometheus_name(name)}_seconds"
+                lines.append(f"# TYPE {metric_name} histogram")
+                cumulative_count = 0
+                for upper_bound, bucket_count in zip(LATENCY_BUCKETS, histogram.bucket_counts):
+                    cumulative_count += bucket_count
+                    le = '+Inf' if upper_bound == float('inf') else f"{upper_bound:g}"
+                    lines.append(f'{metric_name}_bucket{{le="{le}"}} {cumulative_count}')
+                lines.append(f"{metric_name}_sum {histogram.sum}")
+                lines.append(f"{metric_name}_count {histogram.count}")
+
+        return "\n".join(lines) + "\n"
+
+
+def _to_prometheus_name(name: str) -> str:
+    return ''.join(c if c.isalnum() else '_' for c in name)
+
+
+# ==========================================================
+# Global API
+# ==========================================================
+
+_REGISTRY = ProfilingRegistry()
+_ENABLED = NERSEMBLE_BENCHMARK_PROFILING
+
+
+def enable_profiling():
+    global _ENABLED
+    _ENABLED = True
+
+
+def disable_profiling():
+    global _ENABLED
+    _ENABLED = False
+
+
+def is_profiling_enabled() -> bool:
+    return _ENABLED
+
+
+def get_profiling_registry() -> ProfilingRegistry:
+    return _REGISTRY
+
+
+def get_profiling_stats() -> Dict:
+    return _REGISTRY.get_stats()
+
+
+def reset_profiling():
+    _REGISTRY.reset()
+
+
+def increment(name: str, value: float = 1):
+    if _ENABLED:
+        _REGISTRY.increment(name, value)
+
+
+class _Timer:
+    __slots__ = ('_name', '_start')
+
+    def __init__(self, name: str):
+        self._name = name
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        _REGISTRY.observe(self._name, time.perf_counter() - self._start)
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        pass
+
+
+_NULL_TIMER = _NullTimer()
+
+
+def timed(name: str):
+    """
+    Context manager that records the latency of the enclosed block in the histogram `name`.
+    Does nothing unless profiling is enabled.
+    """
+
+    if not _ENABLED:
+        return _NULL_TIMER
+    return _Timer(name)
+
+
+def profiled(name: str) -> Callable[[Callable[..., T]], Callable[..., T]]:
+    """
+    Decorator version of `timed()`.
+    """
+
+    def decorator(fn: Callable[..., T]) -> Callable[..., T]:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _ENABLED:
+                return fn(*args, **kwargs)
+            with _Timer(name):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def timed_iterator(name: str, iterator: Iterator[T], counter: Optional[str] = None) -> Iterator[T]:
+    """
+    Records the time of every `next()` call of the iterator, e.g., for lazily decoded video frames.
+    If `counter` is given, it is incremented for every item.
+    """
+
+    if not _ENABLED:
+        return iterator
+    return _timed_iterator(name, iterator, counter)
+
+
+def _timed_iterator(name: str, iterator: Iterator[T], counter: Optional[str]) -> Iterator[T]:
+    iterator = iter(iterator)
+    while True:
+        start = time.perf_counter()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            return
+        _REGISTRY.observe(name, time.perf_counter() - start)
+        if counter is not None:
+            _REGISTRY.increment(counter)
+        yield item
+
+
+# ==========================================================
+# Export
+# ==========================================================
+
+def save_profiling_stats(path: str, format: ProfilingFormat = 'json'):
+    if format == 'json':
+        content = json.dumps(get_profiling_stats(), indent=1)
+    elif format == 'prometheus':
+        content = _REGISTRY.to_prometheus()
+    else:
+        raise ValueError(f"Unknown profiling format: {format}")
+
+    # Readers (e.g., a Prometheus node exporter textfile collector) should never see a partially written file
+    ensure_directory_exists_for_file(path)
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'w') as f:
+        f.write(content)
+    os.replace(temp_path, path)
+
+
+class ProfilingDumper:
+    """
+    Periodically writes the profiling stats to a file in a background thread. Enables profiling when started.
+
+    with ProfilingDumper("profiling.prom", interval=30, format='prometheus'):
+        train()
+    """
+
+    def __init__(self, path: str, interval: float = 60, format: ProfilingFormat = 'json'):
+        self._path = path
+        self._interval = interval
+        self._format = format
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        enable_profiling()
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="ProfilingDumper", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        save_profiling_stats(self._path, format=self._format)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def _run(self):
+        while not self._stop_event.wait(self._interval):
+            save_profiling_stats(self._path, format=self._format)
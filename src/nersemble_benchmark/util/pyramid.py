@@ -0,0 +1,128 @@
+import json
+from pathlib import Path
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+from elias.util import ensure_directory_exists
+
+DEFAULT_PYRAMID_SCALES = (0.5, 0.25, 0.125)
+
+
+def get_scaled_resolution(height: int, width: int, scale: float) -> Tuple[int, int]:
+    # Same rounding as elias' resize_img(), such that pyramid levels have the size of resizing the full-resolution frame
+    return int(height * scale + 0.5), int(width * scale + 0.5)
+
+
+def resize_antialiased(image: np.ndarray, height: int, width: int) -> np.ndarray:
+    # INTER_AREA averages all covered source pixels when downscaling, i.e., it does not alias like plain bilinear sampling
+    resized = cv2.resize(image, (width, height), interpolation=cv2.INTER_AREA)
+    if image.ndim == 3 and resized.ndim == 2:
+        resized = resized[..., None]
+    return resized
+
+
+class FramePyramid:
+    """
+    Downscaled copies of all frames of a video, one memory-mappable array per scale.
+
+    Layout:
+        level_{scale}.npy   (T, H * scale, W * scale, C)    uint8
+        pyramid.json        scales, full resolution, number of frames and an optional source identifier
+    """
+
+    def __init__(self, folder: str, mmap: bool = True):
+        self._folder = folder
+        with open(f"{folder}/pyramid.json") as f:
+            metadata = json.load(f)
+        self.scales: Tuple[float, ...] = tuple(metadata['scales'])
+        self.resolution: Tuple[int, int] = tuple(metadata['resolution'])
+        self.n_frames: int = metadata['n_frames']
+        self.source: Optional[str] = metadata.get('source')
+        self._levels = {scale: np.load(_get_level_path(folder, scale), mmap_mode='r' if mmap else None) for scale in self.scales}
+
+    @staticmethod
+    def exists(folder: str) -> bool:
+        return Path(f"{folder}/pyramid.json").exists()
+
+    def get_level(self, scale: float) -> np.ndarray:
+        """
+        Zero-copy (memory-mapped) view of all frames of a precomputed level (T, H, W, C).
+        """
+
+        return self._levels[scale]
+
+    def find_level(self, scale: float) -> Optional[float]:
+        """
+        The coarsest precomputed level that is at least as fine as `scale`, i.e., frames are only ever downscaled further.
+        None if `scale` is finer than all levels.
+        """
+
+        finer_scales = [level_scale for level_scale in self.scales if level_scale >= scale - 1e-6]
+        return min(finer_scales) if finer_scales else None
+
+    def covers(self, scale: float) -> bool:
+        return self.find_level(scale) is not None
+
+    def load(self, scale: float, timesteps: Optional[Sequence[int]] = None) -> List[np.ndarray]:
+        """
+        Frames at `scale` (default: all timesteps), served from the nearest precomputed level. Frames of an exactly matching
+        level are returned as-is, other scales are resized from the next finer level.
+        """
+
+        level_scale = self.find_level(scale)
+        assert level_scale is not None, f"Scale {scale} is finer than the finest pyramid level {max(self.scales)}"
+
+        level = self._levels[level_scale]
+        frames = level if timesteps is None else level[list(timesteps)]
+        height, width = get_scaled_resolution(*self.resolution, scale)
+        if frames.shape[1:3] == (height, width):
+            return list(np.array(frames))
+
+        return [resize_antialiased(frame, height, width) for frame in frames]
+
+    @staticmethod
+    def build(folder: str,
+              frames: Iterable[np.ndarray],
+              n_frames: int,
+              resolution: Tuple[int, int],
+              scales: Sequence[float] = DEFAULT_PYRAMID_SCALES,
+              source: Optional[str] = None) -> 'FramePyramid':
+        """
+        Downscales the given full-resolution frames in a single pass and writes all levels to `folder`.
+        Every level is resized from the full-resolution frame directly.
+        """
+
+        assert n_frames > 0, "No frames to build a pyramid from"
+        assert len(scales) > 0 and all(0 < scale < 1 for scale in scales), f"Pyramid scales must be in (0, 1), got {scales}"
+        scales = tuple(sorted(scales, reverse=True))
+        ensure_directory_exists(folder)
+        pyramid_file = Path(f"{folder}/pyramid.json")
+        pyramid_file.unlink(missing_ok=True)
+
+        levels = dict()
+        n_written_frames = 0
+        for frame in frames:
+            assert frame.shape[:2] == tuple(resolution), f"Expected frames of resolution {resolution}, got {frame.shape[:2]}"
+            for scale in scales:
+                height, width = get_scaled_resolution(*resolution, scale)
+                if scale not in levels:
+                    levels[scale] = np.lib.format.open_memmap(_get_level_path(folder, scale), mode='w+', dtype=np.uint8,
+                                                              shape=(n_frames, height, width, *frame.shape[2:]))
+                levels[scale][n_written_frames] = resize_antialiased(frame, height, width)
+            n_written_frames += 1
+
+        assert n_written_frames == n_frames, f"Expected {n_frames} frames, got {n_written_frames}"
+        for level in levels.values():
+            level.flush()
+        del levels
+
+        # pyramid.json is written last and marks the pyramid as complete
+        with open(pyramid_file, 'w') as f:
+            json.dump(dict(scales=scales, resolution=list(resolution), n_frames=n_frames, source=source), f)
+
+        return FramePyramid(folder)
+
+
+def _get_level_path(folder: str, scale: float) -> str:
+    return f"{folder}/level_{scale:g}.npy"
@@ -1,9 +1,13 @@
-from typing import Iterator
+from typing import Iterator, Optional, Tuple, Sequence, List, Union, BinaryIO
 
+import av
 import cv2
 import numpy as np
 import imageio.v3 as iio
 
+from nersemble_benchmark.util.cache import load_cached
+from nersemble_benchmark.util.profiling import timed, timed_iterator, increment
+
 
 class VideoFrameLoader:
 
@@ -11,19 +15,39 @@ class VideoFrameLoader:
         self._video_capture = cv2.VideoCapture(video_path)
         self._video_path = video_path
 
+        # PyAV decoder for `load_gray_frame()` and `load_frames()`, kept open such that consecutive frames can be decoded without seeking
+        self._decoder: Optional[FrameDecoder] = None
+
     def get_n_frames(self) -> int:
         n_frames = int(self._video_capture.get(cv2.CAP_PROP_FRAME_COUNT))
         return n_frames
 
-    def load_frame(self, frame_id: int) -> np.ndarray:
-        # set frame position
-        self._video_capture.set(cv2.CAP_PROP_POS_FRAMES, frame_id)
-        success, image = self._video_capture.read()
-        image = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
+    def load_frame(self, frame_id: int, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Parameters
+        ----------
+        out:
+            Preallocated (H, W, 3) uint8 array, e.g., a shared memory slot, that the frame is decoded and color-converted
+            into in place. Returned as is
+        """
+
+        with timed("video.decode"):
+            # set frame position
+            self._video_capture.set(cv2.CAP_PROP_POS_FRAMES, frame_id)
+            success, image = self._video_capture.read(out)
+        assert success, f"Could not decode frame {frame_id} of {self._video_path}"
+        if out is not None and not np.shares_memory(image, out):
+            # OpenCV allocates a new image if `out` does not match the frame
+            out[...] = image
+            image = out
+        with timed("video.color_conversion"):
+            image = cv2.cvtColor(image, cv2.COLOR_RGB2BGR, dst=image if out is not None else None)
+        increment("video.frames_decoded")
+        increment("video.decoded_bytes", image.nbytes)
         return image
 
     def load_all_frames(self) -> Iterator[np.ndarray]:
-        return iio.imiter(self._video_path, plugin='pyav')
+        return timed_iterator("video.decode", iio.imiter(self._video_path, plugin='pyav'), counter="video.frames_decoded")
 
         # self._video_capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
         # while True:
@@ -34,3 +58,221 @@ class VideoFrameLoader:
         #     yield image
 
         # return mediapy.read_video(self._video_path)
+
+    def load_gray_frame(self, frame_id: int) -> np.ndarray:
+        """
+        Decodes a single frame straight to its gray/luma plane (H, W) uint8, skipping the RGB conversion. Meant for alpha maps,
+        which are stored as gray videos.
+        Consecutive calls with increasing frame ids continue decoding instead of seeking (see `FrameDecoder`).
+        """
+
+        with timed("video.decode_gray"):
+            frame = self._get_decoder().decode(frame_id)
+            # Rows of the decoded plane are padded to the line size of the decoder
+            image = np.ascontiguousarray(frame.to_ndarray(format='gray'))
+        increment("video.frames_decoded")
+        increment("video.decoded_bytes", image.nbytes)
+        return image
+
+    def load_frames(self, frame_ids: Sequence[int], format: str = 'rgb24') -> List[np.ndarray]:
+        """
+        See `FrameDecoder.load_frames()`.
+        """
+
+        return self._get_decoder().load_frames(frame_ids, format=format)
+
+    def load_all_gray_frames(self) -> Iterator[np.ndarray]:
+        """
+        Decodes all frames straight to their gray/luma plane (H, W) uint8.
+        """
+
+        return timed_iterator("video.decode_gray", _decode_gray_frames(self._video_path), counter="video.frames_decoded")
+
+    def get_keyframes(self) -> np.ndarray:
+        """
+        Sorted ids of all keyframes, i.e., the frames that the decoder can seek to (see `probe_keyframes()`).
+        """
+
+        return load_cached(self._video_path, probe_keyframes)
+
+    @property
+    def n_decoded_frames(self) -> int:
+        return 0 if self._decoder is None else self._decoder.n_decoded_frames
+
+    def close(self):
+        self._video_capture.release()
+        if self._decoder is not None:
+            self._decoder.close()
+            self._decoder = None
+
+    def _get_decoder(self) -> 'FrameDecoder':
+        if self._decoder is None:
+            self._decoder = FrameDecoder(self._video_path, keyframes=self.get_keyframes())
+        return self._decoder
+
+
+class FrameDecoder:
+    """
+    PyAV decoder for a video file or file-like object that is kept open between calls. Requests for later frames of the same
+    GOP (group of pictures) continue decoding instead of seeking.
+    """
+
+    def __init__(self, source: Union[str, BinaryIO], keyframes: Optional[np.ndarray] = None):
+        """
+        Parameters
+        ----------
+        source:
+            Path to the video or file-like object with the video data
+        keyframes:
+            Sorted keyframe ids (see `probe_keyframes()`). Probed from the source if not given
+        """
+
+        if keyframes is None:
+            keyframes = probe_keyframes(source)
+            if not isinstance(source, str):
+                source.seek(0)
+
+        self._source = source
+        self._keyframes = keyframes
+        self._container = av.open(source)
+        self._decoded_frames: Optional[Iterator[av.VideoFrame]] = None
+        self._next_frame_id: Optional[int] = None
+        self._skip_until_pts: Optional[int] = None
+        self.n_decoded_frames = 0  # including frames that were only decoded to reach a requested frame
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @property
+    def n_frames(self) -> int:
+        # Number of frames stored in the container header (mp4)
+        return self._container.streams.video[0].frames
+
+    def load_frames(self, frame_ids: Sequence[int], format: str = 'rgb24') -> List[np.ndarray]:
+        """
+        Decodes the given frames (returned in the given order) with as few seeks as possible. Frames are decoded in ascending
+        order and the decoder only seeks if a keyframe lies between its current position and the next requested frame.
+        Otherwise, it decodes forward. A contiguous range of frames therefore needs a single seek.
+
+        Parameters
+        ----------
+        frame_ids:
+            Frames to decode. May be unsorted and contain duplicates
+        format:
+            PyAV pixel format of the returned frames, e.g., 'rgb24' (H, W, 3) or 'gray' (H, W)
+        """
+
+        images = dict()
+        with timed("video.decode_frames"):
+            for frame_id in sorted(set(frame_ids)):
+                frame = self.decode(frame_id)
+                images[frame_id] = np.ascontiguousarray(frame.to_ndarray(format=format))
+                increment("video.frames_decoded")
+                increment("video.decoded_bytes", images[frame_id].nbytes)
+
+        return [images[frame_id] for frame_id in frame_ids]
+
+    def decode(self, frame_id: int) -> av.VideoFrame:
+        """
+        Decodes frames until `frame_id` is reached. Seeks first if the frame lies before the current position or if seeking
+        skips frames.
+        """
+
+        if self._next_frame_id is None or frame_id < self._next_frame_id or self._is_seek_cheaper(frame_id):
+            self._seek(frame_id)
+
+        frame = None
+        while self._next_frame_id <= frame_id:
+            frame = next(self._decoded_frames, None)
+            if frame is None:
+                self._next_frame_id = None
+                raise IndexError(f"Frame {frame_id} is out of range for {self._source}")
+            self.n_decoded_frames += 1
+            if self._skip_until_pts is not None:
+                if frame.pts is not None and frame.pts < self._skip_until_pts:
+                    increment("video.frames_skipped")
+                    continue
+                self._skip_until_pts = None
+            if self._next_frame_id < frame_id:
+                increment("video.frames_skipped")
+            self._next_frame_id += 1
+
+        return frame
+
+    def close(self):
+        self._container.close()
+        self._decoded_frames = None
+        self._next_frame_id = None
+
+    def _is_seek_cheaper(self, frame_id: int) -> bool:
+        # Seeking lands on the last keyframe before frame_id. If that keyframe comes after the current decoder position,
+        # seeking skips decoding the frames in between. Otherwise, both need the same frames and decoding forward avoids the seek
+        keyframe = self._keyframes[max(np.searchsorted(self._keyframes, frame_id, side='right') - 1, 0)]
+        return keyframe > self._next_frame_id
+
+    def _seek(self, frame_id: int):
+        stream = self._container.streams.video[0]
+        frame_duration = 1 / (stream.average_rate * stream.time_base)  # in units of the stream's time base
+        start_time = stream.start_time or 0
+        target_pts = start_time + int(frame_id * frame_duration)
+
+        # Seeking lands on the closest keyframe before the target. Frames before the target are decoded and skipped
+        self._container.seek(target_pts, stream=stream, backward=True)
+        self._decoded_frames = self._container.decode(stream)
+        self._skip_until_pts = target_pts - int(frame_duration / 2)
+        self._next_frame_id = frame_id
+
+
+def _decode_gray_frames(video_path: str) -> Iterator[np.ndarray]:
+    with av.open(video_path) as container:
+        for frame in container.decode(video=0):
+            yield np.ascontiguousarray(frame.to_ndarray(format='gray'))
+
+
+def probe_resolution(video_path: str) -> Tuple[int, int]:
+    """
+    (H, W) of the video, read from the stream header without decoding any frame.
+    """
+
+    with av.open(video_path) as container:
+        stream = container.streams.video[0]
+        return stream.height, stream.width
+
+
+def resolve_frame_ids(frame_ids: Union[Sequence[int], slice], n_frames: int) -> List[int]:
+    """
+    Frame ids of a slice (e.g., `slice(start, stop)` for the frames [start, stop)) or list of frame ids. Negative frame ids
+    count from the end of the video.
+    """
+
+    if isinstance(frame_ids, slice):
+        return list(range(*frame_ids.indices(n_frames)))
+
+    frame_ids = [frame_id + n_frames if frame_id < 0 else frame_id for frame_id in frame_ids]
+    assert all(0 <= frame_id < n_frames for frame_id in frame_ids), f"Frame ids out of range for video with {n_frames} frames"
+    return frame_ids
+
+
+def probe_keyframes(source: Union[str, BinaryIO]) -> np.ndarray:
+    """
+    Sorted ids of the keyframes of the video (path or file-like object). Only demuxes the packets, no frame is decoded.
+    """
+
+    with av.open(source) as container:
+        stream = container.streams.video[0]
+        packet_pts = []
+        packet_is_keyframe = []
+        for packet in container.demux(stream):
+            if packet.pts is None:
+                # Empty packets that flush the decoder
+                continue
+            packet_pts.append(packet.pts)
+            packet_is_keyframe.append(packet.is_keyframe)
+
+    # Packets are stored in decoding order. The id of a frame is the rank of its presentation timestamp
+    frame_ids = np.empty(len(packet_pts), dtype=np.int64)
+    frame_ids[np.argsort(packet_pts, kind='stable')] = np.arange(len(packet_pts))
+    return np.sort(frame_ids[np.array(packet_is_keyframe, dtype=bool)])
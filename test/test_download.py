@@ -0,0 +1,224 @@
+import os
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+import pytest
+from elias.util import save_json
+
+from fixtures import LocalFileServer, RangeRequestHandler, write_random_file
+from nersemble_benchmark.util.download import download_file, create_session, get_partial_path, get_chunks_state_path, \
+    compute_file_hash, DownloadThrottle
+
+FILE_SIZE = 1000000
+
+
+@pytest.fixture
+def remote_file(tmp_path: Path) -> bytes:
+    write_random_file(f"{tmp_path}/server/file.bin", FILE_SIZE)
+    return Path(f"{tmp_path}/server/file.bin").read_bytes()
+
+
+class FailingRequestHandler(RangeRequestHandler):
+    n_failures = 0  # The first requests are answered with 503
+
+    def send_head(self):
+        if type(self).n_failures > 0:
+            type(self).n_failures -= 1
+            self.send_error(503)
+            return None
+        return super().send_head()
+
+
+class DroppingRequestHandler(RangeRequestHandler):
+    n_drops = 0  # The first responses only send part of the announced body and close the connection
+
+    def copyfile(self, source, outputfile):
+        if type(self).n_drops > 0:
+            type(self).n_drops -= 1
+            outputfile.write(source.read(FILE_SIZE // 3))
+            self.close_connection = True
+            return
+        super().copyfile(source, outputfile)
+
+
+def create_handler_class(base_class: type = RangeRequestHandler, **attributes) -> type:
+    """
+    Fresh subclass of a request handler per test that records all requests, such that class-level state is not shared
+    between tests.
+    """
+
+    class RecordingRequestHandler(base_class):
+        requests = []  # (client port, method, Range header)
+        lock = threading.Lock()
+
+        def send_head(self):
+            with self.lock:
+                self.requests.append((self.client_address[1], self.command, self.headers.get('Range')))
+            return super().send_head()
+
+    for name, value in attributes.items():
+        setattr(RecordingRequestHandler, name, value)
+    return RecordingRequestHandler
+
+
+class RecordingThrottle(DownloadThrottle):
+    """
+    Records how many GET requests the server had received whenever an in-flight reservation was granted.
+    """
+
+    def __init__(self, handler_class: type, **kwargs):
+        super().__init__(**kwargs)
+        self._handler_class = handler_class
+        self.n_requests_at_reservation = []
+
+    @contextmanager
+    def reserve_in_flight(self, n_bytes: int):
+        with super().reserve_in_flight(n_bytes):
+            self.n_requests_at_reservation.append(sum(1 for _, method, _ in self._handler_class.requests if method == 'GET'))
+            yield
+
+
+def write_interrupted_chunked_download(partial_path: str, remote_file: bytes, n_bytes_done: int):
+    # State after an interrupted 2-chunk download: The .part file is preallocated and only the start of chunk 0 was written
+    data = bytearray(len(remote_file))
+    data[:n_bytes_done] = remote_file[:n_bytes_done]
+    Path(partial_path).write_bytes(data)
+    boundaries = [0, len(remote_file) // 2, len(remote_file)]
+    save_json(dict(size=len(remote_file), boundaries=boundaries, n_bytes_done=[n_bytes_done, 0]), get_chunks_state_path(partial_path))
+
+
+# ==========================================================
+# Session
+# ==========================================================
+
+def test_session_reuses_connection(tmp_path: Path, remote_file: bytes):
+    handler_class = create_handler_class()
+    with LocalFileServer(f"{tmp_path}/server", handler_class) as server, create_session() as session:
+        for i in range(3):
+            download_file(f"{server.url}/file.bin", f"{tmp_path}/file_{i}.bin", session=session)
+
+    assert len({client_port for client_port, _, _ in handler_class.requests}) == 1
+
+
+def test_session_retries_server_errors(tmp_path: Path, remote_file: bytes):
+    handler_class = create_handler_class(FailingRequestHandler, n_failures=2)
+    with LocalFileServer(f"{tmp_path}/server", handler_class) as server:
+        download_file(f"{server.url}/file.bin", f"{tmp_path}/file.bin", backoff_factor=0)
+
+    assert Path(f"{tmp_path}/file.bin").read_bytes() == remote_file
+    assert len(handler_class.requests) == 2 + 1
+
+
+def test_download_resumes_after_connection_drop(tmp_path: Path, remote_file: bytes):
+    handler_class = create_handler_class(DroppingRequestHandler, n_drops=1)
+    with LocalFileServer(f"{tmp_path}/server", handler_class) as server:
+        download_file(f"{server.url}/file.bin", f"{tmp_path}/file.bin", backoff_factor=0, chunk_size=64 * 1024)
+
+    assert Path(f"{tmp_path}/file.bin").read_bytes() == remote_file
+    # The second request continues after the chunks that were completely received before the connection dropped
+    assert len(handler_class.requests) == 2
+    assert handler_class.requests[-1][2] is not None and int(handler_class.requests[-1][2][len("bytes="):-1]) > 0
+
+
+@pytest.mark.parametrize('n_parallel_chunks', [1, 4])
+def test_in_flight_bytes_are_reserved_before_requests(tmp_path: Path, remote_file: bytes, n_parallel_chunks: int):
+    # With a budget smaller than any request, requests run one after another. Each is only sent once its reservation was granted
+    handler_class = create_handler_class()
+    throttle = RecordingThrottle(handler_class, max_in_flight_bytes=1)
+    with LocalFileServer(f"{tmp_path}/server", handler_class) as server, create_session() as session:
+        for i in range(2):
+            download_file(f"{server.url}/file.bin", f"{tmp_path}/file_{i}.bin", session=session, throttle=throttle,
+                          n_parallel_chunks=n_parallel_chunks, parallel_chunks_min_size=0)
+
+    assert Path(f"{tmp_path}/file_1.bin").read_bytes() == remote_file
+    assert sorted(throttle.n_requests_at_reservation) == list(range(2 * n_parallel_chunks))
+
+
+# ==========================================================
+# Resuming .part files
+# ==========================================================
+
+def test_sequential_download_resumes_partial_file(tmp_path: Path, remote_file: bytes):
+    target_path = f"{tmp_path}/file.bin"
+    Path(get_partial_path(target_path)).write_bytes(remote_file[:FILE_SIZE // 4])
+
+    handler_class = create_handler_class()
+    with LocalFileServer(f"{tmp_path}/server", handler_class) as server:
+        download_file(f"{server.url}/file.bin", target_path)
+
+    assert Path(target_path).read_bytes() == remote_file
+    assert not Path(get_partial_path(target_path)).exists()
+    assert [range_header for _, method, range_header in handler_class.requests if method == 'GET'] == [f"bytes={FILE_SIZE // 4}-"]
+
+
+def test_sequential_download_accepts_complete_partial_file(tmp_path: Path, remote_file: bytes):
+    # The download was interrupted after writing the last byte but before renaming. The server answers with 416
+    target_path = f"{tmp_path}/file.bin"
+    Path(get_partial_path(target_path)).write_bytes(remote_file)
+
+    with LocalFileServer(f"{tmp_path}/server") as server:
+        download_file(f"{server.url}/file.bin", target_path)
+
+    assert Path(target_path).read_bytes() == remote_file
+
+
+@pytest.mark.parametrize('n_parallel_chunks', [1, 4])
+def test_interrupted_chunked_download_is_resumed_chunked(tmp_path: Path, remote_file: bytes, n_parallel_chunks: int):
+    # Regardless of the current settings, the preallocated .part file must not be finished sequentially
+    target_path = f"{tmp_path}/file.bin"
+    partial_path = get_partial_path(target_path)
+    write_interrupted_chunked_download(partial_path, remote_file, FILE_SIZE // 8)
+
+    handler_class = create_handler_class()
+    with LocalFileServer(f"{tmp_path}/server", handler_class) as server:
+        download_file(f"{server.url}/file.bin", target_path, n_parallel_chunks=n_parallel_chunks, parallel_chunks_min_size=10 * FILE_SIZE)
+
+    assert Path(target_path).read_bytes() == remote_file
+    assert not Path(partial_path).exists() and not Path(get_chunks_state_path(partial_path)).exists()
+    assert sorted(range_header for _, method, range_header in handler_class.requests if method == 'GET') \
+           == [f"bytes={FILE_SIZE // 8}-{FILE_SIZE // 2 - 1}", f"bytes={FILE_SIZE // 2}-{FILE_SIZE - 1}"]
+
+
+def test_interrupted_chunked_download_without_range_support(tmp_path: Path, remote_file: bytes):
+    target_path = f"{tmp_path}/file.bin"
+    partial_path = get_partial_path(target_path)
+    write_interrupted_chunked_download(partial_path, remote_file, FILE_SIZE // 8)
+
+    with LocalFileServer(f"{tmp_path}/server", create_handler_class(supports_ranges=False)) as server:
+        download_file(f"{server.url}/file.bin", target_path)
+
+    assert Path(target_path).read_bytes() == remote_file
+    assert not Path(get_chunks_state_path(partial_path)).exists()
+
+
+def test_chunked_download(tmp_path: Path, remote_file: bytes):
+    target_path = f"{tmp_path}/file.bin"
+    with LocalFileServer(f"{tmp_path}/server") as server:
+        download_file(f"{server.url}/file.bin", target_path, n_parallel_chunks=4, parallel_chunks_min_size=0)
+
+    assert Path(target_path).read_bytes() == remote_file
+
+
+def test_checksum_mismatch_removes_partial_file(tmp_path: Path, remote_file: bytes):
+    target_path = f"{tmp_path}/file.bin"
+    with LocalFileServer(f"{tmp_path}/server") as server:
+        with pytest.raises(ValueError):
+            download_file(f"{server.url}/file.bin", target_path, expected_hash=f"sha256:{'0' * 64}")
+        assert not Path(target_path).exists() and not Path(get_partial_path(target_path)).exists()
+
+        download_file(f"{server.url}/file.bin", target_path, expected_hash=f"sha256:{compute_file_hash(f'{tmp_path}/server/file.bin')}")
+
+    assert Path(target_path).read_bytes() == remote_file
+
+
+def test_existing_complete_file_is_skipped(tmp_path: Path, remote_file: bytes):
+    target_path = f"{tmp_path}/file.bin"
+    Path(target_path).write_bytes(remote_file)
+    mtime_ns = os.stat(target_path).st_mtime_ns
+
+    with LocalFileServer(f"{tmp_path}/server") as server:
+        download_result = download_file(f"{server.url}/file.bin", target_path)
+
+    assert download_result.skipped
+    assert os.stat(target_path).st_mtime_ns == mtime_ns
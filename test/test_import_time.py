@@ -0,0 +1,11 @@
+import pytest
+
+from check_import_time import IMPORT_BUDGETS, ImportBudget, measure_import, find_eager_imports
+
+
+@pytest.mark.parametrize('import_budget', IMPORT_BUDGETS, ids=lambda import_budget: import_budget.module)
+def test_no_eager_heavy_imports(import_budget: ImportBudget):
+    # Only the imported modules are checked. Wall-clock import times depend too much on the machine
+    _, cumulative_seconds = measure_import(import_budget.module)
+    eager_imports = find_eager_imports(import_budget, cumulative_seconds)
+    assert not eager_imports, f"{import_budget.module} eagerly imports {', '.join(eager_imports)}"
@@ -0,0 +1,128 @@
+import zipfile
+from pathlib import Path
+from typing import Dict
+
+import numpy as np
+import pytest
+
+from nersemble_benchmark.data.submission_data import get_shard_items, get_shard_path, merge_submission_shards, list_submission_items
+from nersemble_benchmark.util.benchmark_index import get_benchmark_index, get_video_submission_path
+
+
+class UnseekableFile:
+    # zipfile falls back to trailing data descriptors when the output cannot be seeked, e.g., when streaming to stdout
+
+    def __init__(self, path: str):
+        self._file = open(path, 'wb')
+
+    def write(self, data: bytes) -> int:
+        return self._file.write(data)
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+def create_entries(shard_id: int) -> Dict[str, bytes]:
+    rng = np.random.default_rng(shard_id)
+    return {
+        f"shard_{shard_id}/random.bin": rng.bytes(100000),  # Incompressible
+        f"shard_{shard_id}/zeros.bin": bytes(100000),  # Compresses well
+        f"shard_{shard_id}/empty.txt": b"",
+    }
+
+
+def write_shard(shard_path: str, entries: Dict[str, bytes], compression: int, streamed: bool = False):
+    output = UnseekableFile(shard_path) if streamed else shard_path
+    with zipfile.ZipFile(output, 'w', compression=compression) as zipf:
+        for filename, data in entries.items():
+            if streamed:
+                with zipf.open(filename, 'w') as f:
+                    f.write(data)
+            else:
+                zipf.writestr(filename, data)
+    if streamed:
+        output.close()
+
+
+@pytest.fixture
+def shard_paths(tmp_path: Path) -> Dict[str, Dict[str, bytes]]:
+    # Stored, deflated and streamed (data descriptor) entries
+    shards = dict()
+    for shard_id, (compression, streamed) in enumerate([(zipfile.ZIP_STORED, False),
+                                                        (zipfile.ZIP_DEFLATED, False),
+                                                        (zipfile.ZIP_DEFLATED, True)]):
+        shard_path = get_shard_path(f"{tmp_path}/submission.zip", shard_id, 3)
+        entries = create_entries(shard_id)
+        write_shard(shard_path, entries, compression, streamed=streamed)
+        shards[shard_path] = entries
+    return shards
+
+
+# ==========================================================
+# Shards
+# ==========================================================
+
+def test_shard_items_partition_items():
+    items = list(range(11))
+    shards = [get_shard_items(items, shard_id, 3) for shard_id in range(3)]
+
+    assert sorted(item for shard in shards for item in shard) == items
+    assert [len(shard) for shard in shards] == [4, 4, 3]
+
+
+def test_submission_items_match_expected_files():
+    benchmark_index = get_benchmark_index()
+    assert [get_video_submission_path(*item) for item in list_submission_items('nvs')] == list(benchmark_index.nvs_submission_files)
+    assert [get_video_submission_path(*item) for item in list_submission_items('mono_flame_avatar')] \
+           == list(benchmark_index.mono_flame_avatar_submission_files)
+
+
+def test_shard_path():
+    assert get_shard_path("/submissions/nvs.zip", 2, 16) == "/submissions/nvs.shard_002_of_016.zip"
+
+
+# ==========================================================
+# Merging
+# ==========================================================
+
+def test_merge_copies_entries_unchanged(tmp_path: Path, shard_paths: Dict[str, Dict[str, bytes]]):
+    zip_path = f"{tmp_path}/submission.zip"
+    n_merged = merge_submission_shards(list(shard_paths.keys()), zip_path)
+
+    expected_entries = {filename: data for entries in shard_paths.values() for filename, data in entries.items()}
+    assert n_merged == len(expected_entries)
+    assert not Path(f"{zip_path}.tmp").exists()
+
+    with zipfile.ZipFile(zip_path, 'r') as zipf:
+        assert zipf.testzip() is None
+        assert {zip_info.filename: zipf.read(zip_info) for zip_info in zipf.infolist()} == expected_entries
+
+        # The compressed data is copied as is
+        for shard_path in shard_paths:
+            with zipfile.ZipFile(shard_path, 'r') as shard_zipf:
+                for shard_info in shard_zipf.infolist():
+                    merged_info = zipf.getinfo(shard_info.filename)
+                    assert merged_info.compress_type == shard_info.compress_type
+                    assert merged_info.compress_size == shard_info.compress_size
+                    assert merged_info.CRC == shard_info.CRC
+
+
+def test_merge_rejects_duplicate_entries(tmp_path: Path, shard_paths: Dict[str, Dict[str, bytes]]):
+    duplicate_shard_path = f"{tmp_path}/duplicate.zip"
+    write_shard(duplicate_shard_path, create_entries(0), zipfile.ZIP_DEFLATED)
+
+    zip_path = f"{tmp_path}/submission.zip"
+    with pytest.raises(AssertionError):
+        merge_submission_shards([*shard_paths.keys(), duplicate_shard_path], zip_path)
+
+    assert not Path(zip_path).exists()
+    assert not Path(f"{zip_path}.tmp").exists()
+
+
+def test_merge_does_not_overwrite_shard(shard_paths: Dict[str, Dict[str, bytes]]):
+    shard_path = next(iter(shard_paths))
+    with pytest.raises(AssertionError):
+        merge_submission_shards(list(shard_paths.keys()), shard_path)